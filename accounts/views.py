@@ -6,7 +6,7 @@ from django.urls import reverse_lazy
 from django.views.generic import FormView
 from django.contrib import messages
 
-from bookings.models import Barbeiro
+from bookings.roles import get_barbeiro
 
 
 class RoleAwareLoginView(LoginView):
@@ -24,10 +24,8 @@ class RoleAwareLoginView(LoginView):
         if next_url:
             return next_url
 
-        user = self.request.user
-
         # 2) Se for barbeiro -> agenda do barbeiro
-        if Barbeiro.objects.filter(user=user).exists():
+        if get_barbeiro(self.request) is not None:
             return reverse_lazy("bookings:agenda_barbeiro")
 
         # 3) Caso contrário -> dashboard de cliente
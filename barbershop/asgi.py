@@ -1,4 +1,4 @@
 import os
 from django.core.asgi import get_asgi_application
-os.environ.setdefault('DJANGO_SETTINGS_MODULE','barbershop.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE','barbershop.settings_asgi')
 application=get_asgi_application()
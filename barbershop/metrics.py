@@ -0,0 +1,259 @@
+# barbershop/metrics.py
+"""
+Métricas por pedido: nome da view, tempo total, nº de queries, tempo de BD
+e tempo de render dos templates.
+
+As queries contam-se onde correm: o hook fica em todas as ligações, de
+qualquer thread, e soma no pedido atual (uma contextvar, que o
+sync_to_async leva para a thread das views/ORM assíncronos). Assim as views
+async também medem a BD.
+
+Os valores são agregados em memória (por processo) em histogramas por view
+e ficam disponíveis em /metrics/ (só staff). Opcionalmente, cada pedido
+amostrado é também escrito numa linha JSON em METRICS_JSONL_PATH.
+
+Definições:
+    METRICS_SAMPLE_RATE  fração de pedidos medidos (0.0 a 1.0)
+    METRICS_JSONL_PATH   ficheiro JSONL (None para desligar)
+"""
+import contextvars
+import json
+import random
+import time
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from django.template.backends.django import Template as DjangoTemplate
+
+# limites superiores dos baldes do histograma, em milissegundos
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+_lock = Lock()
+_views = {}
+_jsonl_lock = Lock()
+
+
+# ----------------------------
+# AGREGAÇÃO
+# ----------------------------
+class _ViewStats:
+    __slots__ = ("count", "buckets", "wall_ms", "wall_max_ms", "queries", "db_ms", "template_ms", "errors")
+
+    def __init__(self):
+        self.count = 0
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.wall_ms = 0.0
+        self.wall_max_ms = 0.0
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.errors = 0
+
+    def add(self, record):
+        self.count += 1
+        wall = record["wall_ms"]
+        for i, upper in enumerate(BUCKETS_MS):
+            if wall <= upper:
+                self.buckets[i] += 1
+                break
+        self.wall_ms += wall
+        self.wall_max_ms = max(self.wall_max_ms, wall)
+        self.queries += record["queries"]
+        self.db_ms += record["db_ms"]
+        self.template_ms += record["template_ms"]
+        if record["status"] >= 500:
+            self.errors += 1
+
+    def _percentile(self, p):
+        # aproximação: limite superior do balde onde cai o percentil
+        target = p * self.count
+        seen = 0
+        for upper, n in zip(BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= target:
+                return upper if upper != float("inf") else round(self.wall_max_ms, 2)
+        return None
+
+    def as_dict(self):
+        n = self.count or 1
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "wall_ms": {
+                "mean": round(self.wall_ms / n, 2),
+                "max": round(self.wall_max_ms, 2),
+                "p50": self._percentile(0.50),
+                "p95": self._percentile(0.95),
+                "p99": self._percentile(0.99),
+            },
+            "queries_mean": round(self.queries / n, 2),
+            "db_ms_mean": round(self.db_ms / n, 2),
+            "template_ms_mean": round(self.template_ms / n, 2),
+            "histogram": {
+                ("inf" if upper == float("inf") else str(upper)): count
+                for upper, count in zip(BUCKETS_MS, self.buckets)
+            },
+        }
+
+
+def record(data):
+    with _lock:
+        _views.setdefault(data["view"], _ViewStats()).add(data)
+
+
+def snapshot():
+    with _lock:
+        return {view: stats.as_dict() for view, stats in sorted(_views.items())}
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+def _write_jsonl(path, data):
+    line = json.dumps(data, ensure_ascii=False)
+    with _jsonl_lock, open(path, "a", encoding="utf-8") as fh:
+        fh.write(line + "\n")
+
+
+# ----------------------------
+# TEMPO DE RENDER
+# ----------------------------
+_original_render = DjangoTemplate.render
+
+
+def _timed_render(self, context=None, request=None):
+    current = _current.get()
+    if current is None:
+        return _original_render(self, context, request)
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        current["template_ms"] += (time.perf_counter() - start) * 1000
+
+
+def _install_render_hook():
+    if DjangoTemplate.render is not _timed_render:
+        DjangoTemplate.render = _timed_render
+
+
+# ----------------------------
+# TEMPO DE BD
+# ----------------------------
+def _timed_execute(execute, sql, params, many, context):
+    current = _current.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        current["queries"] += 1
+        current["db_ms"] += (time.perf_counter() - start) * 1000
+
+
+def _add_db_hook(connection):
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    # cada thread tem as suas ligações (as do sync_to_async incluídas)
+    _add_db_hook(connection)
+
+
+def _install_db_hook():
+    connection_created.connect(_on_connection_created, dispatch_uid="barbershop.metrics.db_hook")
+    for connection in connections.all(initialized_only=True):
+        _add_db_hook(connection)
+
+
+# ----------------------------
+# MIDDLEWARE
+# ----------------------------
+class RequestMetricsMiddleware:
+    # funciona em WSGI e em ASGI sem obrigar as views async a mudar de thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "METRICS_SAMPLE_RATE", 1.0)
+        self.jsonl_path = getattr(settings, "METRICS_JSONL_PATH", None)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        _install_render_hook()
+        _install_db_hook()
+
+    def _sampled(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def _start(self):
+        current = {"queries": 0, "db_ms": 0.0, "template_ms": 0.0}
+        # ligações desta thread abertas antes de o hook existir
+        for connection in connections.all(initialized_only=True):
+            _add_db_hook(connection)
+        return current, _current.set(current), time.perf_counter()
+
+    def _finish(self, request, response, current, start):
+        match = getattr(request, "resolver_match", None)
+        data = {
+            "ts": round(time.time(), 3),
+            "view": (match.view_name if match else None) or "<unresolved>",
+            "method": request.method,
+            "status": response.status_code,
+            "wall_ms": round((time.perf_counter() - start) * 1000, 3),
+            "queries": current["queries"],
+            "db_ms": round(current["db_ms"], 3),
+            "template_ms": round(current["template_ms"], 3),
+        }
+        record(data)
+        if self.jsonl_path:
+            _write_jsonl(self.jsonl_path, data)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        current, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, current, start)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        current, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, current, start)
+        return response
+
+
+# ----------------------------
+# ENDPOINT
+# ----------------------------
+@staff_member_required
+def metrics_view(request):
+    return JsonResponse({
+        "sample_rate": getattr(settings, "METRICS_SAMPLE_RATE", 1.0),
+        "views": snapshot(),
+    })
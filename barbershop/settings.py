@@ -2,6 +2,8 @@
 from pathlib import Path
 from django.utils.translation import gettext_lazy as _
 
+from .db import database_settings
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = 'dev-secret-key'  # substitui em produção
@@ -34,11 +36,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # <--- ADICIONA AQUI
+    'barbershop.metrics.RequestMetricsMiddleware',  # métricas por view (/metrics/)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'bookings.roles.RoleMiddleware',  # request.barbeiro (preguiçoso, em cache)
+    'bookings.wizard.WizardStateMiddleware',  # request.wizard (cookie assinado)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -67,15 +72,68 @@ TEMPLATES = [
 WSGI_APPLICATION = 'barbershop.wsgi.application'
 
 # ---------------------------
-# BASE DE DADOS (SQLite)
+# BASE DE DADOS (perfil pelo ambiente; ver barbershop/db.py)
+# ---------------------------
+# SQLite em WAL por omissão; DATABASE_URL=postgres://... para PostgreSQL.
+DATABASES, SQLITE_PRAGMAS = database_settings(BASE_DIR)
+
 # ---------------------------
-DATABASES = {
+# CACHE
+# ---------------------------
+# LocMemCache descarta as entradas menos usadas (LRU) ao atingir MAX_ENTRIES.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'barbershop',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
     }
 }
 
+# O LocMemCache é de cada processo: as versões que todos os workers têm de
+# ver (catálogo, horários...) vivem na BD e cada processo guarda-as durante
+# este tempo (bookings/versions.py).
+VERSIONS_CACHE_TIMEOUT = 2  # segundos
+
+# Ocupação por (barbeiro, dia) no cache de cada processo; as versões (por
+# dia, por mês e a geração) vivem na BD como as de cima, por isso os outros
+# workers veem uma alteração ao fim de VERSIONS_CACHE_TIMEOUT, não deste.
+AVAILABILITY_CACHE_ALIAS = 'default'
+AVAILABILITY_CACHE_TIMEOUT = 300  # segundos
+
+# Intervalo entre horários de início propostos no wizard (minutos).
+BOOKING_SLOT_STEP_MIN = 15
+
+# Marcações mais antigas do que isto vão para o arquivo
+# (python manage.py archive_bookings; ver bookings/archive.py).
+ARCHIVE_RETENTION_DAYS = 365
+
+# Estado do wizard num cookie assinado (bookings/wizard.py), fora da sessão.
+BOOKING_WIZARD_COOKIE = 'wizard'
+BOOKING_WIZARD_MAX_AGE = 60 * 60  # wizard abandonado expira ao fim de 1 h
+
+# Sessões só na BD: o wizard já não escreve na sessão (cookie acima). Não
+# usar cached_db com o LocMemCache: cada worker teria a sua cópia e um
+# logout num worker deixaria a sessão viva nos outros.
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+# ---------------------------
+# TAREFAS EM SEGUNDO PLANO (bookings/tasks.py)
+# ---------------------------
+# DatabaseBackend: fila na BD + `python manage.py run_tasks`
+# EagerBackend: executa logo (testes/desenvolvimento)
+TASKS_BACKEND = 'bookings.tasks.DatabaseBackend'
+TASKS_LEASE_SECONDS = 300  # tarefas "running" há mais tempo voltam à fila
+
+DEFAULT_FROM_EMAIL = 'Barbershop <no-reply@barbershop.local>'
+if DEBUG:
+    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# ---------------------------
+# MÉTRICAS (barbershop/metrics.py)
+# ---------------------------
+METRICS_SAMPLE_RATE = 0.1     # fração de pedidos medidos
+METRICS_JSONL_PATH = None     # ex.: BASE_DIR / 'metrics.jsonl'
+
 # ---------------------------
 # PASSWORD VALIDATORS
 # ---------------------------
@@ -111,7 +169,10 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']      # durante desenvolvimento
 STATIC_ROOT = BASE_DIR / 'staticfiles'        # para collectstatic (produção)
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# WhiteNoise + variantes redimensionadas/WebP das imagens grandes (barbershop/storage.py)
+STATICFILES_STORAGE = 'barbershop.storage.OptimizedStaticFilesStorage'
+STATIC_IMAGE_VARIANT_MIN_BYTES = 100 * 1024
+STATIC_IMAGE_VARIANT_WORKERS = None  # None = um processo por núcleo
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
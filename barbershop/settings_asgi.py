@@ -0,0 +1,12 @@
+# barbershop/settings_asgi.py
+"""
+Perfil para correr em ASGI (uvicorn/daphne).
+
+O WhiteNoiseMiddleware é só síncrono: em ASGI obrigava cada pedido a saltar
+para uma thread antes de chegar às views async. Neste perfil os ficheiros
+estáticos são servidos pelo proxy (nginx) a partir de STATIC_ROOT.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import MIDDLEWARE
+
+MIDDLEWARE = [m for m in MIDDLEWARE if m != 'whitenoise.middleware.WhiteNoiseMiddleware']
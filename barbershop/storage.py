@@ -0,0 +1,165 @@
+# barbershop/storage.py
+"""
+Storage de ficheiros estáticos com otimização de imagens no collectstatic.
+
+Antes do hashing do ManifestStaticFilesStorage, cada PNG/JPEG acima de
+STATIC_IMAGE_VARIANT_MIN_BYTES dá origem a variantes redimensionadas e
+recomprimidas (mesmo formato, otimizado) e em WebP:
+
+    barbershop/images/pricing.png -> barbershop/images/pricing.960w.png
+                                     barbershop/images/pricing.960w.webp ...
+
+O próprio original (a cópia em STATIC_ROOT, nunca o ficheiro da app) é
+também recomprimido sem perda de qualidade, e só é substituído se ficar
+mais pequeno.
+
+As variantes entram no manifest como qualquer outro ficheiro (com hash e
+compressão do WhiteNoise), por isso `{% static %}` e `{% static_picture %}`
+as encontram. Imagens cujo conteúdo não mudou desde o último collectstatic
+não são reprocessadas (ver VARIANTS_STATE_NAME). O trabalho é repartido por
+vários processos.
+
+Tudo isto só existe depois do collectstatic: com DEBUG=True os ficheiros
+vêm dos finders e as tags usam sempre o original.
+"""
+import hashlib
+import io
+import json
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from PIL import Image
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+VARIANT_WIDTHS = (480, 960, 1600)
+VARIANT_SOURCE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+VARIANTS_STATE_NAME = "staticfiles-variants.json"
+
+_SAVE_OPTIONS = {
+    "PNG": {"optimize": True},
+    "JPEG": {"quality": 82, "optimize": True, "progressive": True},
+    "WEBP": {"quality": 80, "method": 4},
+}
+
+
+def variant_name(name, width, ext):
+    base, _ext = posixpath.splitext(name)
+    return f"{base}.{width}w.{ext}"
+
+
+def variant_names(name, widths=VARIANT_WIDTHS):
+    """Todas as variantes possíveis de `name`, como (largura, formato, nome)."""
+    ext = posixpath.splitext(name)[1].lstrip(".").lower()
+    return [
+        (width, fmt, variant_name(name, width, fmt))
+        for width in widths
+        for fmt in ("webp", ext)
+    ]
+
+
+def _content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _recompress(img, fmt, path):
+    """Regrava o original otimizado, se ficar mais pequeno."""
+    if os.path.islink(path):
+        return  # collectstatic --link: seria o ficheiro da app
+    options = dict(_SAVE_OPTIONS[fmt])
+    if img.format == "JPEG":
+        options["quality"] = "keep"  # mesmas tabelas de quantização: sem perda
+    buf = io.BytesIO()
+    img.save(buf, fmt, **options)
+    if buf.tell() < os.path.getsize(path):
+        with open(path, "wb") as fh:
+            fh.write(buf.getvalue())
+
+
+def _build(name, source_path, root):
+    """Gera as variantes de uma imagem (corre num processo à parte)."""
+    with Image.open(source_path) as img:
+        img.load()
+    original_fmt = "JPEG" if img.format in ("JPEG", "MPO") else "PNG"
+    _recompress(img, original_fmt, source_path)
+    original_ext = posixpath.splitext(name)[1].lstrip(".").lower()
+    widths = [w for w in VARIANT_WIDTHS if w < img.width]
+
+    written = []
+    for width in widths:
+        height = round(img.height * width / img.width)
+        resized = img.resize((width, height), Image.LANCZOS)
+        for fmt_name, ext in (("WEBP", "webp"), (original_fmt, original_ext)):
+            target = variant_name(name, width, ext)
+            out = resized
+            if fmt_name == "JPEG" and out.mode not in ("RGB", "L"):
+                out = out.convert("RGB")
+            path = os.path.join(root, *target.split("/"))
+            out.save(path, fmt_name, **_SAVE_OPTIONS[fmt_name])
+            written.append(target)
+    return name, written
+
+
+class OptimizedStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """CompressedManifestStaticFilesStorage + variantes das imagens grandes."""
+
+    def _load_state(self):
+        try:
+            with open(self.path(VARIANTS_STATE_NAME), encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        with open(self.path(VARIANTS_STATE_NAME), "w", encoding="utf-8") as fh:
+            json.dump(state, fh, indent=2, sort_keys=True)
+
+    def _candidates(self, paths):
+        min_bytes = getattr(settings, "STATIC_IMAGE_VARIANT_MIN_BYTES", 100 * 1024)
+        for name in paths:
+            if name.lower().endswith(VARIANT_SOURCE_EXTENSIONS) and self.exists(name):
+                if self.size(name) >= min_bytes:
+                    yield name
+
+    def generate_variants(self, paths):
+        """Gera (ou reaproveita) as variantes e retorna os nomes criados."""
+        state = self._load_state()
+        new_state = {}
+        todo = []
+        names = []
+        for name in self._candidates(paths):
+            digest = _content_hash(self.path(name))
+            previous = state.get(name, {})
+            if previous.get("hash") == digest and all(self.exists(v) for v in previous.get("variants", [])):
+                new_state[name] = previous
+                names.extend(previous["variants"])
+            else:
+                new_state[name] = {"hash": digest, "variants": []}
+                todo.append(name)
+
+        if todo:
+            workers = getattr(settings, "STATIC_IMAGE_VARIANT_WORKERS", None) or os.cpu_count() or 1
+            root = str(self.location)
+            with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+                futures = [pool.submit(_build, name, self.path(name), root) for name in todo]
+                for future in futures:
+                    name, written = future.result()
+                    # hash do original já recomprimido: é o que fica em STATIC_ROOT
+                    new_state[name] = {"hash": _content_hash(self.path(name)), "variants": written}
+                    names.extend(written)
+
+        self._save_state(new_state)
+        return names
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            # as variantes entram em `paths` antes do hashing, para ficarem no
+            # manifest e serem comprimidas como os restantes ficheiros
+            for name in self.generate_variants(paths):
+                paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
@@ -5,9 +5,14 @@ from django.conf.urls.static import static
 from django.conf.urls.i18n import i18n_patterns
 from django.views.i18n import set_language
 
+from barbershop.metrics import metrics_view
+
 urlpatterns = [
     # URL para mudar idioma
     path("i18n/", include("django.conf.urls.i18n")),
+
+    # Métricas por view (só staff)
+    path("metrics/", metrics_view, name="metrics"),
 ]
 
 # URLs traduzíveis
@@ -1,5 +1,11 @@
-from django.contrib import admin
-from .models import Servico, Barbeiro, Marcacao
+from django.contrib import admin, messages
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import (
+    Ausencia, Barbeiro, Feriado, HorarioSemanal, Marcacao, MarcacaoArquivo, Pausa, Servico, Tarefa,
+)
+from .services import alterar_estado
 
 
 @admin.register(Servico)
@@ -28,15 +34,34 @@ class BarbeiroAdmin(admin.ModelAdmin):
     def username(self, obj):
         return obj.user.username
 
-    @admin.display(description="Marcações")
+    @admin.display(description="Marcações", ordering="_marcacoes_total")
     def marcacoes_total(self, obj):
-        return obj.marcacoes.count()
+        return obj._marcacoes_total
+
+    def get_queryset(self, request):
+        # user e total de marcações vêm na mesma query da listagem
+        return (
+            super().get_queryset(request)
+            .select_related("user")
+            .annotate(_marcacoes_total=Count("marcacoes"))
+        )
+
+
+class BarbeiroListFilter(admin.RelatedFieldListFilter):
+    """Filtro por barbeiro sem uma query extra por opção (nome vem do user)."""
+
+    def field_choices(self, field, request, model_admin):
+        barbeiros = Barbeiro.objects.select_related("user").order_by(
+            "user__first_name", "user__last_name", "user__username"
+        )
+        return [(b.pk, str(b)) for b in barbeiros]
 
 
 @admin.register(Marcacao)
 class MarcacaoAdmin(admin.ModelAdmin):
     list_display = ("cliente", "barbeiro", "servico", "inicio", "status")
-    list_filter = ("status", "barbeiro", "servico")
+    list_select_related = ("cliente", "barbeiro__user", "servico")
+    list_filter = ("status", ("barbeiro", BarbeiroListFilter), "servico")
     search_fields = (
         "cliente__username",
         "cliente__first_name",
@@ -46,3 +71,89 @@ class MarcacaoAdmin(admin.ModelAdmin):
     )
     date_hierarchy = "inicio"
     ordering = ("-inicio",)
+    actions = ("confirmar_selecionadas", "cancelar_selecionadas")
+
+    @admin.action(description="Confirmar marcações selecionadas")
+    def confirmar_selecionadas(self, request, queryset):
+        changed, ignoradas = alterar_estado(queryset, "confirmed")
+        self.message_user(request, f"{changed} marcação(ões) confirmada(s).")
+        if ignoradas:
+            self.message_user(
+                request,
+                f"{ignoradas} marcação(ões) cancelada(s) não foram confirmadas "
+                "(o horário pode já estar ocupado).",
+                messages.WARNING,
+            )
+
+    @admin.action(description="Cancelar marcações selecionadas")
+    def cancelar_selecionadas(self, request, queryset):
+        changed, _ignoradas = alterar_estado(queryset, "cancelled")
+        self.message_user(request, f"{changed} marcação(ões) cancelada(s).")
+
+
+@admin.register(MarcacaoArquivo)
+class MarcacaoArquivoAdmin(admin.ModelAdmin):
+    """Só de leitura: as marcações chegam aqui pelo comando archive_bookings."""
+
+    list_display = ("cliente", "barbeiro", "servico", "inicio", "status", "arquivada_em")
+    list_select_related = ("cliente", "barbeiro__user", "servico")
+    list_filter = ("status", ("barbeiro", BarbeiroListFilter))
+    search_fields = ("cliente__username", "barbeiro__user__username", "servico__nome")
+    date_hierarchy = "inicio"
+    ordering = ("-inicio",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# --------------------------
+# HORÁRIOS
+# --------------------------
+@admin.register(HorarioSemanal)
+class HorarioSemanalAdmin(admin.ModelAdmin):
+    list_display = ("barbeiro", "dia_semana", "inicio", "fim")
+    list_select_related = ("barbeiro__user",)
+    list_filter = ("dia_semana", ("barbeiro", BarbeiroListFilter))
+
+
+@admin.register(Pausa)
+class PausaAdmin(admin.ModelAdmin):
+    list_display = ("descricao", "barbeiro", "dia_semana", "inicio", "fim")
+    list_select_related = ("barbeiro__user",)
+    list_filter = ("dia_semana", ("barbeiro", BarbeiroListFilter))
+
+
+@admin.register(Feriado)
+class FeriadoAdmin(admin.ModelAdmin):
+    list_display = ("data", "nome")
+    date_hierarchy = "data"
+
+
+@admin.register(Ausencia)
+class AusenciaAdmin(admin.ModelAdmin):
+    list_display = ("barbeiro", "inicio", "fim", "motivo")
+    list_select_related = ("barbeiro__user",)
+    list_filter = (("barbeiro", BarbeiroListFilter),)
+    date_hierarchy = "inicio"
+
+
+# --------------------------
+# FILA DE TAREFAS
+# --------------------------
+@admin.register(Tarefa)
+class TarefaAdmin(admin.ModelAdmin):
+    list_display = ("nome", "estado", "tentativas", "executar_em", "criada_em", "concluida_em")
+    list_filter = ("estado", "nome")
+    search_fields = ("nome", "chave")
+    date_hierarchy = "criada_em"
+    ordering = ("-criada_em",)
+    readonly_fields = ("reservada_por", "reservada_em", "erro", "criada_em", "concluida_em")
+    actions = ("repetir",)
+
+    @admin.action(description="Voltar a pôr na fila")
+    def repetir(self, request, queryset):
+        changed = queryset.filter(estado="failed").update(estado="pending", executar_em=timezone.now(), tentativas=0)
+        self.message_user(request, f"{changed} tarefa(s) de novo na fila.")
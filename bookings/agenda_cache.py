@@ -0,0 +1,40 @@
+# bookings/agenda_cache.py
+"""
+Versão da agenda de cada barbeiro, para o GET condicional do feed ICS.
+
+Tal como em catalog_cache, a versão é um timestamp em ns guardado na BD
+(versions.py), por isso todos os workers a veem. É trocada pelos sinais
+sempre que uma marcação do barbeiro é criada, alterada, cancelada ou
+apagada, e pelos comandos que gravam marcações sem sinais (importação e
+arquivo).
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from . import versions
+
+
+def _name(barbeiro_id):
+    return f"agenda:{barbeiro_id}"
+
+
+def version(barbeiro_id):
+    return versions.get(_name(barbeiro_id))
+
+
+def bump(barbeiro_ids):
+    versions.bump(*(_name(barbeiro_id) for barbeiro_id in set(barbeiro_ids)))
+
+
+# ----------------------------
+# GET CONDICIONAL
+# ----------------------------
+def etag(request, barbeiro_id, *args, **kwargs):
+    return f"agenda-{barbeiro_id}-{version(barbeiro_id)}"
+
+
+def last_modified(request, barbeiro_id, *args, **kwargs):
+    value = version(barbeiro_id)
+    if not value:  # agenda nunca alterada desde que há versões
+        return None
+    # precisão de segundos (HTTP-date): arredonda para cima
+    return datetime.fromtimestamp(value // 10**9 + 1, tz=dt_timezone.utc)
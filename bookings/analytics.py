@@ -0,0 +1,222 @@
+# bookings/analytics.py
+"""
+Receita, utilização e serviços mais procurados.
+
+As contas são feitas em SQL (Sum/Count agrupados por dia) e guardadas em
+duas tabelas de resumo:
+
+    ResumoDiario      marcações, canceladas, minutos e receita por
+                      (barbeiro, dia, serviço)
+    CapacidadeDiaria  minutos de trabalho por (barbeiro, dia), do horário
+                      em schedule.py
+
+Os relatórios lêem só os resumos, por isso um intervalo de anos custa o
+mesmo que um mês. Cada alteração a uma marcação enfileira o recálculo do
+seu dia (ver signals.py); o comando `refresh_rollups` refaz um intervalo
+inteiro (à noite, ou com --all depois de uma importação).
+
+A receita conta as marcações não canceladas (também as já arquivadas, ver
+archive.py), ao preço atual do serviço no momento do recálculo.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from . import schedule
+from .availability import day_bounds, month_bounds
+from .archive import reaches_archive
+from .models import Barbeiro, CapacidadeDiaria, Marcacao, MarcacaoArquivo, ResumoDiario
+from .tasks import enqueue_many, task
+
+BATCH_SIZE = 1000
+
+
+# ----------------------------
+# RECÁLCULO DOS RESUMOS
+# ----------------------------
+def _aggregate_model(model, range_start, range_end, barbeiro_ids):
+    # uma query: marcações do intervalo agrupadas por (barbeiro, dia local, serviço)
+    qs = model.objects.filter(
+        inicio__gte=range_start, inicio__lt=range_end, barbeiro_id__in=list(barbeiro_ids)
+    )
+    ativa = ~Q(status="cancelled")
+    return (
+        qs.annotate(dia=TruncDate("inicio", tzinfo=timezone.get_current_timezone()))
+        .values("barbeiro_id", "dia", "servico_id")
+        .annotate(
+            marcacoes=Count("id", filter=ativa),
+            canceladas=Count("id", filter=Q(status="cancelled")),
+            minutos=Sum("servico__duracao_min", filter=ativa, default=0),
+            receita=Sum("servico__preco", filter=ativa, default=0),
+        )
+        .order_by()
+    )
+
+
+def _aggregate(date_from, date_to, barbeiro_ids):
+    """Totais por (barbeiro, dia, serviço), somando a tabela ativa e o arquivo."""
+    range_start, _ = day_bounds(date_from)
+    _, range_end = day_bounds(date_to)
+    totals = {}
+    models = [Marcacao]
+    if reaches_archive(range_start):
+        models.append(MarcacaoArquivo)
+    for model in models:
+        for row in _aggregate_model(model, range_start, range_end, barbeiro_ids):
+            key = (row["barbeiro_id"], row["dia"], row["servico_id"])
+            if key in totals:
+                for field in ("marcacoes", "canceladas", "minutos", "receita"):
+                    totals[key][field] += row[field]
+            else:
+                totals[key] = row
+    return totals.values()
+
+
+def refresh(date_from, date_to, barbeiro_ids=None):
+    """
+    Recalcula os resumos de date_from a date_to (inclusive), de todos os
+    barbeiros ou só dos indicados. Idempotente: substitui as linhas do
+    intervalo. Retorna o nº de linhas de ResumoDiario escritas.
+    """
+    if barbeiro_ids is None:
+        barbeiro_ids = list(Barbeiro.objects.values_list("pk", flat=True))
+    barbeiro_ids = list(barbeiro_ids)
+    if not barbeiro_ids:
+        return 0
+
+    resumos = [
+        ResumoDiario(
+            barbeiro_id=row["barbeiro_id"],
+            dia=row["dia"],
+            servico_id=row["servico_id"],
+            marcacoes=row["marcacoes"],
+            canceladas=row["canceladas"],
+            minutos=row["minutos"],
+            receita=row["receita"],
+        )
+        for row in _aggregate(date_from, date_to, barbeiro_ids)
+    ]
+    capacidade = [
+        CapacidadeDiaria(
+            barbeiro_id=barbeiro_id,
+            dia=dia,
+            minutos_abertos=sum(fim - inicio for inicio, fim in intervals),
+        )
+        for barbeiro_id, days in schedule.open_minutes(barbeiro_ids, date_from, date_to).items()
+        for dia, intervals in days.items()
+    ]
+
+    with transaction.atomic():
+        ResumoDiario.objects.filter(
+            barbeiro_id__in=barbeiro_ids, dia__gte=date_from, dia__lte=date_to
+        ).delete()
+        CapacidadeDiaria.objects.filter(
+            barbeiro_id__in=barbeiro_ids, dia__gte=date_from, dia__lte=date_to
+        ).delete()
+        ResumoDiario.objects.bulk_create(resumos, batch_size=BATCH_SIZE)
+        CapacidadeDiaria.objects.bulk_create(capacidade, batch_size=BATCH_SIZE)
+    return len(resumos)
+
+
+def refresh_range(date_from, date_to):
+    """refresh() de um intervalo longo, um mês de cada vez (uma transação por mês)."""
+    total = 0
+    month = date_from
+    while month <= date_to:
+        first, last = month_bounds(month)
+        total += refresh(max(first, date_from), min(last, date_to))
+        month = last + timedelta(days=1)
+    return total
+
+
+def _key(barbeiro_id, dia):
+    return f"resumo:{barbeiro_id}:{dia.isoformat()}"
+
+
+def refresh_days(pairs):
+    """
+    Enfileira o recálculo de cada (barbeiro_id, dia), depois do commit. Um
+    dia que já está na fila não entra outra vez; um que já está a ser
+    recalculado entra (dedupe_running=False), porque pode ter lido a BD
+    antes desta alteração.
+    """
+    enqueue_many([
+        (atualizar_resumo, {"barbeiro_id": barbeiro_id, "dia": dia.isoformat()}, _key(barbeiro_id, dia), None)
+        for barbeiro_id, dia in set(pairs)
+        if barbeiro_id
+    ])
+
+
+@task(name="bookings.atualizar_resumo", dedupe_running=False)
+def atualizar_resumo(barbeiro_id, dia):
+    dia = date.fromisoformat(dia)
+    refresh(dia, dia, [barbeiro_id])
+
+
+# ----------------------------
+# RELATÓRIOS
+# ----------------------------
+def resumo_mensal(date_from, date_to):
+    """
+    Receita e utilização por barbeiro e por mês, de date_from a date_to
+    (inclusive). Duas queries, ambas sobre os resumos.
+
+    Retorna uma lista de dicts (mes, barbeiro_id, marcacoes, canceladas,
+    minutos, receita, minutos_abertos, utilizacao) por ordem de mês.
+    """
+    periodo = Q(dia__gte=date_from, dia__lte=date_to)
+    rows = (
+        ResumoDiario.objects.filter(periodo)
+        .annotate(mes=TruncMonth("dia"))
+        .values("mes", "barbeiro_id")
+        .annotate(
+            marcacoes=Sum("marcacoes"),
+            canceladas=Sum("canceladas"),
+            minutos=Sum("minutos"),
+            receita=Sum("receita"),
+        )
+        .order_by("mes", "barbeiro_id")
+    )
+    abertos = {
+        (row["mes"], row["barbeiro_id"]): row["minutos_abertos"]
+        for row in CapacidadeDiaria.objects.filter(periodo)
+        .annotate(mes=TruncMonth("dia"))
+        .values("mes", "barbeiro_id")
+        .annotate(minutos_abertos=Sum("minutos_abertos"))
+        .order_by()
+    }
+
+    # meses em que o barbeiro trabalhou sem marcações contam com utilização 0
+    result = {(row["mes"], row["barbeiro_id"]): row for row in rows}
+    for key in abertos.keys() - result.keys():
+        result[key] = {
+            "mes": key[0], "barbeiro_id": key[1],
+            "marcacoes": 0, "canceladas": 0, "minutos": 0, "receita": Decimal("0"),
+        }
+    for key, row in result.items():
+        minutos_abertos = abertos.get(key, 0)
+        row["minutos_abertos"] = minutos_abertos
+        row["utilizacao"] = row["minutos"] / minutos_abertos if minutos_abertos else None
+    return [result[key] for key in sorted(result)]
+
+
+def servicos_populares(date_from, date_to, limit=10):
+    """Serviços com mais marcações (não canceladas) no intervalo."""
+    return list(
+        ResumoDiario.objects.filter(dia__gte=date_from, dia__lte=date_to)
+        .values("servico_id", "servico__nome")
+        .annotate(marcacoes=Sum("marcacoes"), receita=Sum("receita"))
+        .filter(marcacoes__gt=0)
+        .order_by("-marcacoes", "servico_id")[:limit]
+    )
+
+
+def default_period(today=None):
+    """Últimos 12 meses completos mais o mês atual."""
+    today = today or timezone.localdate()
+    first = (today.replace(day=1) - timedelta(days=365)).replace(day=1)
+    return first, today
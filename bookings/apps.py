@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class BookingsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "bookings"
+
+    def ready(self):
+        # liga os recetores de sinais (invalidação de caches, etc.) e regista
+        # as tarefas de segundo plano
+        from . import analytics, images, notifications, signals  # noqa: F401
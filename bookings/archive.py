@@ -0,0 +1,111 @@
+# bookings/archive.py
+"""
+Arquivo das marcações antigas (partição "fria").
+
+As marcações com início anterior a ARCHIVE_RETENTION_DAYS dias passam, por
+lotes, de Marcacao para MarcacaoArquivo (mesma forma, mesmo id). Cada lote é
+uma transação curta: copiar, apagar e commit, por isso os escritores do
+wizard nunca esperam muito. A tabela ativa fica só com o período recente.
+
+Quem lê histórico não precisa de saber onde está cada linha:
+
+    dashboard/agenda     pagination.paginate(..., archive=qs) junta as duas
+                         tabelas quando a janela chega ao arquivo
+    analytics, exports   e imports leem/consultam as duas
+
+Definições:
+    ARCHIVE_RETENTION_DAYS  dias de histórico na tabela ativa (omissão 365)
+"""
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import agenda_cache, availability_cache, versions
+from .availability import day_bounds
+from .models import Marcacao, MarcacaoArquivo
+
+BATCH_SIZE = 1000
+VERSION_NAME = "archive"  # trocada por cada lote arquivado (versions.py)
+FIELDS = ("id", "cliente_id", "barbeiro_id", "servico_id", "inicio", "criado_em", "status")
+
+
+def retention_days():
+    return getattr(settings, "ARCHIVE_RETENTION_DAYS", 365)
+
+
+def cutoff(days=None):
+    """Instante (00:00 local) antes do qual as marcações vão para o arquivo."""
+    days = retention_days() if days is None else days
+    start, _ = day_bounds(timezone.localdate() - timedelta(days=days))
+    return start
+
+
+# ----------------------------
+# MOVER PARA O ARQUIVO
+# ----------------------------
+def archive_batch(before, batch_size=BATCH_SIZE):
+    """
+    Move até `batch_size` marcações com início < `before` (as mais antigas
+    primeiro) numa transação. Retorna quantas moveu.
+    """
+    with transaction.atomic():
+        rows = list(
+            Marcacao.objects.filter(inicio__lt=before)
+            .order_by("inicio", "id")
+            .values(*FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        # ignore_conflicts: um lote repetido depois de uma falha não rebenta
+        MarcacaoArquivo.objects.bulk_create(
+            (MarcacaoArquivo(**row) for row in rows), ignore_conflicts=True
+        )
+        ids = [row["id"] for row in rows]
+        # DELETE direto, sem os sinais de post_delete: a marcação não
+        # desaparece, só muda de tabela (resumos e disponibilidade não mudam)
+        Marcacao.objects.filter(pk__in=ids)._raw_delete(Marcacao.objects.db)
+        versions.bump(VERSION_NAME)
+        barbeiro_ids = {row["barbeiro_id"] for row in rows}
+        transaction.on_commit(lambda: agenda_cache.bump(barbeiro_ids))
+        # dias passados: as versões da disponibilidade já não servem
+        availability_cache.forget(
+            {(row["barbeiro_id"], timezone.localtime(row["inicio"]).date()) for row in rows}
+        )
+    return len(rows)
+
+
+# ----------------------------
+# LEITURA DAS DUAS TABELAS
+# ----------------------------
+def horizon():
+    """
+    Início da marcação arquivada mais recente (ou None). O arquivo é
+    preenchido por outro processo (archive_bookings), por isso o valor fica
+    em cache com a versão partilhada VERSION_NAME na chave: os outros
+    workers deixam de o usar ao fim de VERSIONS_CACHE_TIMEOUT, e até lá
+    ler o horizonte não custa nenhuma query.
+    """
+    key = f"archive:horizon:{versions.get(VERSION_NAME)}"
+    found = cache.get(key)
+    if found is None:
+        # num tuplo, para distinguir "arquivo vazio" de "não está em cache"
+        found = (MarcacaoArquivo.objects.aggregate(latest=Max("inicio"))["latest"],)
+        cache.set(key, found, None)
+    return found[0]
+
+
+def reaches_archive(start):
+    """True se uma janela que começa em `start` pode ter linhas no arquivo."""
+    latest = horizon()
+    return latest is not None and latest >= start
+
+
+def merge_desc(*iterables, limit=None):
+    """Junta listas já ordenadas por (-inicio, -id), mantendo a ordem."""
+    merged = heapq.merge(*iterables, key=lambda m: (m.inicio, m.pk), reverse=True)
+    return list(merged)[:limit] if limit is not None else list(merged)
@@ -0,0 +1,292 @@
+# bookings/availability.py
+"""
+Motor de disponibilidade.
+
+Cada (barbeiro, dia) é representado por um DayOccupancy (ver occupancy.py):
+um byte por minuto, com o horário de trabalho aberto (schedule.py) e as
+marcações ativas (não canceladas) marcadas. As marcações de um ou mais
+barbeiros vêm numa única query, já com a duração real de cada serviço.
+
+O que vai para o cache é a ocupação do dia em bytes, não a lista de
+horários, por isso serve qualquer duração de serviço e pode ser atualizada
+no lugar quando uma marcação muda (ver signals.py).
+"""
+import asyncio
+import heapq
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from . import availability_cache, schedule
+from .models import Barbeiro
+from .occupancy import DayOccupancy
+from .queries import marcacoes_ativas
+
+SLOT_STEP_MIN = getattr(settings, "BOOKING_SLOT_STEP_MIN", 15)
+
+
+# ----------------------------
+# LIMITES TEMPORAIS
+# ----------------------------
+def _aware(day: date, t: time) -> datetime:
+    return timezone.make_aware(datetime.combine(day, t), timezone.get_current_timezone())
+
+
+def day_bounds(day: date):
+    """Retorna (00:00 do dia, 00:00 do dia seguinte) no fuso local."""
+    return _aware(day, time.min), _aware(day + timedelta(days=1), time.min)
+
+
+# ----------------------------
+# OCUPAÇÃO
+# ----------------------------
+def bookings_by_day(barbeiro_ids, date_from: date, date_to: date):
+    """
+    Marcações ativas por barbeiro e por dia (local), entre date_from e
+    date_to (inclusive). Faz uma única query.
+
+    Retorna {barbeiro_id: {dia: [(inicio, duração), ...]}}.
+    """
+    range_start, _ = day_bounds(date_from)
+    _, range_end = day_bounds(date_to)
+
+    rows = marcacoes_ativas(barbeiro_ids, range_start, range_end).values_list(
+        "barbeiro_id", "inicio", "servico__duracao_min"
+    )
+
+    result = {}
+    for barbeiro_id, inicio, duracao in rows:
+        day = timezone.localtime(inicio).date()
+        result.setdefault(barbeiro_id, {}).setdefault(day, []).append((inicio, duracao))
+    return result
+
+
+def day_occupancy(barbeiro_id, day: date):
+    """Ocupação de um barbeiro num dia, lida da BD (três queries)."""
+    bookings = bookings_by_day([barbeiro_id], day, day).get(barbeiro_id, {}).get(day, [])
+    opening = schedule.open_minutes([barbeiro_id], day, day)[barbeiro_id].get(day, [])
+    return DayOccupancy.build(day, opening, bookings)
+
+
+def day_occupancies(barbeiro_ids, day: date):
+    """Como day_occupancy, para vários barbeiros de uma vez (as mesmas três queries)."""
+    barbeiro_ids = list(barbeiro_ids)
+    bookings = bookings_by_day(barbeiro_ids, day, day)
+    opening = schedule.open_minutes(barbeiro_ids, day, day)
+    return {
+        barbeiro_id: DayOccupancy.build(
+            day, opening[barbeiro_id].get(day, []), bookings.get(barbeiro_id, {}).get(day, ())
+        )
+        for barbeiro_id in barbeiro_ids
+    }
+
+
+async def aday_occupancy(barbeiro_id, day: date):
+    """Versão assíncrona (ORM async) de day_occupancy."""
+    range_start, range_end = day_bounds(day)
+    rows = marcacoes_ativas([barbeiro_id], range_start, range_end).values_list(
+        "inicio", "servico__duracao_min"
+    )
+
+    async def bookings():
+        return [row async for row in rows]
+
+    bookings, opening = await asyncio.gather(
+        bookings(),
+        sync_to_async(schedule.open_minutes)([barbeiro_id], day, day),
+    )
+    return DayOccupancy.build(day, opening[barbeiro_id].get(day, []), bookings)
+
+
+# ----------------------------
+# API DE ALTO NÍVEL
+# ----------------------------
+def cached_occupancy(barbeiro_id, day: date):
+    """Ocupação do dia a partir do cache (ou da BD, se faltar)."""
+    data = availability_cache.get_or_compute(
+        barbeiro_id, day, lambda: day_occupancy(barbeiro_id, day).to_bytes()
+    )
+    return DayOccupancy.from_bytes(day, data)
+
+
+def cached_occupancies(barbeiro_ids, day: date):
+    """{barbeiro_id: ocupação do dia}; os que faltam no cache vêm da BD juntos."""
+    def compute(missing):
+        return {b: occupancy.to_bytes() for b, occupancy in day_occupancies(missing, day).items()}
+
+    found = availability_cache.get_or_compute_many(barbeiro_ids, day, compute)
+    return {barbeiro_id: DayOccupancy.from_bytes(day, data) for barbeiro_id, data in found.items()}
+
+
+def slots_for_day(barbeiro, day: date, duration_min: int):
+    """
+    Horários livres de um barbeiro num dia. Em caso de falha no cache faz
+    uma query às marcações e duas ao horário (feriados e ausências); os
+    horários já passados ficam de fora.
+    """
+    barbeiro_id = getattr(barbeiro, "pk", barbeiro)
+    occupancy = cached_occupancy(barbeiro_id, day)
+    return occupancy.slots(duration_min, SLOT_STEP_MIN, not_before=timezone.now())
+
+
+def slots_for_barbers(barbeiro_ids, day: date, duration_min: int):
+    """
+    {barbeiro_id: horários livres} de vários barbeiros num dia. Os dias que
+    faltam no cache vêm da BD todos juntos (as mesmas três queries de um
+    só barbeiro).
+    """
+    now = timezone.now()
+    return {
+        barbeiro_id: occupancy.slots(duration_min, SLOT_STEP_MIN, not_before=now)
+        for barbeiro_id, occupancy in cached_occupancies(barbeiro_ids, day).items()
+    }
+
+
+async def aslots_for_day(barbeiro_id, day: date, duration_min: int):
+    """Versão assíncrona de slots_for_day (partilha o mesmo cache)."""
+    async def compute():
+        return (await aday_occupancy(barbeiro_id, day)).to_bytes()
+
+    data = await availability_cache.aget_or_compute(barbeiro_id, day, compute)
+    occupancy = DayOccupancy.from_bytes(day, data)
+    return occupancy.slots(duration_min, SLOT_STEP_MIN, not_before=timezone.now())
+
+
+def apply_booking(barbeiro_id, inicio, duracao, release=False):
+    """
+    Marca (ou liberta) [inicio, inicio + duração) na ocupação em cache do
+    dia, sem reconstruir o dia a partir da BD.
+    """
+    day = timezone.localtime(inicio).date()
+
+    def change(data):
+        occupancy = DayOccupancy.from_bytes(day, data)
+        if release:
+            occupancy.release(inicio, duracao)
+        else:
+            occupancy.book(inicio, duracao)
+        return occupancy.to_bytes()
+
+    availability_cache.update(barbeiro_id, day, change)
+
+
+def _tagged(barbeiro_id, slots):
+    for slot in slots:
+        yield slot, barbeiro_id
+
+
+def earliest_slots(servico, date_from: date, date_to: date, barbeiros=None, limit=10):
+    """
+    Os `limit` horários livres mais cedo para `servico`, em qualquer barbeiro
+    ativo (ou apenas nos indicados), entre date_from e date_to (inclusive).
+
+    Faz quatro queries (barbeiros, marcações, feriados e ausências do
+    período). A ocupação de cada dia só é montada quando o dia é percorrido;
+    os horários de todos os barbeiros são fundidos por ordem com
+    heapq.merge e o cálculo pára assim que há resultados suficientes.
+
+    Retorna uma lista de (inicio, barbeiro).
+    """
+    qs = Barbeiro.objects.filter(ativo=True).select_related("user")
+    if barbeiros is not None:
+        qs = qs.filter(pk__in=[getattr(b, "pk", b) for b in barbeiros])
+    by_id = {b.pk: b for b in qs}
+    if not by_id or limit <= 0:
+        return []
+
+    bookings = bookings_by_day(by_id.keys(), date_from, date_to)
+    opening = schedule.open_minutes(by_id.keys(), date_from, date_to)
+    now = timezone.now()
+
+    found = []
+    day = max(date_from, timezone.localdate(now))
+    while day <= date_to and len(found) < limit:
+        streams = [
+            _tagged(
+                barbeiro_id,
+                DayOccupancy.build(
+                    day, opening[barbeiro_id][day], bookings.get(barbeiro_id, {}).get(day, ())
+                ).iter_slots(servico.duracao_min, SLOT_STEP_MIN, not_before=now),
+            )
+            for barbeiro_id in by_id
+            if day in opening[barbeiro_id]
+        ]
+        merged = heapq.merge(*streams)
+        found.extend(islice(merged, limit - len(found)))
+        day += timedelta(days=1)
+
+    return [(slot, by_id[barbeiro_id]) for slot, barbeiro_id in found]
+
+
+# ----------------------------
+# RESUMO DO MÊS
+# ----------------------------
+def month_bounds(month: date):
+    """(primeiro dia, último dia) do mês de `month`."""
+    first = month.replace(day=1)
+    next_month = (first + timedelta(days=32)).replace(day=1)
+    return first, next_month - timedelta(days=1)
+
+
+def _count_month(barbeiro_ids, first: date, last: date, duration_min: int):
+    # uma query às marcações do mês (e duas ao horário) e um varrimento por
+    # barbeiro/dia; com vários barbeiros conta horas distintas
+    bookings = bookings_by_day(barbeiro_ids, first, last)
+    opening = schedule.open_minutes(barbeiro_ids, first, last)
+
+    counts = {}
+    day = first
+    while day <= last:
+        starts = set()
+        for barbeiro_id in barbeiro_ids:
+            if day in opening[barbeiro_id]:
+                occupancy = DayOccupancy.build(
+                    day, opening[barbeiro_id][day], bookings.get(barbeiro_id, {}).get(day, ())
+                )
+                starts.update(occupancy.iter_free(duration_min, SLOT_STEP_MIN))
+        counts[day] = len(starts)
+        day += timedelta(days=1)
+    return counts
+
+
+def month_free_counts(servico, month: date, barbeiros=None):
+    """
+    Número de horários livres por dia no mês de `month` para `servico`, num
+    barbeiro, em vários ou em qualquer barbeiro ativo (barbeiros=None).
+
+    O mês inteiro é calculado de uma vez e fica em cache (invalidado como os
+    dias); o dia de hoje é recontado à leitura, sem os horários já passados,
+    a partir da ocupação em cache de cada barbeiro (os que faltam vêm da BD
+    todos juntos, com as mesmas três queries).
+
+    Retorna {dia: contagem} por ordem, com 0 nos dias já passados.
+    """
+    if barbeiros is None:
+        barbeiro_ids = list(Barbeiro.objects.filter(ativo=True).values_list("pk", flat=True))
+    else:
+        barbeiro_ids = [getattr(b, "pk", b) for b in barbeiros]
+    first, last = month_bounds(month)
+    if not barbeiro_ids:
+        return {first + timedelta(days=i): 0 for i in range((last - first).days + 1)}
+
+    counts = availability_cache.get_or_compute_month(
+        barbeiro_ids, first, servico.duracao_min,
+        lambda: _count_month(barbeiro_ids, first, last, servico.duracao_min),
+    )
+
+    now = timezone.now()
+    today = timezone.localdate(now)
+    result = {}
+    for day, count in counts.items():
+        if day < today:
+            count = 0
+        elif day == today:
+            starts = set()
+            for occupancy in cached_occupancies(barbeiro_ids, day).values():
+                starts.update(occupancy.iter_slots(servico.duracao_min, SLOT_STEP_MIN, not_before=now))
+            count = len(starts)
+        result[day] = count
+    return result
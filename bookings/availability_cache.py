@@ -0,0 +1,209 @@
+# bookings/availability_cache.py
+"""
+Cache da ocupação (availability.DayOccupancy em bytes) por (barbeiro, dia).
+
+Usa o cache do Django (LocMemCache por omissão, que descarta por LRU). Cada
+(barbeiro, dia) tem uma versão própria que entra na chave das entradas;
+invalidar é apenas trocar essa versão, por isso nunca é preciso procurar
+chaves por padrão; update() faz o mesmo mas grava logo o valor alterado com
+a versão nova, sem voltar à BD. Há ainda uma geração global, trocada quando
+os serviços ou os horários mudam.
+
+Os resumos mensais (get_or_compute_month) usam uma versão por (barbeiro,
+mês), trocada juntamente com a de cada dia desse mês.
+
+Todas as versões ficam na BD (versions.py), para que os outros workers
+deixem de servir o valor antigo ao fim de VERSIONS_CACHE_TIMEOUT; só os
+valores vivem no cache de cada processo. As versões dos dias que passam
+para o arquivo são apagadas (forget).
+"""
+import hashlib
+from datetime import date
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import versions as db_versions
+
+GEN_NAME = "availability"
+
+_stats = {"hits": 0, "misses": 0, "invalidations": 0, "updates": 0}
+_lock = Lock()
+
+
+def _cache():
+    return caches[getattr(settings, "AVAILABILITY_CACHE_ALIAS", "default")]
+
+
+def _timeout():
+    return getattr(settings, "AVAILABILITY_CACHE_TIMEOUT", 300)
+
+
+def _count(name, n=1):
+    with _lock:
+        _stats[name] += n
+
+
+def _day_name(barbeiro_id, day: date):
+    return f"{GEN_NAME}:{barbeiro_id}:{day.isoformat()}"
+
+
+def _month_name(barbeiro_id, day: date):
+    return f"{GEN_NAME}:{barbeiro_id}:{day:%Y-%m}"
+
+
+def _key(barbeiro_id, day: date, versions):
+    version = versions[_day_name(barbeiro_id, day)]
+    return f"avail:{barbeiro_id}:{day.isoformat()}:{versions[GEN_NAME]}:{version}"
+
+
+def _versions(names):
+    # a geração e as versões pedidas numa só leitura
+    return db_versions.get_many([GEN_NAME, *names])
+
+
+# ----------------------------
+# LEITURA
+# ----------------------------
+def get_or_compute(barbeiro_id, day: date, compute):
+    """Devolve o valor em cache ou calcula-o com compute() e guarda-o."""
+    cache = _cache()
+    versions = _versions([_day_name(barbeiro_id, day)])
+    key = _key(barbeiro_id, day, versions)
+
+    value = cache.get(key)
+    if value is None:
+        _count("misses")
+        value = compute()
+        cache.set(key, value, _timeout())
+    else:
+        _count("hits")
+    return value
+
+
+def get_or_compute_many(barbeiro_ids, day: date, compute):
+    """
+    Como get_or_compute, para vários barbeiros no mesmo dia: lê tudo com um
+    get_many e calcula os que faltam de uma vez, com compute(ids) ->
+    {barbeiro_id: valor}. Retorna {barbeiro_id: valor}.
+    """
+    cache = _cache()
+    barbeiro_ids = list(barbeiro_ids)
+    versions = _versions([_day_name(b, day) for b in barbeiro_ids])
+    keys = {b: _key(b, day, versions) for b in barbeiro_ids}
+    found = cache.get_many(keys.values())
+    values = {b: found[key] for b, key in keys.items() if key in found}
+
+    missing = [b for b in barbeiro_ids if b not in values]
+    _count("hits", len(values))
+    if missing:
+        _count("misses", len(missing))
+        computed = compute(missing)
+        cache.set_many({keys[b]: computed[b] for b in missing}, _timeout())
+        values.update(computed)
+    return values
+
+
+async def aget_or_compute(barbeiro_id, day: date, acompute):
+    """Versão assíncrona de get_or_compute; `acompute` é uma coroutine function."""
+    cache = _cache()
+    versions = await db_versions.aget_many([GEN_NAME, _day_name(barbeiro_id, day)])
+    key = _key(barbeiro_id, day, versions)
+
+    value = await cache.aget(key)
+    if value is None:
+        _count("misses")
+        value = await acompute()
+        await cache.aset(key, value, _timeout())
+    else:
+        _count("hits")
+    return value
+
+
+def get_or_compute_month(barbeiro_ids, month: date, variant, compute):
+    """
+    Como get_or_compute, para um valor que depende de vários barbeiros num
+    mês inteiro (`month` é qualquer dia desse mês). `variant` distingue
+    valores diferentes para o mesmo conjunto (ex.: a duração do serviço).
+    """
+    cache = _cache()
+    names = [_month_name(b, month) for b in sorted(barbeiro_ids)]
+    versions = _versions(names)
+    # a lista de barbeiros pode ser longa: entra na chave como hash
+    digest = hashlib.sha1(
+        ",".join(f"{name}={versions[name]}" for name in names).encode()
+    ).hexdigest()
+    key = f"avail:month:{month:%Y-%m}:{variant}:{versions[GEN_NAME]}:{digest}"
+
+    value = cache.get(key)
+    if value is None:
+        _count("misses")
+        value = compute()
+        cache.set(key, value, _timeout())
+    else:
+        _count("hits")
+    return value
+
+
+# ----------------------------
+# INVALIDAÇÃO
+# ----------------------------
+def invalidate(pairs):
+    """Invalida os dias indicados: iterável de (barbeiro_id, dia)."""
+    pairs = set(pairs)
+    if not pairs:
+        return
+    db_versions.bump(*({_day_name(b, d) for b, d in pairs} | {_month_name(b, d) for b, d in pairs}))
+    _count("invalidations", len(pairs))
+
+
+def update(barbeiro_id, day: date, change):
+    """
+    Aplica change(valor) -> valor ao que estiver em cache para o dia e grava
+    o resultado com a versão nova (as leituras seguintes já o veem). Se o
+    dia não estiver em cache, é só invalidado.
+
+    Dois processos a atualizar o mesmo dia ao mesmo tempo podem perder uma
+    das alterações até o valor expirar; a escrita (services.criar_marcacao)
+    volta sempre a verificar na BD.
+    """
+    cache = _cache()
+    name = _day_name(barbeiro_id, day)
+    versions = _versions([name])
+    value = cache.get(_key(barbeiro_id, day, versions))
+
+    versions[name] = db_versions.bump(name, _month_name(barbeiro_id, day))
+    if value is not None:
+        cache.set(_key(barbeiro_id, day, versions), change(value), _timeout())
+        _count("updates")
+    else:
+        _count("invalidations")
+
+
+def forget(pairs):
+    """Apaga as versões dos dias indicados (ex.: já arquivados)."""
+    db_versions.forget(*{_day_name(b, d) for b, d in pairs})
+
+
+def invalidate_all():
+    db_versions.bump(GEN_NAME)
+    _count("invalidations")
+
+
+# ----------------------------
+# ESTATÍSTICAS
+# ----------------------------
+def stats():
+    """Contadores deste processo e a taxa de acerto."""
+    with _lock:
+        data = dict(_stats)
+    lookups = data["hits"] + data["misses"]
+    data["hit_ratio"] = round(data["hits"] / lookups, 4) if lookups else None
+    return data
+
+
+def reset_stats():
+    with _lock:
+        for name in _stats:
+            _stats[name] = 0
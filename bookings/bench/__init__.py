@@ -0,0 +1,6 @@
+"""
+Benchmark do wizard de marcações (ver `manage.py bench`).
+
+seed    cria uma barbearia sintética (barbeiros, serviços, histórico)
+runner  percorre as views reais com o test client, em várias threads
+"""
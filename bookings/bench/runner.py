@@ -0,0 +1,238 @@
+# bookings/bench/runner.py
+"""
+Percorre as views reais (bookings/urls.py) com o test client do Django,
+em várias threads, e mede latência e queries por pedido.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.db import DatabaseError, connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.availability import SLOT_STEP_MIN
+from bookings.schedule import WORK_END, WORK_START
+
+
+# ----------------------------
+# CENÁRIOS
+# ----------------------------
+# Cada cenário recebe (client, shop, rng), faz um pedido e devolve a resposta.
+# `as_barber` indica que o client deve entrar como barbeiro.
+def _index(client, shop, rng):
+    return client.get(reverse("bookings:index"))
+
+
+def _services_list(client, shop, rng):
+    return client.get(reverse("bookings:services_list"))
+
+
+def _choose_barber(client, shop, rng):
+    servico = rng.choice(shop.servicos)
+    return client.get(reverse("bookings:choose_barber", args=[servico.pk]))
+
+
+def _choose_datetime(client, shop, rng):
+    servico = rng.choice(shop.servicos)
+    barbeiro = rng.choice(shop.barbeiros)
+    day = timezone.localdate() + timedelta(days=rng.randrange(0, 14))
+    url = reverse("bookings:choose_datetime", args=[servico.pk, barbeiro.pk])
+    return client.get(url, {"date": day.isoformat()})
+
+
+def _create_booking(client, shop, rng):
+    day = timezone.localdate() + timedelta(days=rng.randrange(1, 60))
+    steps = (WORK_END.hour - WORK_START.hour) * 60 // SLOT_STEP_MIN
+    naive = datetime.combine(day, WORK_START) + timedelta(minutes=SLOT_STEP_MIN * rng.randrange(steps))
+    return client.post(reverse("bookings:create_booking"), {
+        "servico_id": rng.choice(shop.servicos).pk,
+        "barbeiro_id": rng.choice(shop.barbeiros).pk,
+        "slot": naive.isoformat(),
+    })
+
+
+def _wizard_booking(client, shop, rng):
+    # o wizard completo, como um cliente: barbeiro -> data/hora -> resumo -> gravar
+    servico = rng.choice(shop.servicos)
+    barbeiro = rng.choice(shop.barbeiros)
+    day = timezone.localdate() + timedelta(days=rng.randrange(1, 60))
+    steps = (WORK_END.hour - WORK_START.hour) * 60 // SLOT_STEP_MIN
+    slot = datetime.combine(day, WORK_START) + timedelta(minutes=SLOT_STEP_MIN * rng.randrange(steps))
+    data = {"servico_id": servico.pk, "barbeiro_id": barbeiro.pk, "slot": slot.isoformat()}
+
+    client.get(reverse("bookings:choose_barber", args=[servico.pk]))
+    client.get(reverse("bookings:choose_datetime", args=[servico.pk, barbeiro.pk]), {"date": day.isoformat()})
+    client.post(reverse("bookings:booking_confirm"), data)
+    return client.post(reverse("bookings:create_booking"), data)
+
+
+def _dashboard(client, shop, rng):
+    return client.get(reverse("bookings:dashboard"))
+
+
+def _agenda(client, shop, rng):
+    return client.get(reverse("bookings:agenda_barbeiro"))
+
+
+SCENARIOS = {
+    "index": (_index, False),
+    "services_list": (_services_list, False),
+    "choose_barber": (_choose_barber, False),
+    "choose_datetime": (_choose_datetime, False),
+    "create_booking": (_create_booking, False),
+    "wizard_booking": (_wizard_booking, False),
+    "dashboard": (_dashboard, False),
+    "agenda": (_agenda, True),
+}
+
+
+# ----------------------------
+# ESTATÍSTICAS
+# ----------------------------
+def percentile(values, p):
+    """Percentil por ordem (nearest-rank) de uma lista já ordenada."""
+    if not values:
+        return None
+    k = max(0, min(len(values) - 1, int(round(p * len(values) + 0.5)) - 1))
+    return values[k]
+
+
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def count_writes(captured):
+    """(escritas, escritas a django_session) numa lista de queries capturadas."""
+    writes = [q["sql"] for q in captured if q["sql"].lstrip().upper().startswith(WRITE_PREFIXES)]
+    return len(writes), sum(1 for sql in writes if "django_session" in sql)
+
+
+def summarize(samples):
+    latencies = sorted(ms for ms, *_rest in samples)
+    queries = [q for _ms, q, *_rest in samples]
+    writes = [w for _ms, _q, w, _sw, _ok in samples]
+    session_writes = [sw for _ms, _q, _w, sw, _ok in samples]
+    n = len(samples) or 1
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for *_rest, ok in samples if not ok),
+        "p50_ms": round(percentile(latencies, 0.50) or 0, 3),
+        "p95_ms": round(percentile(latencies, 0.95) or 0, 3),
+        "p99_ms": round(percentile(latencies, 0.99) or 0, 3),
+        "mean_ms": round(sum(latencies) / n, 3),
+        "queries_mean": round(sum(queries) / n, 2),
+        "queries_max": max(queries, default=0),
+        "writes_mean": round(sum(writes) / n, 2),
+        "session_writes_mean": round(sum(session_writes) / n, 2),
+    }
+
+
+# ----------------------------
+# EXECUÇÃO
+# ----------------------------
+def run_scenario(name, shop, requests=200, threads=4, seed=0):
+    """Corre `requests` pedidos de um cenário repartidos por `threads` threads."""
+    func, as_barber = SCENARIOS[name]
+    samples = []
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client()
+        users = [b.user for b in shop.barbeiros] if as_barber else shop.clientes
+        client.force_login(rng.choice(users))
+        local = []
+        try:
+            for _ in range(requests // threads + (1 if index < requests % threads else 0)):
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    response = func(client, shop, rng)
+                    elapsed = (time.perf_counter() - start) * 1000
+                writes, session_writes = count_writes(ctx.captured_queries)
+                local.append((
+                    elapsed, len(ctx.captured_queries), writes, session_writes, response.status_code < 500
+                ))
+        finally:
+            connections.close_all()
+        with lock:
+            samples.extend(local)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+
+    return summarize(samples)
+
+
+def run(shop, scenarios=None, requests=200, threads=4, seed=0):
+    return {
+        name: run_scenario(name, shop, requests=requests, threads=threads, seed=seed)
+        for name in (scenarios or SCENARIOS)
+    }
+
+
+# ----------------------------
+# CARGA MISTA (leituras + marcações em simultâneo)
+# ----------------------------
+MIXED_READS = ("choose_datetime", "dashboard", "services_list")
+
+
+def run_mixed(shop, seconds=10.0, threads=8, write_ratio=0.2, seed=0):
+    """
+    Durante `seconds` segundos, cada thread faz pedidos seguidos: uma
+    marcação (create_booking) com probabilidade `write_ratio`, senão uma
+    leitura. Mede o débito total e as latências de leituras e escritas.
+    """
+    samples = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client()
+        client.force_login(rng.choice(shop.clientes))
+        local = {"read": [], "write": []}
+        local_errors = {"read": 0, "write": 0, "locked": 0}
+        try:
+            while time.perf_counter() < deadline:
+                kind = "write" if rng.random() < write_ratio else "read"
+                func = SCENARIOS["create_booking" if kind == "write" else rng.choice(MIXED_READS)][0]
+                start = time.perf_counter()
+                try:
+                    ok = func(client, shop, rng).status_code < 500
+                except DatabaseError as exc:
+                    ok = False
+                    if "locked" in str(exc):
+                        local_errors["locked"] += 1
+                local[kind].append((time.perf_counter() - start) * 1000)
+                if not ok:
+                    local_errors[kind] += 1
+        finally:
+            connections.close_all()
+        with lock:
+            for kind in local:
+                samples[kind].extend(local[kind])
+            for kind in local_errors:
+                errors[kind] += local_errors[kind]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - started
+
+    result = {"seconds": round(elapsed, 2), "locked_errors": errors["locked"]}
+    for kind, latencies in samples.items():
+        latencies.sort()
+        result[kind] = {
+            "requests": len(latencies),
+            "errors": errors[kind],
+            "per_second": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.50) or 0, 3),
+            "p95_ms": round(percentile(latencies, 0.95) or 0, 3),
+        }
+    result["per_second"] = round(result["read"]["per_second"] + result["write"]["per_second"], 1)
+    return result
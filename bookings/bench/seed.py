@@ -0,0 +1,82 @@
+# bookings/bench/seed.py
+"""Barbearia sintética para benchmarks, criada com bulk_create."""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from bookings.schedule import WORK_END, WORK_START
+from bookings.models import Barbeiro, Marcacao, Servico
+
+BATCH_SIZE = 2000
+
+
+@dataclass
+class Shop:
+    barbeiros: list = field(default_factory=list)
+    servicos: list = field(default_factory=list)
+    clientes: list = field(default_factory=list)
+    marcacoes: int = 0
+
+
+def seed_shop(barbeiros=10, servicos=8, clientes=200, months=6, per_day=6, seed=0):
+    """
+    Cria `barbeiros` barbeiros, `servicos` serviços, `clientes` clientes e
+    `months` meses de histórico (mais duas semanas futuras) com cerca de
+    `per_day` marcações por barbeiro e por dia.
+    """
+    rng = random.Random(seed)
+    tz = timezone.get_current_timezone()
+    shop = Shop()
+
+    shop.clientes = User.objects.bulk_create(
+        (User(username=f"bench-cliente-{i}") for i in range(clientes)), batch_size=BATCH_SIZE
+    )
+    barber_users = User.objects.bulk_create(
+        User(username=f"bench-barbeiro-{i}", first_name=f"Barbeiro {i}") for i in range(barbeiros)
+    )
+    shop.barbeiros = Barbeiro.objects.bulk_create(Barbeiro(user=u) for u in barber_users)
+    shop.servicos = Servico.objects.bulk_create(
+        Servico(
+            nome=f"Serviço {i}",
+            duracao_min=rng.choice((15, 30, 45, 60)),
+            preco=rng.randrange(8, 40),
+        )
+        for i in range(servicos)
+    )
+
+    today = timezone.localdate()
+    first_day = today - timedelta(days=30 * months)
+    last_day = today + timedelta(days=14)
+    open_minutes = (WORK_END.hour - WORK_START.hour) * 60
+
+    def rows():
+        day = first_day
+        while day <= last_day:
+            for barbeiro in shop.barbeiros:
+                for minute in sorted(rng.sample(range(0, open_minutes, 60), min(per_day, open_minutes // 60))):
+                    naive = datetime.combine(day, WORK_START) + timedelta(minutes=minute)
+                    yield Marcacao(
+                        cliente=rng.choice(shop.clientes),
+                        barbeiro=barbeiro,
+                        servico=rng.choice(shop.servicos),
+                        inicio=timezone.make_aware(naive, tz),
+                        status=rng.choice(("pending", "confirmed", "confirmed", "cancelled"))
+                        if day >= today else rng.choice(("confirmed", "confirmed", "cancelled")),
+                    )
+            day += timedelta(days=1)
+
+    batch = []
+    for marcacao in rows():
+        batch.append(marcacao)
+        if len(batch) >= BATCH_SIZE:
+            Marcacao.objects.bulk_create(batch)
+            shop.marcacoes += len(batch)
+            batch = []
+    if batch:
+        Marcacao.objects.bulk_create(batch)
+        shop.marcacoes += len(batch)
+
+    return shop
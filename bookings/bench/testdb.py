@@ -0,0 +1,28 @@
+# bookings/bench/testdb.py
+"""Base de dados de teste própria para os benchmarks (nunca a configurada)."""
+import os
+import tempfile
+
+from django.db import connection
+
+
+def create():
+    """Cria a BD de teste. Retorna o estado a passar a destroy()."""
+    old_name = connection.settings_dict["NAME"]
+    tmpdir = None
+    if connection.vendor == "sqlite":
+        # ficheiro em vez de memória, para as threads partilharem a BD
+        tmpdir = tempfile.mkdtemp(prefix="bench-")
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(tmpdir, "bench.sqlite3")
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    return old_name, tmpdir
+
+
+def destroy(state):
+    old_name, tmpdir = state
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+    if tmpdir:
+        for name in os.listdir(tmpdir):
+            # -wal/-shm do modo WAL
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
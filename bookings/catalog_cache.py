@@ -0,0 +1,67 @@
+# bookings/catalog_cache.py
+"""
+Versão do catálogo de serviços, para cache de fragmentos e GET condicional.
+
+A versão (um timestamp em ns guardado na BD, ver versions.py) muda sempre
+que um Servico é gravado ou apagado (ver signals.py), e todos os workers a
+veem. Os templates usam-na na chave de `{% cache %}`: enquanto não mudar,
+os querysets do catálogo nem chegam a ser avaliados. As views usam-na
+também para ETag/Last-Modified.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.messages import get_messages
+from django.middleware.csrf import get_token
+from django.utils.translation import get_language
+
+from . import versions
+from .roles import get_barbeiro
+
+VERSION_NAME = "catalog"
+
+
+def version():
+    return versions.get(VERSION_NAME)
+
+
+def bump():
+    versions.bump(VERSION_NAME)
+
+
+# ----------------------------
+# GET CONDICIONAL
+# ----------------------------
+def _cacheable(request):
+    # com mensagens pendentes a página tem de ser gerada de novo
+    return len(get_messages(request)) == 0
+
+
+def _csrf_fingerprint(request):
+    # a página leva {% csrf_token %} (formulários de idioma e logout): com um
+    # token novo (login/logout) a cópia antiga do browser já não serve
+    get_token(request)
+    return hashlib.sha256(request.META["CSRF_COOKIE"].encode()).hexdigest()[:16]
+
+
+def etag(request, *args, **kwargs):
+    """ETag por versão do catálogo, idioma, utilizador, papel e token CSRF."""
+    if not _cacheable(request):
+        return None
+    user = request.user.pk if request.user.is_authenticated else "anon"
+    barbeiro = get_barbeiro(request)
+    role = f"b{barbeiro.pk}" if barbeiro is not None else "c"
+    return f"catalog-{version()}-{get_language()}-{user}-{role}-{_csrf_fingerprint(request)}"
+
+
+def last_modified(request, *args, **kwargs):
+    """
+    Só para anónimos: a página dos autenticados depende também do user. Os
+    browsers mandam If-None-Match junto, e esse (com o token CSRF) prevalece.
+    """
+    if request.user.is_authenticated or not _cacheable(request):
+        return None
+    value = version()
+    if not value:  # catálogo nunca alterado desde que há versões
+        return None
+    return datetime.fromtimestamp(value / 1e9, tz=dt_timezone.utc)
@@ -0,0 +1,196 @@
+# bookings/exports.py
+"""
+Exportações em streaming: CSV/JSONL das marcações (contabilidade e
+migrações; ver imports.py para o caminho inverso) e feed ICS da agenda de
+cada barbeiro.
+
+As linhas vêm da BD com values_list(...).iterator(chunk_size=...), sem criar
+instâncias dos modelos, e são escritas uma a uma para o
+StreamingHttpResponse: a memória usada não depende do número de marcações.
+"""
+import csv
+import heapq
+import json
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from .archive import reaches_archive
+from .availability import day_bounds
+from .models import Marcacao, MarcacaoArquivo
+
+CHUNK_SIZE = 2000
+ICS_PAST_DAYS = 90
+ICS_SALT = "bookings.exports.ics"
+
+
+def buffered(lines, size=200):
+    """Junta as linhas em blocos: menos escritas (e syscalls) por resposta."""
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= size:
+            yield "".join(block)
+            block = []
+    if block:
+        yield "".join(block)
+
+
+class _Echo:
+    """'Ficheiro' cujo write devolve o texto, para usar o csv.writer num gerador."""
+
+    def write(self, value):
+        return value
+
+
+# ----------------------------
+# CSV
+# ----------------------------
+CSV_HEADER = [
+    "id", "inicio", "fim", "estado", "cliente", "cliente_nome", "cliente_email",
+    "barbeiro", "servico", "preco", "duracao_min", "criado_em",
+]
+
+
+def _booking_rows(date_from, date_to, chunk_size):
+    # arquivo (archive.py) e tabela ativa, cada um já ordenado, fundidos por (inicio, id)
+    range_start, _ = day_bounds(date_from)
+    _, range_end = day_bounds(date_to)
+    models = [MarcacaoArquivo, Marcacao] if reaches_archive(range_start) else [Marcacao]
+    return heapq.merge(*(
+        model.objects.filter(inicio__gte=range_start, inicio__lt=range_end)
+        .order_by("inicio", "id")
+        .values_list(
+            "id", "inicio", "status", "cliente__username", "cliente__first_name",
+            "cliente__last_name", "cliente__email", "barbeiro__user__username",
+            "servico__nome", "servico__preco", "servico__duracao_min", "criado_em",
+        )
+        .iterator(chunk_size=chunk_size)
+        for model in models
+    ), key=lambda row: (row[1], row[0]))
+
+
+def csv_rows(date_from, date_to, chunk_size=CHUNK_SIZE):
+    """Linhas CSV (texto) das marcações com início entre date_from e date_to (inclusive)."""
+    tz = timezone.get_current_timezone()
+    writer = csv.writer(_Echo())
+
+    # BOM para o Excel abrir os acentos corretamente
+    yield "\ufeff" + writer.writerow(CSV_HEADER)
+    for (pk, inicio, status, username, first, last, email, barbeiro,
+         servico, preco, duracao, criado_em) in _booking_rows(date_from, date_to, chunk_size):
+        inicio = inicio.astimezone(tz)
+        yield writer.writerow([
+            pk,
+            inicio.strftime("%Y-%m-%d %H:%M"),
+            (inicio + timedelta(minutes=duracao)).strftime("%Y-%m-%d %H:%M"),
+            status,
+            username,
+            f"{first} {last}".strip(),
+            email,
+            barbeiro,
+            servico,
+            preco,
+            duracao,
+            criado_em.astimezone(tz).strftime("%Y-%m-%d %H:%M"),
+        ])
+
+
+def jsonl_rows(date_from, date_to, chunk_size=CHUNK_SIZE):
+    """As mesmas marcações em JSON Lines (campos de CSV_HEADER, datas ISO com fuso)."""
+    tz = timezone.get_current_timezone()
+    for (pk, inicio, status, username, first, last, email, barbeiro,
+         servico, preco, duracao, criado_em) in _booking_rows(date_from, date_to, chunk_size):
+        inicio = inicio.astimezone(tz)
+        yield json.dumps({
+            "id": pk,
+            "inicio": inicio.isoformat(),
+            "fim": (inicio + timedelta(minutes=duracao)).isoformat(),
+            "estado": status,
+            "cliente": username,
+            "cliente_nome": f"{first} {last}".strip(),
+            "cliente_email": email,
+            "barbeiro": barbeiro,
+            "servico": servico,
+            "preco": str(preco),
+            "duracao_min": duracao,
+            "criado_em": criado_em.astimezone(tz).isoformat(),
+        }, ensure_ascii=False) + "\n"
+
+
+# ----------------------------
+# ICS
+# ----------------------------
+def ics_token(barbeiro_id):
+    """Token do URL do feed (os calendários não fazem login)."""
+    return signing.Signer(salt=ICS_SALT).signature(str(barbeiro_id))
+
+
+def check_ics_token(barbeiro_id, token):
+    return constant_time_compare(ics_token(barbeiro_id), token or "")
+
+
+def _escape(text):
+    return (
+        str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    # RFC 5545: linhas com no máximo 75 octetos; continuação começa por espaço
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    while data:
+        size = 75 if not parts else 74
+        cut = size
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1  # não parte caracteres UTF-8 a meio
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _utc(dt):
+    return dt.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def ics_lines(barbeiro, chunk_size=CHUNK_SIZE):
+    """Feed ICS da agenda do barbeiro (marcações não canceladas, desde há ICS_PAST_DAYS dias)."""
+    host = getattr(settings, "ICS_UID_DOMAIN", "barbershop")
+    stamp = _utc(timezone.now())
+    rows = (
+        Marcacao.objects.filter(
+            barbeiro=barbeiro, inicio__gte=timezone.now() - timedelta(days=ICS_PAST_DAYS)
+        )
+        .exclude(status="cancelled")
+        .order_by("inicio", "id")
+        .values_list(
+            "id", "inicio", "status", "servico__nome", "servico__duracao_min",
+            "cliente__first_name", "cliente__last_name", "cliente__username",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+    yield _fold("BEGIN:VCALENDAR")
+    yield _fold("VERSION:2.0")
+    yield _fold("PRODID:-//Barbershop//Agenda//PT")
+    yield _fold("CALSCALE:GREGORIAN")
+    yield _fold(f"X-WR-CALNAME:{_escape(f'Agenda - {barbeiro}')}")
+    for pk, inicio, status, servico, duracao, first, last, username in rows:
+        cliente = f"{first} {last}".strip() or username
+        yield (
+            _fold("BEGIN:VEVENT")
+            + _fold(f"UID:marcacao-{pk}@{host}")
+            + _fold(f"DTSTAMP:{stamp}")
+            + _fold(f"DTSTART:{_utc(inicio)}")
+            + _fold(f"DTEND:{_utc(inicio + timedelta(minutes=duracao))}")
+            + _fold(f"SUMMARY:{_escape(f'{servico} - {cliente}')}")
+            + _fold(f"STATUS:{'CONFIRMED' if status == 'confirmed' else 'TENTATIVE'}")
+            + _fold("END:VEVENT")
+        )
+    yield _fold("END:VCALENDAR")
@@ -0,0 +1,154 @@
+# bookings/images.py
+"""
+Versões redimensionadas (renditions) de Servico.image e Barbeiro.foto.
+
+Para cada imagem original são geradas cópias em larguras fixas e nos
+formatos suportados pelo Pillow instalado (AVIF se houver plugin, WebP e
+JPEG), gravadas em MEDIA_ROOT/renditions/<caminho original sem extensão>/.
+
+São geradas por uma tarefa em segundo plano (bookings.tasks), enfileirada
+quando o nome do ficheiro muda (sinal post_save) ou quando o template as
+pede e ainda não existem; até lá o template usa o original. As da imagem
+antiga são apagadas quando a imagem muda ou o modelo é apagado. A lista de
+renditions de cada imagem fica no cache do Django para não repetir
+verificações no disco.
+"""
+import io
+import posixpath
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .tasks import task
+
+WIDTHS = (160, 320, 640, 960)
+RENDITIONS_DIR = "renditions"
+PENDING_TIMEOUT = 60  # segundos até voltar a procurar renditions em falta
+
+# (formato, extensão, mime, opções de gravação), do mais eficiente ao mais compatível
+_FORMATS = (
+    ("AVIF", "avif", "image/avif", {"quality": 50}),
+    ("WEBP", "webp", "image/webp", {"quality": 80, "method": 4}),
+    ("JPEG", "jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+)
+
+
+def available_formats():
+    """Formatos que o Pillow instalado consegue gravar."""
+    Image.init()
+    return [f for f in _FORMATS if f[0] in Image.SAVE]
+
+
+def _cache_key(name):
+    return f"renditions:{name}"
+
+
+def rendition_name(name, width, ext):
+    base, _ext = posixpath.splitext(name)
+    return posixpath.join(RENDITIONS_DIR, base, f"{width}w.{ext}")
+
+
+# ----------------------------
+# GERAÇÃO
+# ----------------------------
+def _encode(img, fmt, options):
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.convert("RGBA").getchannel("A"))
+        img = background
+    buf = io.BytesIO()
+    img.save(buf, fmt, **options)
+    return buf.getvalue()
+
+
+def build_renditions(name, force=False):
+    """
+    Gera as renditions da imagem `name` (relativa ao storage) e retorna a
+    lista [(mime, largura, nome), ...]. Só redimensiona para baixo.
+    """
+    with default_storage.open(name, "rb") as fh:
+        original = ImageOps.exif_transpose(Image.open(fh))
+        original.load()
+
+    widths = [w for w in WIDTHS if w < original.width] + [min(original.width, WIDTHS[-1])]
+    result = []
+    for width in sorted(set(widths)):
+        height = round(original.height * width / original.width)
+        resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+        for fmt, ext, mime, options in available_formats():
+            target = rendition_name(name, width, ext)
+            if force or not default_storage.exists(target):
+                if default_storage.exists(target):
+                    default_storage.delete(target)
+                default_storage.save(target, ContentFile(_encode(resized, fmt, options)))
+            result.append((mime, width, target))
+
+    cache.set(_cache_key(name), result, None)
+    return result
+
+
+def _stored(name):
+    """Renditions de `name` que já estão no storage, sem abrir o original."""
+    base, _ext = posixpath.splitext(name)
+    try:
+        _dirs, files = default_storage.listdir(posixpath.join(RENDITIONS_DIR, base))
+    except OSError:
+        return []
+    formats = {ext: (i, mime) for i, (_fmt, ext, mime, _options) in enumerate(available_formats())}
+    found = []
+    for filename in files:
+        width, _sep, ext = filename.partition("w.")
+        if width.isdigit() and ext in formats:
+            order, mime = formats[ext]
+            found.append((int(width), order, (mime, int(width), rendition_name(name, int(width), ext))))
+    # mesma ordem que build_renditions: por largura e depois por formato
+    return [rendition for _width, _order, rendition in sorted(found)]
+
+
+def schedule_renditions(name):
+    """Enfileira a geração das renditions de `name` (depois do commit)."""
+    gerar_renditions.enqueue(key=_cache_key(name), nome=name)
+
+
+def renditions(fieldfile):
+    """
+    Renditions de um ImageField. Se ainda não existirem, enfileira a
+    geração e retorna [] (o template usa o original).
+    """
+    if not fieldfile:
+        return []
+    found = cache.get(_cache_key(fieldfile.name))
+    if found is None:
+        found = _stored(fieldfile.name)
+        if found:
+            cache.set(_cache_key(fieldfile.name), found, None)
+        else:
+            schedule_renditions(fieldfile.name)
+            cache.set(_cache_key(fieldfile.name), found, PENDING_TIMEOUT)
+    return found
+
+
+@task(name="bookings.gerar_renditions")
+def gerar_renditions(nome):
+    if not default_storage.exists(nome):
+        return  # a imagem mudou ou foi apagada entretanto
+    try:
+        build_renditions(nome)
+    except (OSError, ValueError):
+        # original ilegível: repetir não adianta, o template usa o original
+        pass
+
+
+def delete_renditions(name):
+    """Apaga as renditions de `name` (todas as larguras e formatos)."""
+    base, _ext = posixpath.splitext(name)
+    directory = posixpath.join(RENDITIONS_DIR, base)
+    try:
+        _dirs, files = default_storage.listdir(directory)
+    except OSError:
+        files = []
+    for filename in files:
+        default_storage.delete(posixpath.join(directory, filename))
+    cache.delete(_cache_key(name))
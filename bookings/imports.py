@@ -0,0 +1,301 @@
+# bookings/imports.py
+"""
+Importação em massa de marcações (histórico de outras lojas).
+
+Lê o mesmo formato que exports.py produz (CSV com os campos de CSV_HEADER,
+ou JSON Lines), linha a linha, e grava por blocos: cada bloco é uma
+transação com um bulk_create, e as referências (serviço pelo nome, barbeiro
+e cliente pelo username) são resolvidas em dicionários carregados uma vez,
+sem uma query por linha.
+
+Linhas iguais a uma marcação já existente (mesmo barbeiro, cliente, serviço
+e início) são saltadas, por isso repetir uma importação não duplica nada.
+As restantes que se sobrepõem a outra marcação ativa do mesmo barbeiro (na
+BD, com services._has_overlap, ou noutra linha da importação) são
+rejeitadas como conflitos, também em dry run; a verificação na BD custa
+uma query por linha nova, sobre o índice (barbeiro, inicio).
+Os sinais não correm com bulk_create: no fim os caches de disponibilidade e
+das agendas são invalidados (versões na BD, ver versions.py, por isso os
+workers veem-no sem reiniciar) e os resumos (analytics.py) recalculados.
+"""
+import csv
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import agenda_cache, analytics, availability_cache
+from .models import Barbeiro, Marcacao, MarcacaoArquivo, Servico
+from .services import _has_overlap
+
+BATCH_SIZE = 5000
+LOOKUP_SIZE = 500  # inícios por query na procura de repetidas (limite de parâmetros)
+STATUS = {value for value, _label in Marcacao.STATUS_CHOICES}
+
+
+class LinhaInvalida(ValueError):
+    pass
+
+
+# ----------------------------
+# LEITURA
+# ----------------------------
+def read_records(fh, fmt):
+    """Gera (nº da linha, dict) de um ficheiro CSV ou JSONL já aberto."""
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(fh), start=2):
+            yield number, row
+        return
+    for number, line in enumerate(fh, start=1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def _parse_datetime(value, tz):
+    # aceita o CSV ("AAAA-MM-DD HH:MM", hora local) e o JSONL (ISO com fuso)
+    try:
+        dt = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise LinhaInvalida(f"data inválida: {value!r}")
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt, tz)
+    return dt
+
+
+@dataclass
+class Resultado:
+    lidas: int = 0
+    importadas: int = 0
+    repetidas: int = 0
+    invalidas: int = 0
+    conflitos: int = 0
+    criados: dict = field(default_factory=lambda: {"servicos": 0, "barbeiros": 0, "clientes": 0})
+    erros: list = field(default_factory=list)  # (linha, motivo), só os primeiros
+    inicio_min: datetime = None
+    inicio_max: datetime = None
+
+
+# ----------------------------
+# IMPORTAÇÃO
+# ----------------------------
+class Importer:
+    """
+    Importa blocos de registos. Com create_missing, serviços, barbeiros e
+    clientes desconhecidos são criados (clientes e barbeiros sem password
+    utilizável); senão a linha é rejeitada. Com dry_run cada bloco é
+    desfeito no fim, mas tudo o resto (validação, referências, contagens)
+    corre como numa importação real.
+    """
+
+    max_erros = 20
+
+    def __init__(self, create_missing=False, dry_run=False, batch_size=BATCH_SIZE):
+        self.create_missing = create_missing
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.tz = timezone.get_current_timezone()
+        self.resultado = Resultado()
+        self.barbeiro_ids = set()
+        # mapas carregados uma vez (uma query cada)
+        servicos = Servico.objects.values_list("pk", "nome", "duracao_min")
+        self.servicos = {nome: pk for pk, nome, _duracao in servicos}
+        self.duracoes = {pk: duracao for pk, _nome, duracao in servicos}
+        self.barbeiros = dict(Barbeiro.objects.values_list("user__username", "pk"))
+        self.clientes = dict(User.objects.values_list("username", "pk"))
+        # intervalos já aceites nesta importação, por (barbeiro, dia): em dry
+        # run os blocos anteriores foram desfeitos e a BD já não os tem
+        self.ocupados = defaultdict(list)
+
+    def _erro(self, number, motivo, contador="invalidas"):
+        setattr(self.resultado, contador, getattr(self.resultado, contador) + 1)
+        if len(self.resultado.erros) < self.max_erros:
+            self.resultado.erros.append((number, motivo))
+
+    def _parse(self, record):
+        if not isinstance(record, dict):
+            raise LinhaInvalida("registo ilegível")
+        try:
+            estado = (record.get("estado") or "pending").strip()
+            if estado not in STATUS:
+                raise LinhaInvalida(f"estado desconhecido: {estado!r}")
+            cliente = (record.get("cliente") or "").strip()
+            barbeiro = (record.get("barbeiro") or "").strip()
+            servico = (record.get("servico") or "").strip()
+            if not (cliente and barbeiro and servico):
+                raise LinhaInvalida("faltam cliente, barbeiro ou serviço")
+            return {
+                "inicio": _parse_datetime(record.get("inicio"), self.tz),
+                "estado": estado,
+                "cliente": cliente,
+                "cliente_email": (record.get("cliente_email") or "").strip(),
+                "barbeiro": barbeiro,
+                "servico": servico,
+                "preco": Decimal(str(record.get("preco") or 0)),
+                "duracao_min": int(record.get("duracao_min") or 0),
+            }
+        except LinhaInvalida:
+            raise
+        except (InvalidOperation, TypeError, ValueError) as exc:
+            raise LinhaInvalida(str(exc))
+
+    # ---------- referências em falta ----------
+    def _create_missing(self, rows):
+        created = {}
+        servicos = {}
+        for row in rows:
+            if row["servico"] not in self.servicos and row["duracao_min"] > 0:
+                servicos.setdefault(row["servico"], row)
+        if servicos:
+            Servico.objects.bulk_create(
+                Servico(nome=nome, duracao_min=row["duracao_min"], preco=row["preco"])
+                for nome, row in servicos.items()
+            )
+            # bulk_create não devolve os ids em todas as BDs: relê-os
+            for pk, nome, duracao in Servico.objects.filter(nome__in=list(servicos)).values_list(
+                "pk", "nome", "duracao_min"
+            ):
+                self.servicos[nome] = pk
+                self.duracoes[pk] = duracao
+            created["servicos"] = list(servicos)
+
+        usernames = {}
+        for row in rows:
+            for key in ("cliente", "barbeiro"):
+                if row[key] not in self.clientes:
+                    usernames.setdefault(row[key], row["cliente_email"] if key == "cliente" else "")
+        if usernames:
+            users = [User(username=name, email=email) for name, email in usernames.items()]
+            for user in users:
+                user.set_unusable_password()
+            User.objects.bulk_create(users, batch_size=self.batch_size)
+            self.clientes.update(
+                User.objects.filter(username__in=list(usernames)).values_list("username", "pk")
+            )
+            created["clientes"] = list(usernames)
+
+        barbeiros = {row["barbeiro"] for row in rows if row["barbeiro"] not in self.barbeiros}
+        if barbeiros:
+            Barbeiro.objects.bulk_create(Barbeiro(user_id=self.clientes[name]) for name in barbeiros)
+            self.barbeiros.update(
+                Barbeiro.objects.filter(user__username__in=barbeiros).values_list("user__username", "pk")
+            )
+            created["barbeiros"] = list(barbeiros)
+        return created
+
+    def _forget(self, created):
+        # dry run: o bloco foi desfeito, os ids criados deixam de existir
+        for nome in created.get("servicos", ()):
+            self.servicos.pop(nome, None)
+        for name in created.get("barbeiros", ()):
+            self.barbeiros.pop(name, None)
+        for name in created.get("clientes", ()):
+            self.clientes.pop(name, None)
+
+    # ---------- um bloco ----------
+    def _existing(self, objs):
+        # só os inícios exatos do bloco (não o intervalo entre o menor e o
+        # maior): com a entrada desordenada esse intervalo seria quase a
+        # tabela inteira em cada bloco. Também no arquivo: reimportar
+        # histórico antigo não o duplica
+        inicios = sorted({obj.inicio for obj in objs})
+        barbeiro_ids = {obj.barbeiro_id for obj in objs}
+        seen = set()
+        for model in (Marcacao, MarcacaoArquivo):
+            for i in range(0, len(inicios), LOOKUP_SIZE):
+                seen.update(
+                    model.objects.filter(
+                        barbeiro_id__in=barbeiro_ids, inicio__in=inicios[i:i + LOOKUP_SIZE],
+                    ).values_list("barbeiro_id", "cliente_id", "servico_id", "inicio")
+                )
+        return seen
+
+    def _conflict(self, obj):
+        """True se `obj` (ativa) se sobrepõe a outra marcação do barbeiro."""
+        if obj.status == "cancelled":
+            return False
+        inicio = obj.inicio
+        fim = inicio + timedelta(minutes=self.duracoes[obj.servico_id])
+        day = timezone.localtime(inicio, self.tz).date()
+        # uma marcação dura no máximo 24h: basta o próprio dia e o anterior
+        for key in ((obj.barbeiro_id, day), (obj.barbeiro_id, day - timedelta(days=1))):
+            if any(a < fim and inicio < b for a, b in self.ocupados.get(key, ())):
+                return True
+        if _has_overlap(obj.barbeiro_id, inicio, fim):
+            return True
+        self.ocupados[obj.barbeiro_id, day].append((inicio, fim))
+        return False
+
+    def import_chunk(self, records):
+        """Importa uma lista de (nº da linha, registo) numa transação."""
+        resultado = self.resultado
+        rows = []
+        for number, record in records:
+            resultado.lidas += 1
+            try:
+                rows.append((number, self._parse(record)))
+            except LinhaInvalida as exc:
+                self._erro(number, str(exc))
+
+        with transaction.atomic():
+            created = self._create_missing([row for _n, row in rows]) if self.create_missing else {}
+
+            objs = []  # (nº da linha, marcação)
+            for number, row in rows:
+                servico_id = self.servicos.get(row["servico"])
+                barbeiro_id = self.barbeiros.get(row["barbeiro"])
+                cliente_id = self.clientes.get(row["cliente"])
+                if not (servico_id and barbeiro_id and cliente_id):
+                    self._erro(number, "serviço, barbeiro ou cliente desconhecido")
+                    continue
+                objs.append((number, Marcacao(
+                    cliente_id=cliente_id, barbeiro_id=barbeiro_id, servico_id=servico_id,
+                    inicio=row["inicio"], status=row["estado"],
+                )))
+
+            if objs:
+                seen = self._existing([obj for _n, obj in objs])
+                novas = []
+                for number, obj in objs:
+                    key = (obj.barbeiro_id, obj.cliente_id, obj.servico_id, obj.inicio)
+                    if key in seen:
+                        resultado.repetidas += 1
+                        continue
+                    if self._conflict(obj):
+                        self._erro(number, "sobrepõe-se a outra marcação do barbeiro", "conflitos")
+                        continue
+                    seen.add(key)
+                    novas.append(obj)
+                Marcacao.objects.bulk_create(novas, batch_size=self.batch_size)
+                resultado.importadas += len(novas)
+                for obj in novas:
+                    self.barbeiro_ids.add(obj.barbeiro_id)
+                    if resultado.inicio_min is None or obj.inicio < resultado.inicio_min:
+                        resultado.inicio_min = obj.inicio
+                    if resultado.inicio_max is None or obj.inicio > resultado.inicio_max:
+                        resultado.inicio_max = obj.inicio
+
+            for key, names in created.items():
+                resultado.criados[key] += len(names)
+            if self.dry_run:
+                transaction.set_rollback(True)
+                self._forget(created)
+
+    def finish(self):
+        """Invalida os caches e recalcula os resumos do período importado."""
+        resultado = self.resultado
+        if self.dry_run or not resultado.importadas:
+            return
+        availability_cache.invalidate_all()
+        agenda_cache.bump(self.barbeiro_ids)
+        analytics.refresh_range(
+            timezone.localtime(resultado.inicio_min).date(),
+            timezone.localtime(resultado.inicio_max).date(),
+        )
@@ -0,0 +1,55 @@
+# bookings/management/commands/archive_bookings.py
+"""
+Move as marcações antigas para o arquivo (bookings/archive.py), por lotes.
+
+    python manage.py archive_bookings                    # mais antigas que ARCHIVE_RETENTION_DAYS
+    python manage.py archive_bookings --days 180 --batch 500 --sleep 0.2
+    python manage.py archive_bookings --dry-run          # só conta
+
+Cada lote é uma transação curta; entre lotes o comando dorme um pouco para
+os pedidos do site apanharem a BD (em SQLite há um só escritor de cada vez).
+Pode ser interrompido e repetido a qualquer momento.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bookings import archive
+from bookings.models import Marcacao
+
+
+class Command(BaseCommand):
+    help = "Move para MarcacaoArquivo as marcações mais antigas que a janela de retenção."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="dias a manter na tabela ativa (omissão: ARCHIVE_RETENTION_DAYS)")
+        parser.add_argument("--batch", type=int, default=archive.BATCH_SIZE, help="marcações por transação")
+        parser.add_argument("--sleep", type=float, default=0.05, help="pausa (s) entre lotes")
+        parser.add_argument("--dry-run", action="store_true", help="só conta o que seria arquivado")
+
+    def handle(self, *args, **options):
+        days = options["days"] if options["days"] is not None else archive.retention_days()
+        if days < 1 or options["batch"] < 1:
+            raise CommandError("--days e --batch têm de ser positivos.")
+        before = archive.cutoff(days)
+
+        if options["dry_run"]:
+            total = Marcacao.objects.filter(inicio__lt=before).count()
+            self.stdout.write(f"{total} marcação(ões) anteriores a {timezone.localtime(before):%Y-%m-%d} por arquivar.")
+            return
+
+        started = time.perf_counter()
+        total = 0
+        while True:
+            moved = archive.archive_batch(before, options["batch"])
+            if not moved:
+                break
+            total += moved
+            self.stderr.write(f"{total} arquivadas ({total / (time.perf_counter() - started):.0f}/s)")
+            time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} marcação(ões) anteriores a {timezone.localtime(before):%Y-%m-%d} arquivadas "
+            f"em {time.perf_counter() - started:.1f}s."
+        ))
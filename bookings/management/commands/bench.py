@@ -0,0 +1,106 @@
+# bookings/management/commands/bench.py
+"""
+Benchmark do wizard de marcações.
+
+Cria uma base de dados de teste (nunca toca na base de dados configurada),
+semeia uma barbearia sintética e mede p50/p95/p99, queries e escritas na BD
+(total e a django_session) por pedido para cada view. O cenário
+wizard_booking percorre o wizard inteiro, por isso os seus números são por
+marcação completa. As escritas a django_session servem para apanhar
+regressões (o wizard não escreve na sessão; o esperado é 0): não há medição
+de "antes", porque o wizard que guardava o estado na sessão nunca esteve
+ligado a URLs.
+
+    python manage.py bench --barbers 20 --months 12 --threads 8 --output bench.json
+    python manage.py bench --compare bench.json
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.bench import testdb
+from bookings.bench.runner import SCENARIOS, run
+from bookings.bench.seed import seed_shop
+
+
+class Command(BaseCommand):
+    help = "Mede latência e queries por pedido das views de marcação."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--barbers", type=int, default=10)
+        parser.add_argument("--services", type=int, default=8)
+        parser.add_argument("--clients", type=int, default=200)
+        parser.add_argument("--months", type=int, default=6, help="meses de histórico")
+        parser.add_argument("--per-day", type=int, default=6, help="marcações por barbeiro/dia")
+        parser.add_argument("--requests", type=int, default=200, help="pedidos por cenário")
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS))
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="ficheiro JSON com os resultados")
+        parser.add_argument("--compare", help="resultados anteriores (JSON) para comparar")
+
+    # ----------------------------
+    # SAÍDA
+    # ----------------------------
+    def _print(self, results, previous=None):
+        header = f"{'cenário':<16}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'escritas':>9}{'sessão':>8}{'erros':>7}"
+        self.stdout.write(header)
+        for name, r in results.items():
+            line = (
+                f"{name:<16}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+                f"{r['queries_mean']:>9.1f}{r['writes_mean']:>9.1f}{r['session_writes_mean']:>8.1f}{r['errors']:>7}"
+            )
+            old = (previous or {}).get(name)
+            if old and old.get("p95_ms"):
+                delta = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+                line += f"   p95 {delta:+.0f}%  queries {r['queries_mean'] - old['queries_mean']:+.1f}"
+                if "writes_mean" in old:
+                    line += f"  escritas {r['writes_mean'] - old['writes_mean']:+.1f}"
+            self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        previous = None
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as fh:
+                    previous = json.load(fh)["results"]
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Não foi possível ler {options['compare']}: {exc}")
+
+        config = {
+            key: options[key]
+            for key in ("barbers", "services", "clients", "months", "per_day", "requests", "threads", "seed")
+        }
+        state = testdb.create()
+        try:
+            start = time.perf_counter()
+            shop = seed_shop(
+                barbeiros=options["barbers"],
+                servicos=options["services"],
+                clientes=options["clients"],
+                months=options["months"],
+                per_day=options["per_day"],
+                seed=options["seed"],
+            )
+            self.stdout.write(
+                f"Semeadas {shop.marcacoes} marcações em {time.perf_counter() - start:.1f}s"
+            )
+            results = run(
+                shop,
+                scenarios=options["scenarios"],
+                requests=options["requests"],
+                threads=options["threads"],
+                seed=options["seed"],
+            )
+        finally:
+            testdb.destroy(state)
+
+        self._print(results, previous)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(
+                    {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": config, "results": results},
+                    fh, indent=2,
+                )
+            self.stdout.write(f"Resultados gravados em {options['output']}")
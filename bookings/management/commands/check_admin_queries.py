@@ -0,0 +1,99 @@
+# bookings/management/commands/check_admin_queries.py
+"""
+Conta as queries de cada changelist do admin de `bookings` com poucas e
+muitas linhas, e falha se o número crescer com o número de linhas (N+1).
+
+Os dados de teste são criados dentro de uma transação que é sempre
+revertida, por isso a base de dados fica intacta.
+
+    python manage.py check_admin_queries --sizes 10 1000
+
+As changelists de Marcacao e Barbeiro são verificadas também nos testes
+(bookings.tests.AdminChangelistQueryTests).
+"""
+from datetime import timedelta
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from bookings.models import Barbeiro, Marcacao, Servico
+
+
+class _Rollback(Exception):
+    pass
+
+
+def seed(n):
+    """n utilizadores/barbeiros/serviços/marcações, com bulk_create."""
+    users = User.objects.bulk_create(
+        User(username=f"qc-user-{i}", first_name=f"Nome{i}") for i in range(n)
+    )
+    barbeiros = Barbeiro.objects.bulk_create(Barbeiro(user=u) for u in users)
+    servicos = Servico.objects.bulk_create(
+        Servico(nome=f"Serviço {i}", duracao_min=30, preco=10) for i in range(n)
+    )
+    now = timezone.now()
+    Marcacao.objects.bulk_create(
+        Marcacao(
+            cliente=users[i],
+            barbeiro=barbeiros[i],
+            servico=servicos[i],
+            inicio=now + timedelta(hours=i),
+        )
+        for i in range(n)
+    )
+
+
+def count_changelist_queries(model_admin, user):
+    request = RequestFactory().get("/")
+    request.user = user
+    request.session = {}
+    request._messages = FallbackStorage(request)
+    with CaptureQueriesContext(connection) as ctx:
+        response = model_admin.changelist_view(request)
+        response.render()
+    return len(ctx.captured_queries)
+
+
+class Command(BaseCommand):
+    help = "Verifica que as changelists do admin têm um número constante de queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10, 1000])
+
+    def measure(self, n):
+        counts = {}
+        try:
+            with transaction.atomic():
+                seed(n)
+                user = User.objects.create_superuser("qc-admin", "qc@example.com", None)
+                for model, model_admin in admin.site._registry.items():
+                    if model._meta.app_label == "bookings":
+                        counts[model.__name__] = count_changelist_queries(model_admin, user)
+                raise _Rollback
+        except _Rollback:
+            pass
+        return counts
+
+    def handle(self, *args, **options):
+        sizes = options["sizes"]
+        results = {n: self.measure(n) for n in sizes}
+
+        failed = []
+        for name in sorted(results[sizes[0]]):
+            counts = [results[n][name] for n in sizes]
+            line = ", ".join(f"{n} linhas: {c}" for n, c in zip(sizes, counts))
+            if len(set(counts)) > 1:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f"FAIL {name:<10} {line}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok   {name:<10} {line}"))
+
+        if failed:
+            raise CommandError(f"Queries dependem do número de linhas em: {', '.join(failed)}")
@@ -0,0 +1,88 @@
+# bookings/management/commands/check_query_plans.py
+"""
+Corre EXPLAIN QUERY PLAN (SQLite) sobre as queries mais frequentes e falha se
+alguma fizer um varrimento completo da tabela de marcações.
+
+    python manage.py check_query_plans
+
+As mesmas verificações correm nos testes (bookings.tests.QueryPlanTests).
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from bookings.models import Marcacao
+from bookings.pagination import WINDOW_DAYS, Window, keyset_queryset
+from bookings.queries import marcacoes_ativas, marcacoes_barbeiro, marcacoes_cliente
+
+TABLE = Marcacao._meta.db_table
+
+
+def hot_queries():
+    """(nome, queryset) com valores de exemplo; não precisam de existir."""
+    now = timezone.now()
+    day = timedelta(days=1)
+    today = timezone.localdate()
+    window = Window(today - timedelta(days=WINDOW_DAYS), today + timedelta(days=WINDOW_DAYS))
+    return [
+        (
+            "availability.bookings_by_day",
+            marcacoes_ativas([1], now, now + day).values_list(
+                "barbeiro_id", "inicio", "servico__duracao_min"
+            ),
+        ),
+        (
+            "availability.bookings_by_day (vários barbeiros)",
+            marcacoes_ativas([1, 2, 3], now, now + 30 * day).values_list(
+                "barbeiro_id", "inicio", "servico__duracao_min"
+            ),
+        ),
+        (
+            "services.criar_marcacao (sobreposição)",
+            marcacoes_ativas([1], now - day, now).values_list("inicio", "servico__duracao_min"),
+        ),
+        ("views.dashboard", keyset_queryset(marcacoes_cliente(1), window)),
+        ("views.agenda_barbeiro", keyset_queryset(marcacoes_barbeiro(1), window)),
+        (
+            "views.agenda_barbeiro (cursor)",
+            keyset_queryset(marcacoes_barbeiro(1), window, (now, 1)),
+        ),
+        (
+            "admin date_hierarchy (dia)",
+            Marcacao.objects.filter(inicio__gte=now, inicio__lt=now + day).order_by("-inicio"),
+        ),
+    ]
+
+
+def full_scans(plan):
+    """Linhas do plano que percorrem a tabela de marcações inteira."""
+    return [
+        line for line in plan.splitlines()
+        if f"SCAN {TABLE}" in line and "INDEX" not in line
+    ]
+
+
+class Command(BaseCommand):
+    help = "Verifica (EXPLAIN QUERY PLAN) que as queries quentes usam índices."
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Este comando só suporta SQLite.")
+
+        failed = []
+        for name, qs in hot_queries():
+            plan = qs.explain()
+            scans = full_scans(plan)
+            if scans:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f"FAIL {name}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok   {name}"))
+            if scans or options["verbosity"] > 1:
+                for line in plan.splitlines():
+                    self.stdout.write(f"     {line}")
+
+        if failed:
+            raise CommandError(f"Varrimento completo em: {', '.join(failed)}")
@@ -0,0 +1,55 @@
+# bookings/management/commands/export_bookings.py
+"""
+Exporta marcações em CSV ou JSONL, em streaming (o inverso de import_bookings).
+
+    python manage.py export_bookings -o historico.csv
+    python manage.py export_bookings --format jsonl --desde 2024-01-01 --ate 2024-12-31 -o 2024.jsonl
+    python manage.py export_bookings --format jsonl | gzip > historico.jsonl.gz
+
+Por omissão exporta todo o histórico.
+"""
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from bookings import exports
+from bookings.models import Marcacao
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Data inválida: {value} (AAAA-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = "Exporta marcações (CSV/JSONL) sem as carregar todas em memória."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--desde", type=_date)
+        parser.add_argument("--ate", type=_date)
+        parser.add_argument("-o", "--output", help="ficheiro de saída (por omissão stdout)")
+
+    def handle(self, *args, **options):
+        desde, ate = options["desde"], options["ate"]
+        if desde is None or ate is None:
+            limites = Marcacao.objects.aggregate(primeira=Min("inicio"), ultima=Max("inicio"))
+            if limites["primeira"] is None:
+                self.stderr.write("Não há marcações.")
+                return
+            desde = desde or timezone.localtime(limites["primeira"]).date()
+            ate = ate or timezone.localtime(limites["ultima"]).date()
+
+        rows = exports.csv_rows(desde, ate) if options["format"] == "csv" else exports.jsonl_rows(desde, ate)
+        out = open(options["output"], "w", encoding="utf-8", newline="") if options["output"] else sys.stdout
+        try:
+            for block in exports.buffered(rows):
+                out.write(block)
+        finally:
+            if out is not sys.stdout:
+                out.close()
@@ -0,0 +1,78 @@
+# bookings/management/commands/import_bookings.py
+"""
+Importa marcações de um CSV ou JSONL (o formato de export_bookings).
+
+    python manage.py import_bookings historico.csv
+    python manage.py import_bookings historico.jsonl --create-missing
+    python manage.py import_bookings historico.csv --dry-run        # valida sem gravar
+    gzip -dc historico.jsonl.gz | python manage.py import_bookings - --format jsonl
+
+Serviços são procurados pelo nome, barbeiros e clientes pelo username. O
+criado_em das marcações importadas é a hora da importação.
+"""
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.imports import BATCH_SIZE, Importer, read_records
+
+
+class Command(BaseCommand):
+    help = "Importa marcações em massa (bulk_create por blocos, uma transação por bloco)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="ficheiro CSV/JSONL, ou - para stdin")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="por omissão, pela extensão")
+        parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="linhas por transação")
+        parser.add_argument("--create-missing", action="store_true",
+                            help="cria serviços, barbeiros e clientes desconhecidos")
+        parser.add_argument("--dry-run", action="store_true", help="valida e conta, mas desfaz tudo")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        if path == "-" and not options["format"]:
+            raise CommandError("Com stdin é preciso indicar --format.")
+        if options["batch"] < 1:
+            raise CommandError("--batch tem de ser positivo.")
+
+        try:
+            # utf-8-sig: aceita o BOM que o CSV exportado traz para o Excel
+            fh = sys.stdin if path == "-" else open(path, encoding="utf-8-sig", newline="")
+        except OSError as exc:
+            raise CommandError(f"Não foi possível abrir {path}: {exc}")
+
+        importer = Importer(
+            create_missing=options["create_missing"], dry_run=options["dry_run"], batch_size=options["batch"]
+        )
+        resultado = importer.resultado
+        started = time.perf_counter()
+        try:
+            records = read_records(fh, fmt)
+            while True:
+                chunk = list(islice(records, options["batch"]))
+                if not chunk:
+                    break
+                importer.import_chunk(chunk)
+                elapsed = time.perf_counter() - started
+                self.stderr.write(
+                    f"{resultado.lidas} linhas, {resultado.importadas} importadas "
+                    f"({resultado.lidas / elapsed:.0f} linhas/s)"
+                )
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+        importer.finish()
+
+        elapsed = time.perf_counter() - started
+        for number, motivo in resultado.erros:
+            self.stderr.write(f"linha {number}: {motivo}")
+        criados = ", ".join(f"{n} {key}" for key, n in resultado.criados.items() if n)
+        self.stdout.write(self.style.SUCCESS(
+            f"{'[dry run] ' if options['dry_run'] else ''}"
+            f"{resultado.lidas} linhas em {elapsed:.1f}s ({resultado.lidas / (elapsed or 1):.0f} linhas/s): "
+            f"{resultado.importadas} importadas, {resultado.repetidas} repetidas, "
+            f"{resultado.conflitos} em conflito, {resultado.invalidas} inválidas" + (f"; criados {criados}" if criados else "") + "."
+        ))
@@ -0,0 +1,50 @@
+# bookings/management/commands/refresh_rollups.py
+"""
+Recalcula os resumos de receita e utilização (bookings/analytics.py).
+
+    python manage.py refresh_rollups               # últimos 7 dias e próximos 60 (cron, à noite)
+    python manage.py refresh_rollups --days 30 --ahead 90
+    python manage.py refresh_rollups --all         # todo o histórico, mês a mês
+
+Ao longo do dia os resumos são atualizados marcação a marcação; a corrida da
+noite apanha o que as tarefas não cobrem (horários, ausências, preços).
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from bookings import analytics
+from bookings.models import Marcacao, MarcacaoArquivo
+
+
+class Command(BaseCommand):
+    help = "Recalcula as tabelas de resumo (ResumoDiario e CapacidadeDiaria)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help="dias para trás a recalcular")
+        parser.add_argument("--ahead", type=int, default=60, help="dias para a frente a recalcular")
+        parser.add_argument("--all", action="store_true", help="recalcula desde a primeira marcação")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        date_from = today - timedelta(days=options["days"])
+        date_to = today + timedelta(days=options["ahead"])
+
+        if options["all"]:
+            # as marcações arquivadas também contam (os dias antigos estão lá)
+            for model in (MarcacaoArquivo, Marcacao):
+                limites = model.objects.aggregate(primeira=Min("inicio"), ultima=Max("inicio"))
+                if limites["primeira"] is not None:
+                    date_from = min(date_from, timezone.localtime(limites["primeira"]).date())
+                    date_to = max(date_to, timezone.localtime(limites["ultima"]).date())
+
+        started = time.perf_counter()
+        # um mês por transação: não prende a BD nem a memória com anos de uma vez
+        total = analytics.refresh_range(date_from, date_to)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} resumo(s) de {date_from} a {date_to} em {time.perf_counter() - started:.2f}s."
+        ))
@@ -0,0 +1,52 @@
+# bookings/management/commands/regenerate_renditions.py
+"""
+Regenera as renditions de todas as imagens de serviços e barbeiros, em
+paralelo (um processo por núcleo, por omissão).
+
+    python manage.py regenerate_renditions --workers 4 --force
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from bookings.images import build_renditions
+from bookings.models import Barbeiro, Servico
+
+
+def _build(name, force):
+    try:
+        return name, len(build_renditions(name, force=force)), None
+    except (OSError, ValueError) as exc:
+        return name, 0, str(exc)
+
+
+class Command(BaseCommand):
+    help = "Regenera as renditions (WebP/AVIF/JPEG) de Servico.image e Barbeiro.foto."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--force", action="store_true", help="regenera mesmo as existentes")
+
+    def handle(self, *args, **options):
+        names = sorted(
+            set(Servico.objects.exclude(image="").exclude(image=None).values_list("image", flat=True))
+            | set(Barbeiro.objects.exclude(foto="").exclude(foto=None).values_list("foto", flat=True))
+        )
+        if not names:
+            self.stdout.write("Sem imagens.")
+            return
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = [pool.submit(_build, name, options["force"]) for name in names]
+            for future in as_completed(futures):
+                name, count, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+                else:
+                    done += 1
+                    self.stdout.write(f"{name}: {count} renditions", ending="\n")
+
+        self.stdout.write(self.style.SUCCESS(f"{done} imagens processadas, {failed} com erro."))
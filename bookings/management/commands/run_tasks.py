@@ -0,0 +1,57 @@
+# bookings/management/commands/run_tasks.py
+"""
+Worker da fila de tarefas (bookings/tasks.py, DatabaseBackend).
+
+    python manage.py run_tasks                 # corre até ser interrompido
+    python manage.py run_tasks --once          # esvazia a fila e sai (cron)
+    python manage.py run_tasks --batch 50 --sleep 2
+
+Para mais capacidade, arrancar vários workers (processos) em paralelo: cada
+um reserva os seus lotes e nunca executa uma tarefa reservada por outro.
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from bookings import tasks
+
+
+class Command(BaseCommand):
+    help = "Executa as tarefas em segundo plano guardadas na BD."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=20, help="tarefas reservadas de cada vez")
+        parser.add_argument("--sleep", type=float, default=1.0, help="espera (s) quando a fila está vazia")
+        parser.add_argument("--once", action="store_true", help="sai quando não houver mais tarefas prontas")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        worker = tasks.worker_id()
+        self.stdout.write(f"Worker {worker} a correr.")
+        total_done = total_failed = 0
+        while not self.stopping:
+            close_old_connections()
+            released = tasks.release_stale()
+            if released:
+                self.stderr.write(f"{released} tarefa(s) abandonada(s) devolvida(s) à fila.")
+
+            done, failed = tasks.run_batch(worker, options["batch"])
+            total_done += done
+            total_failed += failed
+            if done or failed:
+                self.stdout.write(f"{done} ok, {failed} com erro")
+            elif options["once"]:
+                break
+            else:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Fim: {total_done} ok, {total_failed} com erro."))
+
+    def _stop(self, signum, frame):
+        # acaba o lote em curso antes de sair
+        self.stopping = True
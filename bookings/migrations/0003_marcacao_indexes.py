@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_add_bio_to_barbeiro'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marcacao',
+            index=models.Index(fields=['barbeiro', 'inicio', 'status'], name='marcacao_barb_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marcacao',
+            index=models.Index(condition=models.Q(('status', 'cancelled'), _negated=True), fields=['barbeiro', 'inicio'], name='marcacao_barb_ativa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marcacao',
+            index=models.Index(fields=['cliente', 'inicio'], name='marcacao_cliente_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marcacao',
+            index=models.Index(fields=['inicio'], name='marcacao_inicio_idx'),
+        ),
+    ]
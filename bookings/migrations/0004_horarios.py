@@ -0,0 +1,75 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_marcacao_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Feriado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(unique=True)),
+                ('nome', models.CharField(max_length=100)),
+            ],
+            options={
+                'ordering': ['data'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HorarioSemanal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Segunda'), (1, 'Terça'), (2, 'Quarta'), (3, 'Quinta'), (4, 'Sexta'), (5, 'Sábado'), (6, 'Domingo')])),
+                ('inicio', models.TimeField()),
+                ('fim', models.TimeField()),
+                ('barbeiro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to='bookings.barbeiro')),
+            ],
+            options={
+                'ordering': ['barbeiro', 'dia_semana', 'inicio'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Pausa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(blank=True, choices=[(0, 'Segunda'), (1, 'Terça'), (2, 'Quarta'), (3, 'Quinta'), (4, 'Sexta'), (5, 'Sábado'), (6, 'Domingo')], null=True)),
+                ('inicio', models.TimeField()),
+                ('fim', models.TimeField()),
+                ('descricao', models.CharField(blank=True, max_length=100)),
+                ('barbeiro', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pausas', to='bookings.barbeiro')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Ausencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField()),
+                ('fim', models.DateTimeField()),
+                ('motivo', models.CharField(blank=True, max_length=100)),
+                ('barbeiro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ausencias', to='bookings.barbeiro')),
+            ],
+            options={
+                'ordering': ['-inicio'],
+                'indexes': [models.Index(fields=['barbeiro', 'fim'], name='ausencia_barb_fim_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ausencia',
+            constraint=models.CheckConstraint(check=models.Q(('fim__gt', models.F('inicio'))), name='ausencia_fim_depois_inicio'),
+        ),
+        migrations.AddConstraint(
+            model_name='horariosemanal',
+            constraint=models.CheckConstraint(check=models.Q(('fim__gt', models.F('inicio'))), name='horario_fim_depois_inicio'),
+        ),
+        migrations.AddConstraint(
+            model_name='pausa',
+            constraint=models.CheckConstraint(check=models.Q(('fim__gt', models.F('inicio'))), name='pausa_fim_depois_inicio'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_horarios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarefa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100)),
+                ('argumentos', models.JSONField(blank=True, default=dict)),
+                ('chave', models.CharField(blank=True, max_length=200, null=True)),
+                ('estado', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Em execução'), ('done', 'Concluída'), ('failed', 'Falhada')], default='pending', max_length=10)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('max_tentativas', models.PositiveSmallIntegerField(default=5)),
+                ('executar_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('reservada_por', models.CharField(blank=True, max_length=100)),
+                ('reservada_em', models.DateTimeField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('concluida_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'executar_em'], name='tarefa_estado_exec_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tarefa',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['pending', 'running'])), fields=('chave',), name='tarefa_chave_ativa_unica'),
+        ),
+    ]
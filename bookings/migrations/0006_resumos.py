@@ -0,0 +1,51 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_tarefas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('marcacoes', models.PositiveIntegerField(default=0)),
+                ('canceladas', models.PositiveIntegerField(default=0)),
+                ('minutos', models.PositiveIntegerField(default=0)),
+                ('receita', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('barbeiro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookings.barbeiro')),
+                ('servico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookings.servico')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CapacidadeDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('minutos_abertos', models.PositiveIntegerField(default=0)),
+                ('barbeiro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookings.barbeiro')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dia'], name='capacidade_dia_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='capacidadediaria',
+            constraint=models.UniqueConstraint(fields=('barbeiro', 'dia'), name='capacidade_barb_dia_unica'),
+        ),
+        migrations.AddIndex(
+            model_name='resumodiario',
+            index=models.Index(fields=['dia'], name='resumo_dia_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumodiario',
+            constraint=models.UniqueConstraint(fields=('barbeiro', 'dia', 'servico'), name='resumo_barb_dia_serv_unico'),
+        ),
+    ]
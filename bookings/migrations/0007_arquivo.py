@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_resumos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcacaoArquivo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('inicio', models.DateTimeField()),
+                ('criado_em', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('confirmed', 'Confirmada'), ('cancelled', 'Cancelada')], max_length=20)),
+                ('arquivada_em', models.DateTimeField(auto_now_add=True)),
+                ('barbeiro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookings.barbeiro')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('servico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookings.servico')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['barbeiro', 'inicio'], name='arquivo_barb_inicio_idx'), models.Index(fields=['cliente', 'inicio'], name='arquivo_cliente_inicio_idx'), models.Index(fields=['inicio'], name='arquivo_inicio_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_arquivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Versao',
+            fields=[
+                ('nome', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
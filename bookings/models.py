@@ -3,6 +3,8 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .signals import marcacao_status_changed
+
 
 # --------------------------
 # MODELO: SERVIÇO
@@ -48,6 +50,22 @@ class Marcacao(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
 
+    class Meta:
+        indexes = [
+            # agenda do barbeiro (com estado) e verificação de sobreposição
+            models.Index(fields=["barbeiro", "inicio", "status"], name="marcacao_barb_inicio_idx"),
+            # disponibilidade: só as marcações ativas
+            models.Index(
+                fields=["barbeiro", "inicio"],
+                name="marcacao_barb_ativa_idx",
+                condition=~models.Q(status="cancelled"),
+            ),
+            # dashboard do cliente
+            models.Index(fields=["cliente", "inicio"], name="marcacao_cliente_inicio_idx"),
+            # admin (date_hierarchy / ordenação por início)
+            models.Index(fields=["inicio"], name="marcacao_inicio_idx"),
+        ]
+
     # ---------- NOVAS PROPRIEDADES ----------
     @property
     def data(self):
@@ -60,13 +78,241 @@ class Marcacao(models.Model):
         return timezone.localtime(self.inicio).strftime("%H:%M")
 
     # ---------- MÉTODOS DE CONTROLO ----------
+    def _set_status(self, status):
+        previous = self.status
+        self.status = status
+        self.save(update_fields=["status"])
+        marcacao_status_changed.send(
+            sender=Marcacao, instance=self, status=status, previous=previous
+        )
+
     def confirm(self):
-        self.status = "confirmed"
-        self.save()
+        self._set_status("confirmed")
 
     def cancel(self):
-        self.status = "cancelled"
-        self.save()
+        self._set_status("cancelled")
 
     def __str__(self):
         return f"{self.servico.nome} - {self.data} {self.hora}"
+
+
+# --------------------------
+# HORÁRIOS DOS BARBEIROS
+# --------------------------
+DIAS_SEMANA = [
+    (0, "Segunda"),
+    (1, "Terça"),
+    (2, "Quarta"),
+    (3, "Quinta"),
+    (4, "Sexta"),
+    (5, "Sábado"),
+    (6, "Domingo"),
+]
+
+
+class HorarioSemanal(models.Model):
+    """Turno semanal de um barbeiro (pode haver vários no mesmo dia)."""
+
+    barbeiro = models.ForeignKey(Barbeiro, on_delete=models.CASCADE, related_name="horarios")
+    dia_semana = models.PositiveSmallIntegerField(choices=DIAS_SEMANA)
+    inicio = models.TimeField()
+    fim = models.TimeField()
+
+    class Meta:
+        ordering = ["barbeiro", "dia_semana", "inicio"]
+        constraints = [
+            models.CheckConstraint(check=models.Q(fim__gt=models.F("inicio")), name="horario_fim_depois_inicio"),
+        ]
+
+    def __str__(self):
+        return f"{self.barbeiro} - {self.get_dia_semana_display()} {self.inicio:%H:%M}-{self.fim:%H:%M}"
+
+
+class Pausa(models.Model):
+    """
+    Pausa recorrente (ex.: almoço). Sem barbeiro aplica-se a todos; sem dia
+    da semana aplica-se a todos os dias.
+    """
+
+    barbeiro = models.ForeignKey(
+        Barbeiro, on_delete=models.CASCADE, related_name="pausas", null=True, blank=True
+    )
+    dia_semana = models.PositiveSmallIntegerField(choices=DIAS_SEMANA, null=True, blank=True)
+    inicio = models.TimeField()
+    fim = models.TimeField()
+    descricao = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=models.Q(fim__gt=models.F("inicio")), name="pausa_fim_depois_inicio"),
+        ]
+
+    def __str__(self):
+        return self.descricao or f"Pausa {self.inicio:%H:%M}-{self.fim:%H:%M}"
+
+
+class Feriado(models.Model):
+    """Dia em que a barbearia está fechada."""
+
+    data = models.DateField(unique=True)
+    nome = models.CharField(max_length=100)
+
+    class Meta:
+        ordering = ["data"]
+
+    def __str__(self):
+        return f"{self.nome} ({self.data})"
+
+
+class Ausencia(models.Model):
+    """Ausência pontual de um barbeiro (férias, consulta, formação...)."""
+
+    barbeiro = models.ForeignKey(Barbeiro, on_delete=models.CASCADE, related_name="ausencias")
+    inicio = models.DateTimeField()
+    fim = models.DateTimeField()
+    motivo = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ["-inicio"]
+        indexes = [
+            models.Index(fields=["barbeiro", "fim"], name="ausencia_barb_fim_idx"),
+        ]
+        constraints = [
+            models.CheckConstraint(check=models.Q(fim__gt=models.F("inicio")), name="ausencia_fim_depois_inicio"),
+        ]
+
+    def __str__(self):
+        return f"{self.barbeiro} - {self.motivo or 'Ausência'}"
+
+
+# --------------------------
+# FILA DE TAREFAS (bookings/tasks.py)
+# --------------------------
+class Tarefa(models.Model):
+    ESTADOS = [
+        ("pending", "Pendente"),
+        ("running", "Em execução"),
+        ("done", "Concluída"),
+        ("failed", "Falhada"),
+    ]
+
+    nome = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict, blank=True)
+    # no máximo uma tarefa pendente/em execução com a mesma chave
+    chave = models.CharField(max_length=200, null=True, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default="pending")
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    max_tentativas = models.PositiveSmallIntegerField(default=5)
+    executar_em = models.DateTimeField(default=timezone.now)
+    reservada_por = models.CharField(max_length=100, blank=True)
+    reservada_em = models.DateTimeField(null=True, blank=True)
+    erro = models.TextField(blank=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["estado", "executar_em"], name="tarefa_estado_exec_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["chave"],
+                condition=models.Q(estado__in=["pending", "running"]),
+                name="tarefa_chave_ativa_unica",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.nome} [{self.estado}]"
+
+
+# --------------------------
+# RESUMOS PARA ANÁLISE (bookings/analytics.py)
+# --------------------------
+class ResumoDiario(models.Model):
+    """Totais de um dia por barbeiro e serviço (recalculados a partir das marcações)."""
+
+    dia = models.DateField()
+    barbeiro = models.ForeignKey(Barbeiro, on_delete=models.CASCADE, related_name="+")
+    servico = models.ForeignKey(Servico, on_delete=models.CASCADE, related_name="+")
+    marcacoes = models.PositiveIntegerField(default=0)  # não canceladas
+    canceladas = models.PositiveIntegerField(default=0)
+    minutos = models.PositiveIntegerField(default=0)
+    receita = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["barbeiro", "dia", "servico"], name="resumo_barb_dia_serv_unico"),
+        ]
+        indexes = [
+            models.Index(fields=["dia"], name="resumo_dia_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.barbeiro_id}/{self.servico_id}: {self.marcacoes}"
+
+
+class CapacidadeDiaria(models.Model):
+    """Minutos em que o barbeiro esteve/estará a trabalhar num dia (ver schedule.py)."""
+
+    dia = models.DateField()
+    barbeiro = models.ForeignKey(Barbeiro, on_delete=models.CASCADE, related_name="+")
+    minutos_abertos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["barbeiro", "dia"], name="capacidade_barb_dia_unica"),
+        ]
+        indexes = [
+            models.Index(fields=["dia"], name="capacidade_dia_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.barbeiro_id}: {self.minutos_abertos} min"
+
+
+# --------------------------
+# ARQUIVO DE MARCAÇÕES ANTIGAS (bookings/archive.py)
+# --------------------------
+class MarcacaoArquivo(models.Model):
+    """
+    Marcações antigas, tiradas de Marcacao pelo comando archive_bookings.
+    Mesma forma e mesmo id da marcação original; só de leitura.
+    """
+
+    arquivada = True  # os templates escondem as ações nas marcações arquivadas
+
+    id = models.BigIntegerField(primary_key=True)
+    cliente = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    barbeiro = models.ForeignKey(Barbeiro, on_delete=models.CASCADE, related_name="+")
+    servico = models.ForeignKey(Servico, on_delete=models.CASCADE, related_name="+")
+    inicio = models.DateTimeField()
+    criado_em = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Marcacao.STATUS_CHOICES)
+    arquivada_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["barbeiro", "inicio"], name="arquivo_barb_inicio_idx"),
+            models.Index(fields=["cliente", "inicio"], name="arquivo_cliente_inicio_idx"),
+            models.Index(fields=["inicio"], name="arquivo_inicio_idx"),
+        ]
+
+    data = Marcacao.data
+    hora = Marcacao.hora
+
+    def __str__(self):
+        return f"{self.servico.nome} - {self.data} {self.hora}"
+
+
+# --------------------------
+# VERSÕES PARTILHADAS ENTRE PROCESSOS (bookings/versions.py)
+# --------------------------
+class Versao(models.Model):
+    """Versão (timestamp em ns) de um conjunto de dados em cache, ex.: "catalog"."""
+
+    nome = models.CharField(max_length=100, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nome}={self.valor}"
@@ -0,0 +1,75 @@
+# bookings/notifications.py
+"""
+Efeitos secundários das mudanças de estado das marcações.
+
+Correm como tarefas (ver tasks.py), fora do pedido: os sinais em signals.py
+só enfileiram, depois do commit.
+"""
+import logging
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from django.utils.translation import gettext_lazy
+
+from .models import Marcacao
+from .tasks import enqueue_many, task
+
+audit_logger = logging.getLogger("bookings.audit")
+
+EVENTOS = {
+    "created": gettext_lazy("Marcação recebida"),
+    "confirmed": gettext_lazy("Marcação confirmada"),
+    "cancelled": gettext_lazy("Marcação cancelada"),
+}
+
+
+def _key(marcacao_id, evento):
+    return f"marcacao:{marcacao_id}:{evento}"
+
+
+def notify(marcacao_ids, evento):
+    """Enfileira a notificação (email + auditoria) de várias marcações de uma vez."""
+    if evento not in EVENTOS:
+        return
+    enqueue_many([
+        (notificar_marcacao, {"marcacao_id": pk, "evento": evento}, _key(pk, evento), None)
+        for pk in marcacao_ids
+    ])
+
+
+# ----------------------------
+# TAREFAS
+# ----------------------------
+@task(name="bookings.notificar_marcacao")
+def notificar_marcacao(marcacao_id, evento):
+    marcacao = (
+        Marcacao.objects.select_related("cliente", "barbeiro__user", "servico")
+        .filter(pk=marcacao_id)
+        .first()
+    )
+    if marcacao is None:
+        # apagada entretanto: nada a fazer
+        return
+
+    audit_logger.info(
+        "marcacao=%s evento=%s estado=%s barbeiro=%s inicio=%s",
+        marcacao.pk, evento, marcacao.status, marcacao.barbeiro_id, marcacao.inicio.isoformat(),
+    )
+
+    email = marcacao.cliente.email
+    if not email:
+        return
+    inicio = timezone.localtime(marcacao.inicio)
+    send_mail(
+        subject=str(EVENTOS[evento]),
+        message=_("%(servico)s com %(barbeiro)s em %(data)s às %(hora)s.") % {
+            "servico": marcacao.servico.nome,
+            "barbeiro": marcacao.barbeiro,
+            "data": inicio.strftime("%d/%m/%Y"),
+            "hora": inicio.strftime("%H:%M"),
+        },
+        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
+        recipient_list=[email],
+    )
@@ -0,0 +1,108 @@
+# bookings/occupancy.py
+"""
+Ocupação de um barbeiro num dia, minuto a minuto.
+
+Cada dia é um bytearray de 1440 posições (uma por minuto do dia local): 0 é
+livre; qualquer outro valor é ocupado. Os minutos fora do horário de
+trabalho valem 1 e cada marcação soma 1 aos minutos que ocupa, por isso
+marcar e desmarcar são operações locais (não é preciso reconstruir o dia) e
+nunca abrem minutos fechados.
+
+Os horários livres para uma duração D são as posições alinhadas ao passo
+onde começam D minutos seguidos a 0; a procura é feita com bytes.find, que
+percorre a memória em C. O dia serializa-se para bytes para ir para o
+cache.
+"""
+from datetime import date, timedelta
+
+from django.utils import timezone
+
+from .schedule import DAY_MINUTES, at_minute, minute_of_day
+
+CLOSED = 1
+
+
+class DayOccupancy:
+    __slots__ = ("day", "minutes")
+
+    def __init__(self, day: date, minutes=None):
+        self.day = day
+        self.minutes = bytearray(minutes) if minutes is not None else bytearray([CLOSED]) * DAY_MINUTES
+
+    @classmethod
+    def build(cls, day: date, opening=(), bookings=()):
+        """Dia com os intervalos `opening` (minutos) abertos e as `bookings` (inicio, duração) marcadas."""
+        occupancy = cls(day)
+        for start, end in opening:
+            occupancy.open(start, end)
+        for inicio, duracao in bookings:
+            occupancy.book(inicio, duracao)
+        return occupancy
+
+    # ---------- SERIALIZAÇÃO ----------
+    def to_bytes(self):
+        return bytes(self.minutes)
+
+    @classmethod
+    def from_bytes(cls, day: date, data):
+        return cls(day, data)
+
+    # ---------- ALTERAÇÕES ----------
+    def open(self, start, end):
+        self.minutes[start:end] = bytes(end - start)
+
+    def _span(self, inicio, duracao):
+        start = minute_of_day(inicio, self.day)
+        end = minute_of_day(inicio + timedelta(minutes=duracao), self.day, round_up=True)
+        return start, end
+
+    def book(self, inicio, duracao):
+        """Marca [inicio, inicio + duração) como ocupado."""
+        start, end = self._span(inicio, duracao)
+        minutes = self.minutes
+        for m in range(start, end):
+            if minutes[m] < 255:
+                minutes[m] += 1
+
+    def release(self, inicio, duracao):
+        """Desfaz um book() anterior com os mesmos argumentos."""
+        start, end = self._span(inicio, duracao)
+        minutes = self.minutes
+        for m in range(start, end):
+            if minutes[m]:
+                minutes[m] -= 1
+
+    # ---------- CONSULTA ----------
+    def is_free(self, start, end):
+        return not any(self.minutes[start:end])
+
+    def iter_free(self, duration_min, step_min, start_minute=0):
+        """Minutos (múltiplos de step_min) onde começam duration_min minutos livres."""
+        if duration_min <= 0:
+            return
+        needle = bytes(duration_min)
+        find = self.minutes.find
+        pos = -(-start_minute // step_min) * step_min
+        while True:
+            found = find(needle, pos)
+            if found < 0:
+                return
+            aligned = -(-found // step_min) * step_min
+            if aligned == found:
+                yield found
+                pos = found + step_min
+            else:
+                # o bloco livre começa fora do passo: procura de novo a partir do próximo
+                pos = aligned
+
+    def iter_slots(self, duration_min, step_min, not_before=None):
+        """Horários livres (datetimes aware) para um serviço de duration_min minutos."""
+        start_minute = 0
+        if not_before is not None:
+            start_minute = minute_of_day(not_before, self.day, round_up=True)
+        tz = timezone.get_current_timezone()
+        for m in self.iter_free(duration_min, step_min, start_minute):
+            yield at_minute(self.day, m, tz)
+
+    def slots(self, duration_min, step_min, not_before=None):
+        return list(self.iter_slots(duration_min, step_min, not_before))
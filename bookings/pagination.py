@@ -0,0 +1,148 @@
+# bookings/pagination.py
+"""
+Paginação por chave (keyset) sobre (inicio, id), em ordem decrescente.
+
+Em vez de OFFSET, cada página continua a partir da última linha da anterior:
+    WHERE inicio < :inicio OR (inicio = :inicio AND id < :id)
+O cursor é esse par codificado em base64 (seguro para URLs).
+
+Por omissão só se mostra uma janela de "hoje ± N dias"; os parâmetros
+`desde`/`ate` (AAAA-MM-DD) permitem mudar a janela, dentro de
+[MIN_DATE, MAX_DATE].
+"""
+import base64
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .archive import merge_desc, reaches_archive
+from .availability import day_bounds
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+WINDOW_DAYS = 30
+# limites das janelas: datas como 0001-01-01 ou 9999-12-31 rebentariam
+# (OverflowError) ao calcular os períodos anterior/seguinte
+MIN_DATE = date(1970, 1, 1)
+MAX_DATE = date(2099, 12, 31)
+
+
+# ----------------------------
+# CURSOR
+# ----------------------------
+def encode_cursor(inicio: datetime, pk: int) -> str:
+    raw = f"{inicio.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(value):
+    """
+    Retorna (inicio, pk) ou None se o cursor for inválido (a página volta
+    a ser a primeira). Só aceita o que encode_cursor produz: data com fuso
+    horário e um id positivo que caiba num bigint.
+    """
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        inicio, pk = raw.split("|")
+        inicio, pk = datetime.fromisoformat(inicio), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if timezone.is_naive(inicio) or not 0 < pk < 2**63:
+        return None
+    return inicio, pk
+
+
+# ----------------------------
+# JANELA
+# ----------------------------
+@dataclass
+class Window:
+    desde: date
+    ate: date  # inclusive
+
+    @property
+    def days(self):
+        return (self.ate - self.desde).days + 1
+
+    def previous(self):
+        """Período do mesmo tamanho antes deste, ou None em MIN_DATE."""
+        if self.desde <= MIN_DATE:
+            return None
+        desde = max(self.desde - timedelta(days=self.days), MIN_DATE)
+        return Window(desde, self.desde - timedelta(days=1))
+
+    def next(self):
+        """Período do mesmo tamanho depois deste, ou None em MAX_DATE."""
+        if self.ate >= MAX_DATE:
+            return None
+        ate = min(self.ate + timedelta(days=self.days), MAX_DATE)
+        return Window(self.ate + timedelta(days=1), ate)
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+    except ValueError:
+        return None
+
+
+def window_from_request(request, days=WINDOW_DAYS) -> Window:
+    today = timezone.localdate()
+    desde = _parse_date(request.GET.get("desde")) or today - timedelta(days=days)
+    ate = _parse_date(request.GET.get("ate")) or today + timedelta(days=days)
+    if ate < desde:
+        desde, ate = ate, desde
+    return Window(min(max(desde, MIN_DATE), MAX_DATE), min(max(ate, MIN_DATE), MAX_DATE))
+
+
+# ----------------------------
+# PÁGINA
+# ----------------------------
+@dataclass
+class KeysetPage:
+    items: list
+    window: Window
+    next_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def keyset_queryset(qs, window: Window, cursor=None):
+    """Aplica a janela, o cursor e a ordenação (-inicio, -id)."""
+    start, _ = day_bounds(window.desde)
+    _, end = day_bounds(window.ate)
+    qs = qs.filter(inicio__gte=start, inicio__lt=end)
+    if cursor:
+        inicio, pk = cursor
+        qs = qs.filter(Q(inicio__lt=inicio) | Q(inicio=inicio, pk__lt=pk))
+    return qs.order_by("-inicio", "-id")
+
+
+def paginate(qs, request, size=PAGE_SIZE, archive=None) -> KeysetPage:
+    """
+    Lê janela, cursor e tamanho do pedido e devolve uma página. Com
+    `archive` (o mesmo filtro sobre MarcacaoArquivo), as janelas que chegam
+    ao arquivo juntam as linhas das duas tabelas, pela mesma ordem.
+    """
+    window = window_from_request(request)
+    cursor = decode_cursor(request.GET.get("cursor"))
+    try:
+        size = max(1, min(int(request.GET.get("size", size)), MAX_PAGE_SIZE))
+    except ValueError:
+        pass
+
+    rows = list(keyset_queryset(qs, window, cursor)[: size + 1])
+    if archive is not None and reaches_archive(day_bounds(window.desde)[0]):
+        older = list(keyset_queryset(archive, window, cursor)[: size + 1])
+        rows = merge_desc(rows, older, limit=size + 1)
+    page = KeysetPage(items=rows[:size], window=window)
+    if len(rows) > size:
+        last = page.items[-1]
+        page.next_cursor = encode_cursor(last.inicio, last.pk)
+    return page
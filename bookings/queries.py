@@ -0,0 +1,49 @@
+# bookings/queries.py
+"""
+Querysets usados nos caminhos mais frequentes.
+
+Ficam aqui para que as views e o comando `check_query_plans` usem
+exatamente o mesmo SQL.
+"""
+from .models import Marcacao, MarcacaoArquivo
+
+
+def marcacoes_ativas(barbeiro_ids, inicio_min, inicio_max):
+    """Marcações não canceladas com início em [inicio_min, inicio_max)."""
+    return Marcacao.objects.filter(
+        barbeiro_id__in=list(barbeiro_ids),
+        inicio__gte=inicio_min,
+        inicio__lt=inicio_max,
+    ).exclude(status="cancelled")
+
+
+def marcacoes_cliente(user):
+    return (
+        Marcacao.objects.filter(cliente=user)
+        .select_related("barbeiro__user", "servico")
+        .order_by("-inicio", "-criado_em")
+    )
+
+
+def marcacoes_barbeiro(barbeiro):
+    return (
+        Marcacao.objects.filter(barbeiro=barbeiro)
+        .select_related("cliente", "servico")
+        .order_by("-inicio", "-criado_em")
+    )
+
+
+def arquivo_cliente(user):
+    return (
+        MarcacaoArquivo.objects.filter(cliente=user)
+        .select_related("barbeiro__user", "servico")
+        .order_by("-inicio", "-id")
+    )
+
+
+def arquivo_barbeiro(barbeiro):
+    return (
+        MarcacaoArquivo.objects.filter(barbeiro=barbeiro)
+        .select_related("cliente", "servico")
+        .order_by("-inicio", "-id")
+    )
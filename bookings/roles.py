@@ -0,0 +1,97 @@
+# bookings/roles.py
+"""
+Papel do utilizador (barbeiro ou cliente), resolvido uma vez por pedido.
+
+`request.barbeiro` (posto pelo RoleMiddleware) é o Barbeiro do utilizador
+autenticado, ou None. Só é calculado quando alguém o usa, e vem do cache
+por utilizador durante alguns segundos: a BD é consultada no máximo uma
+vez por utilizador nesse intervalo, e logo a seguir a o Barbeiro mudar no
+mesmo processo (ver signals.py). O cache é de cada processo, por isso um
+barbeiro removido noutro worker perde o acesso aqui ao fim desse prazo,
+que tem de ficar curto. O `user` do Barbeiro é o próprio request.user,
+por isso barbeiro.user também não faz query.
+
+Nas views de barbeiro, @barbeiro_required substitui o antigo
+try/Barbeiro.objects.get(user=...)/except.
+
+Definições:
+    ROLE_CACHE_TIMEOUT  segundos (por omissão 10)
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext as _
+
+_NOT_BARBEIRO = 0  # marca "não é barbeiro" no cache (None é "não está em cache")
+
+
+def _key(user_id):
+    return f"role:barbeiro:{user_id}"
+
+
+def invalidate(user_ids):
+    cache.delete_many([_key(user_id) for user_id in user_ids if user_id])
+
+
+def _load(user):
+    from .models import Barbeiro  # os modelos importam signals, que importa este módulo
+
+    barbeiro = cache.get(_key(user.pk))
+    if barbeiro is None:
+        barbeiro = Barbeiro.objects.filter(user_id=user.pk).first() or _NOT_BARBEIRO
+        cache.set(_key(user.pk), barbeiro, getattr(settings, "ROLE_CACHE_TIMEOUT", 10))
+    if barbeiro == _NOT_BARBEIRO:
+        return None
+    barbeiro.user = user
+    return barbeiro
+
+
+def get_barbeiro(request):
+    """Barbeiro do utilizador do pedido, ou None (memorizado no pedido)."""
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return None
+    # a chave inclui o utilizador: depois do login o pedido muda de user
+    cached = getattr(request, "_cached_barbeiro", None)
+    if cached is None or cached[0] != user.pk:
+        cached = request._cached_barbeiro = (user.pk, _load(user))
+    return cached[1]
+
+
+# ----------------------------
+# MIDDLEWARE E DECORADOR
+# ----------------------------
+class RoleMiddleware(MiddlewareMixin):
+    """Põe `request.barbeiro` (preguiçoso) no pedido; vem depois do AuthenticationMiddleware."""
+
+    def process_request(self, request):
+        request.barbeiro = SimpleLazyObject(lambda: get_barbeiro(request))
+
+
+def barbeiro_required(view_func=None, *, json=False):
+    """
+    Só deixa passar barbeiros; os outros voltam ao dashboard com uma
+    mensagem (ou recebem 403 em JSON). Na view, request.barbeiro é já o
+    Barbeiro (não o objeto preguiçoso).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            barbeiro = get_barbeiro(request)
+            if barbeiro is None:
+                error = _("A tua conta não está registada como barbeiro.")
+                if json:
+                    return JsonResponse({"error": error}, status=403)
+                messages.error(request, error)
+                return redirect("bookings:dashboard")
+            request.barbeiro = barbeiro
+            return view(request, *args, **kwargs)
+        return wrapper
+
+    return decorator(view_func) if view_func is not None else decorator
@@ -0,0 +1,244 @@
+# bookings/schedule.py
+"""
+Horários de trabalho dos barbeiros.
+
+O horário de cada dia resulta de:
+
+    turnos semanais (HorarioSemanal; sem turnos usa WORK_START-WORK_END)
+    - pausas recorrentes (Pausa)
+    - feriados (Feriado)
+    - ausências pontuais (Ausencia)
+
+A parte recorrente (turnos - pausas) é compilada por barbeiro numa lista de
+intervalos em minutos para cada dia da semana e guardada no cache do Django,
+com uma versão (na BD, ver versions.py) que muda sempre que um horário ou
+pausa é gravado (ver signals.py); os outros workers veem-na ao fim de
+VERSIONS_CACHE_TIMEOUT segundos. Feriados e ausências de um período inteiro vêm em duas queries
+e são aplicados dia a dia, por isso meses de exceções custam o mesmo número
+de queries que um só dia.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from . import versions
+from .models import Ausencia, Feriado, HorarioSemanal, Pausa
+
+# horário por omissão para barbeiros sem turnos semanais
+WORK_START = time(9, 0)
+WORK_END = time(18, 0)
+
+VERSION_NAME = "schedule"
+# a chave já inclui a versão: o prazo só limita o que fica no cache
+WEEK_CACHE_TIMEOUT = 24 * 60 * 60
+DAY_MINUTES = 24 * 60
+
+
+def version():
+    return versions.get(VERSION_NAME)
+
+
+def bump():
+    versions.bump(VERSION_NAME)
+
+
+# ----------------------------
+# INTERVALOS
+# ----------------------------
+def merge_intervals(intervals):
+    """Ordena e funde intervalos sobrepostos ou contíguos."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+
+def subtract_intervals(intervals, cuts):
+    """`intervals` menos `cuts` (ambos ordenados e fundidos), num só varrimento."""
+    result = []
+    i, n = 0, len(cuts)
+    for start, end in intervals:
+        while i < n and cuts[i][1] <= start:
+            i += 1
+        j = i
+        while j < n and cuts[j][0] < end:
+            if cuts[j][0] > start:
+                result.append((start, cuts[j][0]))
+            start = max(start, cuts[j][1])
+            j += 1
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+def _minutes(t: time):
+    return t.hour * 60 + t.minute
+
+
+def minute_of_day(dt, day: date, round_up=False):
+    """Minuto do dia local `day` correspondente a dt, limitado a [0, 1440]."""
+    local = timezone.localtime(dt)
+    if local.date() < day:
+        return 0
+    if local.date() > day:
+        return DAY_MINUTES
+    minutes = local.hour * 60 + local.minute
+    if round_up and (local.second or local.microsecond):
+        minutes += 1
+    return minutes
+
+
+def at_minute(day: date, minutes, tz=None):
+    """datetime (aware) do minuto `minutes` do dia local `day`."""
+    if minutes >= DAY_MINUTES:
+        day, minutes = day + timedelta(days=1), 0
+    # com zoneinfo, associar o fuso é o mesmo que make_aware (e bem mais barato)
+    tz = tz or timezone.get_current_timezone()
+    return datetime.combine(day, time(minutes // 60, minutes % 60), tzinfo=tz)
+
+
+def _moment(memo, day: date, minutes):
+    value = memo.get(minutes)
+    if value is None:
+        value = memo[minutes] = at_minute(day, minutes)
+    return value
+
+
+# ----------------------------
+# PARTE RECORRENTE (COMPILADA E EM CACHE)
+# ----------------------------
+def _week_key(barbeiro_id, ver):
+    return f"schedule:week:{barbeiro_id}:{ver}"
+
+
+def _compile_weeks(barbeiro_ids):
+    """{barbeiro_id: [intervalos em minutos por dia da semana]} (duas queries)."""
+    shifts = {barbeiro_id: [[] for _ in range(7)] for barbeiro_id in barbeiro_ids}
+    has_shifts = set()
+    for barbeiro_id, dia, inicio, fim in HorarioSemanal.objects.filter(
+        barbeiro_id__in=barbeiro_ids
+    ).values_list("barbeiro_id", "dia_semana", "inicio", "fim"):
+        shifts[barbeiro_id][dia].append((_minutes(inicio), _minutes(fim)))
+        has_shifts.add(barbeiro_id)
+
+    default = (_minutes(WORK_START), _minutes(WORK_END))
+    for barbeiro_id in barbeiro_ids:
+        if barbeiro_id not in has_shifts:
+            shifts[barbeiro_id] = [[default] for _ in range(7)]
+
+    breaks = {barbeiro_id: [[] for _ in range(7)] for barbeiro_id in barbeiro_ids}
+    for barbeiro_id, dia, inicio, fim in Pausa.objects.filter(
+        Q(barbeiro_id__in=barbeiro_ids) | Q(barbeiro__isnull=True)
+    ).values_list("barbeiro_id", "dia_semana", "inicio", "fim"):
+        targets = [barbeiro_id] if barbeiro_id is not None else barbeiro_ids
+        dias = [dia] if dia is not None else range(7)
+        for target in targets:
+            for d in dias:
+                breaks[target][d].append((_minutes(inicio), _minutes(fim)))
+
+    return {
+        barbeiro_id: [
+            subtract_intervals(merge_intervals(shifts[barbeiro_id][d]), merge_intervals(breaks[barbeiro_id][d]))
+            for d in range(7)
+        ]
+        for barbeiro_id in barbeiro_ids
+    }
+
+
+def weekly_templates(barbeiro_ids):
+    """Parte recorrente do horário de cada barbeiro, lida do cache sempre que possível."""
+    barbeiro_ids = list(barbeiro_ids)
+    ver = version()
+    keys = {barbeiro_id: _week_key(barbeiro_id, ver) for barbeiro_id in barbeiro_ids}
+    found = cache.get_many(keys.values())
+    weeks = {barbeiro_id: found[key] for barbeiro_id, key in keys.items() if key in found}
+
+    missing = [barbeiro_id for barbeiro_id in barbeiro_ids if barbeiro_id not in weeks]
+    if missing:
+        compiled = _compile_weeks(missing)
+        cache.set_many({keys[barbeiro_id]: week for barbeiro_id, week in compiled.items()}, WEEK_CACHE_TIMEOUT)
+        weeks.update(compiled)
+    return weeks
+
+
+# ----------------------------
+# EXCEÇÕES E HORÁRIO POR DIA
+# ----------------------------
+def _absences(barbeiro_ids, date_from: date, date_to: date):
+    """{barbeiro_id: {dia: [intervalos em minutos]}} das ausências no período."""
+    range_start, range_end = at_minute(date_from, 0), at_minute(date_to, DAY_MINUTES)
+    rows = Ausencia.objects.filter(
+        barbeiro_id__in=barbeiro_ids, inicio__lt=range_end, fim__gt=range_start
+    ).values_list("barbeiro_id", "inicio", "fim")
+
+    result = {}
+    for barbeiro_id, inicio, fim in rows:
+        day = max(timezone.localtime(inicio).date(), date_from)
+        last = min(timezone.localtime(fim).date(), date_to)
+        while day <= last:
+            interval = (minute_of_day(inicio, day), minute_of_day(fim, day, round_up=True))
+            if interval[0] < interval[1]:
+                result.setdefault(barbeiro_id, {}).setdefault(day, []).append(interval)
+            day += timedelta(days=1)
+    return result
+
+
+def open_minutes(barbeiro_ids, date_from: date, date_to: date):
+    """
+    Intervalos em que cada barbeiro está a trabalhar, em minutos do dia
+    local, entre date_from e date_to (inclusive). No máximo duas queries
+    (feriados e ausências) quando a parte recorrente já está em cache.
+
+    Retorna {barbeiro_id: {dia: [(inicio, fim), ...]}}; dias sem horário
+    ficam de fora.
+    """
+    barbeiro_ids = list(barbeiro_ids)
+    weeks = weekly_templates(barbeiro_ids)
+    feriados = set(Feriado.objects.filter(data__range=(date_from, date_to)).values_list("data", flat=True))
+    absences = _absences(barbeiro_ids, date_from, date_to)
+
+    result = {barbeiro_id: {} for barbeiro_id in barbeiro_ids}
+    day = date_from
+    while day <= date_to:
+        if day not in feriados:
+            weekday = day.weekday()
+            for barbeiro_id in barbeiro_ids:
+                minutes = weeks[barbeiro_id][weekday]
+                cuts = absences.get(barbeiro_id, {}).get(day)
+                if cuts:
+                    minutes = subtract_intervals(minutes, merge_intervals(cuts))
+                if minutes:
+                    result[barbeiro_id][day] = minutes
+        day += timedelta(days=1)
+    return result
+
+
+def open_intervals(barbeiro_ids, date_from: date, date_to: date):
+    """Como open_minutes, mas com datetimes (aware) em vez de minutos."""
+    result = {}
+    moments = {}
+    for barbeiro_id, days in open_minutes(barbeiro_ids, date_from, date_to).items():
+        result[barbeiro_id] = {}
+        for day, minutes in days.items():
+            # os barbeiros costumam partilhar horas: converte cada minuto uma vez por dia
+            memo = moments.setdefault(day, {})
+            result[barbeiro_id][day] = [
+                (_moment(memo, day, start), _moment(memo, day, end)) for start, end in minutes
+            ]
+    return result
+
+
+def open_intervals_for_day(barbeiro_id, day: date):
+    return open_intervals([barbeiro_id], day, day)[barbeiro_id].get(day, [])
+
+
+def is_open(barbeiro_id, inicio, fim):
+    """[inicio, fim) cabe inteiramente num dos intervalos de trabalho do barbeiro?"""
+    day = timezone.localtime(inicio).date()
+    return any(start <= inicio and fim <= end for start, end in open_intervals_for_day(barbeiro_id, day))
@@ -0,0 +1,105 @@
+# bookings/services.py
+"""
+Operações de escrita sobre marcações.
+
+As views chamam estas funções em vez de gravar diretamente nos modelos, para
+que as regras (sobreposição, transações, bloqueios) fiquem num só sítio.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+
+from . import schedule
+from .models import Barbeiro, Marcacao
+from .queries import marcacoes_ativas
+from .signals import marcacoes_status_changed
+
+# nenhuma marcação começa mais de 24h antes de outra com que se sobreponha
+MAX_BOOKING_SPAN = timedelta(hours=24)
+
+
+class SlotIndisponivel(Exception):
+    """O horário pedido já está ocupado ou fora do horário do barbeiro."""
+
+
+# ----------------------------
+# SOBREPOSIÇÃO
+# ----------------------------
+def _has_overlap(barbeiro_id, inicio, fim):
+    rows = marcacoes_ativas([barbeiro_id], inicio - MAX_BOOKING_SPAN, fim).values_list(
+        "inicio", "servico__duracao_min"
+    )
+    return any(
+        outro_inicio + timedelta(minutes=duracao) > inicio
+        for outro_inicio, duracao in rows
+    )
+
+
+def _lock_barbeiro(barbeiro_id):
+    # UPDATE sem efeito: em PostgreSQL bloqueia a linha do barbeiro até ao fim
+    # da transação; em SQLite obtém logo o lock de escrita da base de dados.
+    # Em ambos os casos, pedidos concorrentes para o mesmo barbeiro esperam.
+    Barbeiro.objects.filter(pk=barbeiro_id).update(ativo=F("ativo"))
+
+
+# ----------------------------
+# CRIAR MARCAÇÃO
+# ----------------------------
+def criar_marcacao(cliente, barbeiro, servico, inicio, status="pending"):
+    """
+    Cria a marcação se [inicio, inicio + duração do serviço) estiver livre e
+    dentro do horário de trabalho do barbeiro.
+
+    A verificação e a inserção correm na mesma transação, com o barbeiro
+    bloqueado. Lança SlotIndisponivel se o horário já estiver ocupado.
+    """
+    fim = inicio + timedelta(minutes=servico.duracao_min)
+    if not schedule.is_open(barbeiro.pk, inicio, fim):
+        raise SlotIndisponivel
+    with transaction.atomic():
+        _lock_barbeiro(barbeiro.pk)
+        if _has_overlap(barbeiro.pk, inicio, fim):
+            raise SlotIndisponivel
+        return Marcacao.objects.create(
+            cliente=cliente,
+            barbeiro=barbeiro,
+            servico=servico,
+            inicio=inicio,
+            status=status,
+        )
+
+
+# ----------------------------
+# ALTERAR ESTADO EM MASSA
+# ----------------------------
+def alterar_estado(marcacoes, status):
+    """
+    Muda o estado de várias marcações com um único UPDATE ... WHERE id IN.
+
+    `marcacoes` é um queryset (já filtrado pelas permissões do chamador).
+    As que já estão no estado pedido são ignoradas, e as canceladas nunca
+    são confirmadas: o horário pode ter sido marcado por outra pessoa
+    entretanto, e reativá-las passaria ao lado da verificação de
+    sobreposição de criar_marcacao. Envia um único marcacoes_status_changed
+    e retorna (alteradas, canceladas que ficaram de fora).
+    """
+    # estados que não passam para `status`
+    excluded = [status, "cancelled"] if status == "confirmed" else [status]
+    with transaction.atomic():
+        ignoradas = marcacoes.filter(status="cancelled").count() if status == "confirmed" else 0
+        rows = list(
+            marcacoes.exclude(status__in=excluded)
+            .order_by()
+            .values_list("pk", "barbeiro_id", "inicio", "status")
+        )
+        if not rows:
+            return 0, ignoradas
+        changed = (
+            Marcacao.objects.filter(pk__in=[row[0] for row in rows])
+            .exclude(status__in=excluded)
+            .update(status=status)
+        )
+
+    marcacoes_status_changed.send(sender=Marcacao, rows=rows, status=status)
+    return changed, ignoradas
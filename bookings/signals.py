@@ -0,0 +1,211 @@
+# bookings/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from . import agenda_cache, availability_cache, catalog_cache, roles
+
+# Enviado por Marcacao.confirm()/cancel().
+# Argumentos: instance, status (novo) e previous (anterior).
+marcacao_status_changed = Signal()
+
+# Enviado uma vez por cada alteração em massa (services.alterar_estado).
+# Argumentos: rows (lista de (pk, barbeiro_id, inicio, estado anterior)) e
+# status (novo).
+marcacoes_status_changed = Signal()
+
+
+def _day_of(barbeiro_id, inicio):
+    return barbeiro_id, timezone.localtime(inicio).date()
+
+
+# ----------------------------
+# MARCAÇÕES -> CACHE DE DISPONIBILIDADE, RESUMOS E NOTIFICAÇÕES
+# ----------------------------
+@receiver(post_init, sender="bookings.Marcacao")
+def _remember_slot(sender, instance, **kwargs):
+    # guarda o (barbeiro, início) original para invalidar também o dia antigo
+    # quando uma marcação muda de barbeiro ou de hora
+    fields = instance.__dict__
+    instance._availability_orig = (fields.get("barbeiro_id"), fields.get("inicio"))
+
+
+def _touched_days(instance):
+    pairs = set()
+    if instance.barbeiro_id and instance.inicio:
+        pairs.add(_day_of(instance.barbeiro_id, instance.inicio))
+    orig_barbeiro, orig_inicio = getattr(instance, "_availability_orig", (None, None))
+    if orig_barbeiro and orig_inicio:
+        pairs.add(_day_of(orig_barbeiro, orig_inicio))
+    return pairs
+
+
+def _apply_booking(instance, release=False):
+    # marca/liberta o horário na ocupação em cache, só depois do commit (um
+    # rollback não deixa marcações fantasma); import local porque
+    # availability importa os modelos, que importam este módulo
+    from . import availability
+
+    barbeiro_id, inicio = instance.barbeiro_id, instance.inicio
+    duracao = instance.servico.duracao_min
+    transaction.on_commit(
+        lambda: availability.apply_booking(barbeiro_id, inicio, duracao, release=release)
+    )
+
+
+def _bump_agenda(barbeiro_ids):
+    # depois do commit, para o feed ICS nunca servir dados antigos com a versão nova
+    barbeiro_ids = [b for b in barbeiro_ids if b]
+    transaction.on_commit(lambda: agenda_cache.bump(barbeiro_ids))
+
+
+def _refresh_rollups(pairs):
+    # import local pelo mesmo motivo que em _apply_booking
+    from . import analytics
+
+    analytics.refresh_days(pairs)
+
+
+def _notify(pks, evento):
+    # import local pelo mesmo motivo que em _apply_booking
+    from . import notifications
+
+    notifications.notify(pks, evento)
+
+
+@receiver(post_save, sender="bookings.Marcacao")
+def _marcacao_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    # alterações só de estado chegam por marcacao_status_changed
+    if update_fields is not None and set(update_fields) == {"status"}:
+        return
+    _bump_agenda({instance.barbeiro_id, getattr(instance, "_availability_orig", (None, None))[0]})
+    _refresh_rollups(_touched_days(instance))
+    if created:
+        if instance.status != "cancelled":
+            _apply_booking(instance)
+        _notify([instance.pk], "created")
+    else:
+        # mudança de hora, barbeiro ou serviço: reconstrói os dias afetados
+        availability_cache.invalidate(_touched_days(instance))
+    instance._availability_orig = (instance.barbeiro_id, instance.inicio)
+
+
+@receiver(post_delete, sender="bookings.Marcacao")
+def _marcacao_deleted(sender, instance, **kwargs):
+    _bump_agenda([instance.barbeiro_id])
+    _refresh_rollups(_touched_days(instance))
+    availability_cache.invalidate(_touched_days(instance))
+
+
+@receiver(marcacao_status_changed)
+def _marcacao_status_changed(sender, instance, status, previous, **kwargs):
+    if status != previous:
+        _notify([instance.pk], status)
+        _bump_agenda([instance.barbeiro_id])
+    # pendente <-> confirmada ocupa o mesmo horário; só "cancelled" muda algo
+    if status == previous or "cancelled" not in (status, previous):
+        return
+    _refresh_rollups(_touched_days(instance))
+    _apply_booking(instance, release=(status == "cancelled"))
+
+
+@receiver(marcacoes_status_changed)
+def _marcacoes_status_changed(sender, rows, status, **kwargs):
+    _notify([pk for pk, _barbeiro_id, _inicio, _previous in rows], status)
+    _bump_agenda({barbeiro_id for _pk, barbeiro_id, _inicio, _previous in rows})
+    touched = {
+        _day_of(barbeiro_id, inicio)
+        for _pk, barbeiro_id, inicio, previous in rows
+        if "cancelled" in (status, previous)
+    }
+    _refresh_rollups(touched)
+    availability_cache.invalidate(touched)
+
+
+# ----------------------------
+# SERVIÇOS -> CACHES DE DISPONIBILIDADE E DO CATÁLOGO
+# ----------------------------
+@receiver(post_save, sender="bookings.Servico")
+@receiver(post_delete, sender="bookings.Servico")
+def _servico_changed(sender, **kwargs):
+    availability_cache.invalidate_all()
+    catalog_cache.bump()
+
+
+# ----------------------------
+# HORÁRIOS -> HORÁRIO COMPILADO E CACHE DE DISPONIBILIDADE
+# ----------------------------
+@receiver(post_save, sender="bookings.HorarioSemanal")
+@receiver(post_delete, sender="bookings.HorarioSemanal")
+@receiver(post_save, sender="bookings.Pausa")
+@receiver(post_delete, sender="bookings.Pausa")
+def _horario_changed(sender, **kwargs):
+    # import local: schedule importa os modelos, que importam este módulo
+    from . import schedule
+
+    schedule.bump()
+    availability_cache.invalidate_all()
+
+
+@receiver(post_save, sender="bookings.Feriado")
+@receiver(post_delete, sender="bookings.Feriado")
+@receiver(post_save, sender="bookings.Ausencia")
+@receiver(post_delete, sender="bookings.Ausencia")
+def _excecao_changed(sender, **kwargs):
+    # raras e editadas à mão no admin: não compensa invalidar dia a dia
+    availability_cache.invalidate_all()
+
+
+# ----------------------------
+# BARBEIROS -> PAPEL EM CACHE (request.barbeiro)
+# ----------------------------
+@receiver(post_save, sender="bookings.Barbeiro")
+@receiver(post_delete, sender="bookings.Barbeiro")
+def _barbeiro_changed(sender, instance, **kwargs):
+    roles.invalidate([instance.user_id])
+
+
+# ----------------------------
+# IMAGENS -> RENDITIONS
+# ----------------------------
+_IMAGE_FIELDS = {"Servico": "image", "Barbeiro": "foto"}
+
+
+def _image_name(instance):
+    # None se o campo não foi carregado (only/defer)
+    value = instance.__dict__.get(_IMAGE_FIELDS[type(instance).__name__])
+    return getattr(value, "name", value)
+
+
+@receiver(post_init, sender="bookings.Servico")
+@receiver(post_init, sender="bookings.Barbeiro")
+def _remember_image(sender, instance, **kwargs):
+    instance._image_orig = _image_name(instance)
+
+
+@receiver(post_save, sender="bookings.Servico")
+@receiver(post_save, sender="bookings.Barbeiro")
+def _image_saved(sender, instance, created=False, **kwargs):
+    # import local: images importa tasks, que importa os modelos
+    from . import images
+
+    old, new = instance._image_orig, _image_name(instance)
+    if new is None or new == old:
+        return  # outra alteração qualquer: as renditions servem
+    instance._image_orig = new
+    # num modelo novo, `old` é o nome do upload, não um ficheiro guardado
+    if old and not created:
+        transaction.on_commit(lambda: images.delete_renditions(old))
+    if new:
+        images.schedule_renditions(new)
+
+
+@receiver(post_delete, sender="bookings.Servico")
+@receiver(post_delete, sender="bookings.Barbeiro")
+def _image_deleted(sender, instance, **kwargs):
+    from . import images
+
+    name = _image_name(instance)
+    if name:
+        transaction.on_commit(lambda: images.delete_renditions(name))
@@ -0,0 +1,207 @@
+# bookings/tasks.py
+"""
+Tarefas em segundo plano (emails, notificações, auditoria).
+
+As funções registadas com @task são enfileiradas com enqueue(), que só
+entrega a tarefa ao backend depois do commit da transação em curso: se a
+marcação não chegar a ser gravada, o email também não sai.
+
+Backends (definição TASKS_BACKEND):
+
+    bookings.tasks.DatabaseBackend  grava na tabela Tarefa; os workers
+                                    (python manage.py run_tasks) executam-nas
+    bookings.tasks.EagerBackend     executa logo, no mesmo processo (testes
+                                    e desenvolvimento)
+
+Tarefas com a mesma `key` não ficam duas vezes na fila: enquanto uma estiver
+pendente ou em execução, as repetidas são ignoradas. Com
+dedupe_running=False (tarefas que releem a BD, como os resumos) a chave só
+vale enquanto a tarefa está pendente: é largada antes de a tarefa correr,
+e uma alteração que chegue durante a execução volta a enfileirá-la. As que
+falham voltam à fila com espera exponencial até max_retries tentativas.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Tarefa
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+# ----------------------------
+# REGISTO
+# ----------------------------
+class Task:
+    def __init__(self, func, name, max_retries, retry_delay, dedupe_running=True):
+        self.func = func
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.dedupe_running = dedupe_running
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, key=None, delay=None, **kwargs):
+        enqueue(self.name, key=key, delay=delay, **kwargs)
+
+
+def task(name=None, max_retries=5, retry_delay=30, dedupe_running=True):
+    """Regista uma função como tarefa. Os argumentos têm de ser JSON (só kwargs)."""
+    def decorator(func):
+        registered = Task(
+            func, name or f"{func.__module__}.{func.__name__}", max_retries, retry_delay, dedupe_running
+        )
+        _registry[registered.name] = registered
+        return registered
+    return decorator
+
+
+def get_task(name):
+    return _registry[name]
+
+
+# ----------------------------
+# BACKENDS
+# ----------------------------
+class EagerBackend:
+    """Executa as tarefas imediatamente; os erros propagam-se a quem enfileirou."""
+
+    def enqueue_many(self, jobs):
+        for name, kwargs, key, delay in jobs:
+            get_task(name)(**kwargs)
+
+
+class DatabaseBackend:
+    """Fila numa tabela da BD, consumida pelo comando run_tasks."""
+
+    def enqueue_many(self, jobs):
+        now = timezone.now()
+        rows = [
+            Tarefa(
+                nome=name,
+                argumentos=kwargs,
+                chave=key,
+                max_tentativas=get_task(name).max_retries,
+                executar_em=now + timedelta(seconds=delay or 0),
+            )
+            for name, kwargs, key, delay in jobs
+        ]
+        # as chaves repetidas batem na restrição única e são ignoradas
+        Tarefa.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def _backend():
+    return import_string(getattr(settings, "TASKS_BACKEND", "bookings.tasks.DatabaseBackend"))()
+
+
+# ----------------------------
+# ENFILEIRAR
+# ----------------------------
+def enqueue_many(jobs):
+    """
+    Enfileira várias tarefas de uma vez, depois do commit. `jobs` é uma lista
+    de (nome, kwargs, chave ou None, atraso em segundos ou None).
+    """
+    jobs = [(getattr(name, "name", name), kwargs, key, delay) for name, kwargs, key, delay in jobs]
+    for name, *_rest in jobs:
+        get_task(name)  # falha já se a tarefa não existir
+    if jobs:
+        transaction.on_commit(lambda: _backend().enqueue_many(jobs))
+
+
+def enqueue(name, key=None, delay=None, **kwargs):
+    enqueue_many([(name, kwargs, key, delay)])
+
+
+# ----------------------------
+# WORKER
+# ----------------------------
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _lease_seconds():
+    return getattr(settings, "TASKS_LEASE_SECONDS", 300)
+
+
+def release_stale():
+    """Devolve à fila as tarefas de workers que morreram a meio."""
+    limite = timezone.now() - timedelta(seconds=_lease_seconds())
+    return Tarefa.objects.filter(estado="running", reservada_em__lt=limite).update(
+        estado="pending", reservada_por=""
+    )
+
+
+def claim(worker, batch):
+    """Reserva até `batch` tarefas prontas para este worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        ready = Tarefa.objects.filter(estado="pending", executar_em__lte=now).order_by("executar_em", "id")
+        if connection.features.has_select_for_update_skip_locked:
+            ready = ready.select_for_update(skip_locked=True)
+        ids = list(ready.values_list("pk", flat=True)[:batch])
+        if not ids:
+            return []
+        # em SQLite o atomic já serializa os workers; o filtro por estado
+        # garante que nenhuma tarefa é reservada duas vezes
+        Tarefa.objects.filter(pk__in=ids, estado="pending").update(
+            estado="running", reservada_por=worker, reservada_em=now
+        )
+    return list(Tarefa.objects.filter(pk__in=ids, estado="running", reservada_por=worker).order_by("id"))
+
+
+def run(tarefa):
+    """Executa uma tarefa reservada e regista o resultado. Retorna True se correu bem."""
+    tarefa.tentativas += 1
+    registered = _registry.get(tarefa.nome)
+    if tarefa.chave and registered is not None and not registered.dedupe_running:
+        # daqui em diante o que a tarefa lê já inclui as alterações cujo
+        # enqueue foi ignorado; as seguintes voltam a enfileirá-la
+        tarefa.chave = None
+        tarefa.save(update_fields=["chave"])
+    try:
+        registered = get_task(tarefa.nome)
+        registered(**tarefa.argumentos)
+    except Exception:
+        tarefa.erro = traceback.format_exc()
+        retry_delay = getattr(_registry.get(tarefa.nome), "retry_delay", 30)
+        if tarefa.tentativas < tarefa.max_tentativas and tarefa.nome in _registry:
+            tarefa.estado = "pending"
+            tarefa.executar_em = timezone.now() + timedelta(seconds=retry_delay * 2 ** (tarefa.tentativas - 1))
+        else:
+            tarefa.estado = "failed"
+            tarefa.concluida_em = timezone.now()
+        logger.warning("Tarefa %s (%s) falhou na tentativa %s", tarefa.pk, tarefa.nome, tarefa.tentativas)
+        ok = False
+    else:
+        tarefa.estado = "done"
+        tarefa.erro = ""
+        tarefa.concluida_em = timezone.now()
+        ok = True
+    tarefa.reservada_por = ""
+    tarefa.save(update_fields=[
+        "estado", "tentativas", "erro", "executar_em", "concluida_em", "reservada_por",
+    ])
+    return ok
+
+
+def run_batch(worker, batch=20):
+    """Reserva e executa um lote. Retorna (executadas, falhadas)."""
+    done = failed = 0
+    for tarefa in claim(worker, batch):
+        if run(tarefa):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
@@ -0,0 +1,94 @@
+# bookings/templatetags/imagens.py
+"""
+{% load imagens %}
+{% responsive_image servico.image alt=servico.nome sizes="(min-width: 992px) 33vw, 100vw" class="card-img-top" %}
+
+Gera um <picture> com um <source> por formato (AVIF/WebP) e um <img> com
+srcset em JPEG; se não houver renditions, usa o ficheiro original.
+
+Para imagens estáticas (variantes geradas no collectstatic, ver
+barbershop/storage.py):
+
+{% static_picture 'barbershop/images/logo.png' alt="Logo" sizes="200px" %}
+{% static_variant 'barbershop/images/pricing2.png' 960 'webp' %}
+"""
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from barbershop.storage import variant_names
+from bookings.images import renditions
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(fieldfile, alt="", sizes="100vw", **attrs):
+    if not fieldfile:
+        return ""
+
+    attrs.setdefault("loading", "lazy")
+    extra = format_html_join(" ", '{}="{}"', sorted(attrs.items()))
+
+    by_mime = {}
+    for mime, width, name in renditions(fieldfile):
+        by_mime.setdefault(mime, []).append(f"{default_storage.url(name)} {width}w")
+
+    jpeg = by_mime.pop("image/jpeg", None)
+    if not jpeg:
+        return format_html('<img src="{}" alt="{}" {}>', fieldfile.url, alt, extra)
+
+    sources = format_html_join(
+        "",
+        '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, ", ".join(srcset), sizes) for mime, srcset in by_mime.items()),
+    )
+    img = format_html(
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" {}>',
+        jpeg[-1].rsplit(" ", 1)[0], ", ".join(jpeg), sizes, alt, extra,
+    )
+    return format_html("<picture>{}{}</picture>", sources, img)
+
+
+# ----------------------------
+# VARIANTES ESTÁTICAS
+# ----------------------------
+def _static_variants(path):
+    """[(largura, formato, nome)] das variantes que existem no manifest."""
+    hashed = getattr(staticfiles_storage, "hashed_files", None)
+    if settings.DEBUG or not hashed:
+        # em desenvolvimento os ficheiros vêm dos finders, sem variantes
+        return []
+    return [v for v in variant_names(path) if v[2] in hashed]
+
+
+@register.simple_tag
+def static_variant(path, width, fmt):
+    """URL da variante pedida, ou do original se não existir."""
+    for w, f, name in _static_variants(path):
+        if w == int(width) and f == fmt:
+            return static(name)
+    return static(path)
+
+
+@register.simple_tag
+def static_picture(path, alt="", sizes="100vw", **attrs):
+    extra = format_html_join(" ", '{}="{}"', sorted(attrs.items()))
+    by_fmt = {}
+    for width, fmt, name in _static_variants(path):
+        by_fmt.setdefault(fmt, []).append(f"{static(name)} {width}w")
+
+    webp = by_fmt.pop("webp", None)
+    sources = format_html('<source type="image/webp" srcset="{}" sizes="{}">', ", ".join(webp), sizes) if webp else ""
+    srcset = next(iter(by_fmt.values()), None)
+    img = format_html(
+        '<img src="{}"{} alt="{}" {}>',
+        static(path),
+        format_html(' srcset="{}" sizes="{}"', ", ".join(srcset), sizes) if srcset else "",
+        alt,
+        extra,
+    )
+    return format_html("<picture>{}{}</picture>", sources, img)
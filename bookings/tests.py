@@ -0,0 +1,807 @@
+import io
+import shutil
+import tempfile
+import threading
+import time as time_module
+from unittest import mock
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from barbershop import metrics
+
+from . import analytics, archive, availability, images, tasks, versions, wizard
+from .imports import Importer
+from .pagination import encode_cursor
+from .management.commands.check_admin_queries import seed
+from .management.commands.check_query_plans import full_scans, hot_queries
+from .models import Barbeiro, Marcacao, MarcacaoArquivo, Servico, Tarefa, Versao
+from .services import SlotIndisponivel, criar_marcacao
+
+
+# sem manifesto do collectstatic nos testes
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def _next_month_weekday():
+    """Um dia útil do mês seguinte: longe de hoje, sem recontagem do dia atual."""
+    today = timezone.localdate()
+    day = (today.replace(day=1) + timedelta(days=32)).replace(day=10)
+    while day.weekday() > 4:
+        day += timedelta(days=1)
+    return day
+
+
+# ----------------------------
+# NÚMERO DE QUERIES NA GERAÇÃO DE HORÁRIOS
+# ----------------------------
+@override_settings(VERSIONS_CACHE_TIMEOUT=60, STORAGES=TEST_STORAGES)
+class SlotQueryCountTests(TestCase):
+    """
+    Regressão: gerar os horários de um dia custa um número fixo de queries,
+    seja qual for o número de marcações do dia, e nenhuma com o cache quente.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = User.objects.create_user("cliente", password="x")
+        cls.barbeiro = Barbeiro.objects.create(user=User.objects.create_user("barbeiro"))
+        cls.servico = Servico.objects.create(nome="Corte", duracao_min=30, preco=10)
+        cls.day = _next_month_weekday()
+
+    def setUp(self):
+        cache.clear()
+
+    def _book(self, hour, minute=0):
+        inicio = timezone.make_aware(datetime.combine(self.day, time(hour, minute)))
+        return self.barbeiro.marcacoes.create(cliente=self.cliente, servico=self.servico, inicio=inicio)
+
+    def test_slots_for_day_cold_and_warm(self):
+        for hour in (9, 11, 14):
+            self._book(hour)
+        cache.clear()
+
+        # versão da disponibilidade, marcações, versão do horário, turnos,
+        # pausas, feriados e ausências
+        with self.assertNumQueries(7):
+            cold = availability.slots_for_day(self.barbeiro, self.day, self.servico.duracao_min)
+        with self.assertNumQueries(0):
+            warm = availability.slots_for_day(self.barbeiro, self.day, self.servico.duracao_min)
+        self.assertEqual(cold, warm)
+        self.assertNotIn(timezone.make_aware(datetime.combine(self.day, time(9))), cold)
+
+    def test_slots_for_day_does_not_grow_with_bookings(self):
+        for hour in range(9, 18):
+            self._book(hour)
+        cache.clear()
+
+        with self.assertNumQueries(7):
+            availability.slots_for_day(self.barbeiro, self.day, self.servico.duracao_min)
+
+    def test_choose_datetime_cold_and_warm(self):
+        self._book(10)
+        self.client.force_login(self.cliente)
+        url = reverse("bookings:choose_datetime", args=[self.servico.pk, self.barbeiro.pk])
+        url += f"?date={self.day.isoformat()}"
+        cache.clear()
+
+        # sessão, utilizador, serviço, barbeiro, os 7 do dia (acima), o mês
+        # (versões, marcações, feriados e ausências; o horário já está em
+        # cache) e o papel do utilizador (request.barbeiro, no template)
+        with self.assertNumQueries(16):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["slots"])
+
+        # só sessão, utilizador, serviço e barbeiro
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+
+@override_settings(VERSIONS_CACHE_TIMEOUT=60)
+class SharedAvailabilityVersionTests(TestCase):
+    """As versões de cada dia e de cada mês ficam na BD, vistas por todos os workers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = User.objects.create_user("cliente")
+        cls.barbeiro = Barbeiro.objects.create(user=User.objects.create_user("barbeiro"))
+        cls.servico = Servico.objects.create(nome="Corte", duracao_min=30, preco=10)
+        cls.day = _next_month_weekday()
+
+    def setUp(self):
+        cache.clear()
+
+    def _in_other_worker(self, change):
+        # o LocMemCache deste "worker" fica como estava antes de change()
+        saved = dict(cache._cache), dict(cache._expire_info)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        cache.clear()
+        cache._cache.update(saved[0])
+        cache._expire_info.update(saved[1])
+
+    def _expire_versions(self):
+        # o que acontece num worker ao fim de VERSIONS_CACHE_TIMEOUT
+        cache.delete_many([versions._key(name) for name in Versao.objects.values_list("nome", flat=True)])
+
+    def test_other_worker_change_is_seen(self):
+        inicio = timezone.make_aware(datetime.combine(self.day, time(10)))
+        self.assertIn(inicio, availability.slots_for_day(self.barbeiro, self.day, 30))
+        counts = availability.month_free_counts(self.servico, self.day, [self.barbeiro])
+
+        # outro worker grava a marcação: aqui só muda a BD
+        self._in_other_worker(lambda: criar_marcacao(self.cliente, self.barbeiro, self.servico, inicio))
+        self._expire_versions()
+
+        self.assertNotIn(inicio, availability.slots_for_day(self.barbeiro, self.day, 30))
+        fresh = availability.month_free_counts(self.servico, self.day, [self.barbeiro])
+        self.assertEqual(fresh[self.day], counts[self.day] - 3)  # 9:45, 10:00 e 10:15 deixam de caber
+
+
+# ----------------------------
+# PLANOS DAS QUERIES QUENTES
+# ----------------------------
+class QueryPlanTests(TestCase):
+    """As queries quentes (check_query_plans) não percorrem a tabela de marcações."""
+
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN é do SQLite")
+        for name, qs in hot_queries():
+            with self.subTest(name):
+                plan = qs.explain()
+                self.assertEqual(full_scans(plan), [], plan)
+
+
+# ----------------------------
+# MARCAÇÕES CONCORRENTES
+# ----------------------------
+class ConcurrentBookingTests(TransactionTestCase):
+    """
+    Vários pedidos ao mesmo tempo para o mesmo horário: exatamente um ganha.
+    Corre contra a BD de testes em ficheiro (ver barbershop/db.py), com uma
+    ligação por thread.
+    """
+
+    threads = 8
+
+    def setUp(self):
+        cache.clear()
+        self.barbeiro = Barbeiro.objects.create(user=User.objects.create_user("barbeiro"))
+        self.servico = Servico.objects.create(nome="Corte", duracao_min=30, preco=10)
+        self.clientes = [User.objects.create_user(f"cliente{i}") for i in range(self.threads)]
+        self.inicio = timezone.make_aware(datetime.combine(_next_month_weekday(), time(10)))
+
+    def test_only_one_booking_wins(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("precisa de uma BD de testes em ficheiro")
+
+        barrier = threading.Barrier(self.threads)
+        results = []
+        lock = threading.Lock()
+
+        def book(cliente):
+            try:
+                barrier.wait()
+                try:
+                    criar_marcacao(cliente, self.barbeiro, self.servico, self.inicio)
+                    outcome = "ok"
+                except SlotIndisponivel:
+                    outcome = "indisponivel"
+                except Exception as exc:  # qualquer outro erro faz falhar o teste
+                    outcome = repr(exc)
+                with lock:
+                    results.append(outcome)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=book, args=(cliente,)) for cliente in self.clientes]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(sorted(results), ["indisponivel"] * (self.threads - 1) + ["ok"])
+        self.assertEqual(
+            Marcacao.objects.filter(barbeiro=self.barbeiro, inicio=self.inicio).count(), 1
+        )
+
+
+# ----------------------------
+# DISPONIBILIDADE ASSÍNCRONA E MÉTRICAS
+# ----------------------------
+@override_settings(VERSIONS_CACHE_TIMEOUT=60, METRICS_SAMPLE_RATE=1.0)
+class AsyncAvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.barbeiros = [
+            Barbeiro.objects.create(user=User.objects.create_user(f"barbeiro{i}")) for i in range(5)
+        ]
+        cls.servico = Servico.objects.create(nome="Corte", duracao_min=30, preco=10)
+        cls.day = _next_month_weekday()
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def _get(self, *barbeiro_ids):
+        url = reverse("bookings:availability_day_async")
+        params = {"servico": self.servico.pk, "date": self.day.isoformat()}
+        if barbeiro_ids:
+            params["barbeiro"] = barbeiro_ids
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx)
+
+    def test_queries_do_not_grow_with_barbers(self):
+        _response, one = self._get(self.barbeiros[0].pk)
+        cache.clear()
+        response, all_barbers = self._get()
+        self.assertEqual(one, all_barbers)
+        self.assertEqual(len(response.json()["barbeiros"]), len(self.barbeiros))
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0)
+class AsyncMetricsTests(TransactionTestCase):
+    """As queries das views async correm noutra thread e contam na mesma."""
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        Barbeiro.objects.create(user=User.objects.create_user("barbeiro"))
+        self.servico = Servico.objects.create(nome="Corte", duracao_min=30, preco=10)
+        # como num worker: a ligação da thread do ORM abre-se já com o
+        # middleware carregado (CONN_MAX_AGE=0 fecha-a no fim de cada pedido)
+        connection.close()
+
+    async def test_metrics_count_async_queries(self):
+        # com o AsyncClient o pedido corre no event loop e as queries na
+        # thread do sync_to_async
+        response = await self.async_client.get(
+            reverse("bookings:availability_day_async"),
+            {"servico": self.servico.pk, "date": _next_month_weekday().isoformat()},
+        )
+        self.assertEqual(response.status_code, 200)
+        stats = metrics.snapshot()["bookings:availability_day_async"]
+        self.assertGreater(stats["queries_mean"], 0)
+        self.assertGreater(stats["db_ms_mean"], 0)
+
+
+# ----------------------------
+# GET CONDICIONAL DO CATÁLOGO
+# ----------------------------
+@override_settings(STORAGES=TEST_STORAGES)
+class CatalogConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("cliente", password="x")
+        Servico.objects.create(nome="Corte", duracao_min=30, preco=10)
+
+    def setUp(self):
+        cache.clear()
+
+    def _etag(self):
+        response = self.client.get(reverse("bookings:index"))
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_same_session_gets_304(self):
+        self.client.force_login(self.user)
+        etag = self._etag()
+        response = self.client.get(reverse("bookings:index"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_login_changes_etag(self):
+        self.client.login(username="cliente", password="x")
+        etag = self._etag()
+        self.client.logout()
+        self.client.login(username="cliente", password="x")
+        # token CSRF novo: a página antiga (com o token antigo) não serve
+        response = self.client.get(reverse("bookings:index"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_becoming_barber_changes_etag(self):
+        self.client.force_login(self.user)
+        etag = self._etag()
+        Barbeiro.objects.create(user=self.user)
+        response = self.client.get(reverse("bookings:index"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+# ----------------------------
+# PAGINAÇÃO POR CURSOR
+# ----------------------------
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("barbeiro")
+        cls.barbeiro = Barbeiro.objects.create(user=cls.user)
+        cliente = User.objects.create_user("cliente")
+        servico = Servico.objects.create(nome="Corte", duracao_min=30, preco=10)
+        today = timezone.localdate()
+        same = timezone.make_aware(datetime.combine(today + timedelta(days=1), time(10)))
+        other = timezone.make_aware(datetime.combine(today + timedelta(days=2), time(15)))
+        old = timezone.make_aware(datetime.combine(today - timedelta(days=3), time(9)))
+        # muitas linhas com o mesmo início, dos dois lados do arquivo
+        rows = Marcacao.objects.bulk_create(
+            [Marcacao(cliente=cliente, barbeiro=cls.barbeiro, servico=servico, inicio=same) for _ in range(7)]
+            + [Marcacao(cliente=cliente, barbeiro=cls.barbeiro, servico=servico, inicio=other) for _ in range(2)]
+            + [Marcacao(cliente=cliente, barbeiro=cls.barbeiro, servico=servico, inicio=old) for _ in range(2)]
+        )
+        next_id = max(m.pk for m in rows) + 1
+        MarcacaoArquivo.objects.bulk_create([
+            MarcacaoArquivo(
+                id=next_id + i, cliente=cliente, barbeiro=cls.barbeiro, servico=servico,
+                inicio=old, criado_em=old, status="confirmed",
+            )
+            for i in range(3)
+        ])
+        everything = [(m.inicio, m.pk) for m in rows] + [(old, next_id + i) for i in range(3)]
+        cls.expected = [pk for _inicio, pk in sorted(everything, reverse=True)]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _page(self, cursor=None, size=3):
+        params = {"size": size}
+        if cursor is not None:
+            params["cursor"] = cursor
+        response = self.client.get(reverse("bookings:agenda_barbeiro_json"), params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [m["id"] for m in data["marcacoes"]], data["next_cursor"]
+
+    def test_walk_forward_and_back(self):
+        cursors, pages = [None], []
+        while True:
+            ids, cursor = self._page(cursors[-1])
+            pages.append(ids)
+            if cursor is None:
+                break
+            cursors.append(cursor)
+        walked = [pk for ids in pages for pk in ids]
+        self.assertEqual(walked, self.expected)  # nada repetido nem saltado
+
+        # voltar atrás (histórico do browser) repete as mesmas páginas
+        for cursor, ids in reversed(list(zip(cursors, pages))):
+            self.assertEqual(self._page(cursor)[0], ids)
+
+    def test_bad_cursor_returns_first_page(self):
+        first = self._page()
+        forged = [
+            "!!!",
+            "bm90IGEgY3Vyc29y",  # "not a cursor"
+            encode_cursor(timezone.now(), 10**30),  # id fora do intervalo da BD
+            encode_cursor(datetime.now(), 1),  # sem fuso horário
+            encode_cursor(timezone.now(), 1)[:-3],  # truncado
+        ]
+        for cursor in forged:
+            with self.subTest(cursor):
+                self.assertEqual(self._page(cursor), first)
+
+
+# ----------------------------
+# AÇÕES EM MASSA NA AGENDA
+# ----------------------------
+@override_settings(VERSIONS_CACHE_TIMEOUT=60, STORAGES=TEST_STORAGES)
+class BulkActionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("barbeiro")
+        cls.barbeiro = Barbeiro.objects.create(user=cls.user)
+        outro = Barbeiro.objects.create(user=User.objects.create_user("outro"))
+        cliente = User.objects.create_user("cliente")
+        servico = Servico.objects.create(nome="Corte", duracao_min=30, preco=10)
+        day = _next_month_weekday()
+
+        def booking(barbeiro, hour, status="pending"):
+            inicio = timezone.make_aware(datetime.combine(day, time(hour)))
+            return Marcacao(cliente=cliente, barbeiro=barbeiro, servico=servico, inicio=inicio, status=status)
+
+        cls.mine = Marcacao.objects.bulk_create([booking(cls.barbeiro, hour) for hour in (9, 10, 11)])
+        cls.cancelled, cls.other = Marcacao.objects.bulk_create(
+            [booking(cls.barbeiro, 12, "cancelled"), booking(outro, 9)]
+        )
+        old = timezone.now() - timedelta(days=400)
+        cls.archived = MarcacaoArquivo.objects.create(
+            id=cls.other.pk + 1, cliente=cliente, barbeiro=cls.barbeiro, servico=servico,
+            inicio=old, criado_em=old, status="pending",
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _post(self, acao, queries):
+        ids = [m.pk for m in [*self.mine, self.cancelled, self.other, self.archived]]
+        # conta também o que corre depois do commit (versões, notificações...)
+        with self.assertNumQueries(queries), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("bookings:agenda_bulk"), {"acao": acao, "ids": ids})
+        self.assertRedirects(response, reverse("bookings:agenda_barbeiro"), fetch_redirect_response=False)
+
+    def _statuses(self):
+        return dict(Marcacao.objects.values_list("pk", "status"))
+
+    def test_confirm_mixed_selection(self):
+        # sessão, utilizador e papel; contagem das canceladas, linhas e um
+        # UPDATE (mais o savepoint); depois do commit, a notificação em fila
+        # e a versão da agenda (UPDATE + INSERT, por ser a primeira vez)
+        self._post("confirm", 11)
+        statuses = self._statuses()
+        self.assertEqual([statuses[m.pk] for m in self.mine], ["confirmed"] * 3)
+        self.assertEqual(statuses[self.cancelled.pk], "cancelled")  # não reativa
+        self.assertEqual(statuses[self.other.pk], "pending")  # de outro barbeiro
+        self.assertEqual(MarcacaoArquivo.objects.get(pk=self.archived.pk).status, "pending")
+
+    def test_cancel_mixed_selection(self):
+        # como acima, sem a contagem; cancelar liberta horários: versões da
+        # disponibilidade (UPDATE + INSERT) e o resumo do dia em fila
+        self._post("cancel", 13)
+        statuses = self._statuses()
+        self.assertEqual([statuses[m.pk] for m in self.mine], ["cancelled"] * 3)
+        self.assertEqual(statuses[self.other.pk], "pending")
+        self.assertEqual(MarcacaoArquivo.objects.get(pk=self.archived.pk).status, "pending")
+
+
+# ----------------------------
+# CHANGELISTS DO ADMIN
+# ----------------------------
+class _Rollback(Exception):
+    pass
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AdminChangelistQueryTests(TestCase):
+    """O número de queries das changelists não cresce com as linhas (N+1)."""
+
+    sizes = (10, 1000)
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", None))
+
+    def _count(self, url, n):
+        try:
+            with transaction.atomic():
+                seed(n)
+                cache.clear()
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                raise _Rollback
+        except _Rollback:
+            pass
+        return len(ctx)
+
+    def test_changelists_do_not_grow_with_rows(self):
+        for model in ("marcacao", "barbeiro"):
+            url = reverse(f"admin:bookings_{model}_changelist")
+            with self.subTest(model):
+                few, many = (self._count(url, n) for n in self.sizes)
+                self.assertEqual(few, many)
+
+
+# ----------------------------
+# RENDITIONS DAS IMAGENS
+# ----------------------------
+def _png(name, width=400):
+    buf = io.BytesIO()
+    Image.new("RGB", (width, width // 2), (200, 30, 30)).save(buf, "PNG")
+    return SimpleUploadedFile(name, buf.getvalue(), content_type="image/png")
+
+
+@override_settings(TASKS_BACKEND="bookings.tasks.DatabaseBackend")
+class ImageRenditionTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+    def _save(self, servico):
+        with self.captureOnCommitCallbacks(execute=True):
+            servico.save()
+
+    def _run_tasks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.run_batch("test")
+
+    def test_renditions_built_in_background_only_when_image_changes(self):
+        servico = Servico(nome="Corte", duracao_min=30, preco=10, image=_png("corte.png"))
+        self._save(servico)
+        first = servico.image.name
+        # nada gerado no pedido, só a tarefa em fila
+        self.assertEqual(images._stored(first), [])
+        self.assertEqual(Tarefa.objects.filter(nome="bookings.gerar_renditions").count(), 1)
+
+        self._run_tasks()
+        self.assertTrue(images._stored(first))
+
+        # gravar sem mudar a imagem não enfileira nada
+        servico = Servico.objects.get(pk=servico.pk)
+        servico.preco = 12
+        self._save(servico)
+        self.assertEqual(Tarefa.objects.filter(estado="pending").count(), 0)
+
+        # imagem nova: apaga as renditions antigas e gera as novas
+        servico.image = _png("corte2.png")
+        self._save(servico)
+        self.assertEqual(images._stored(first), [])
+        self._run_tasks()
+        self.assertTrue(images._stored(servico.image.name))
+
+    def test_renditions_deleted_with_model(self):
+        servico = Servico(nome="Corte", duracao_min=30, preco=10, image=_png("corte.png"))
+        self._save(servico)
+        self._run_tasks()
+        name = servico.image.name
+        self.assertTrue(default_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            servico.delete()
+        self.assertEqual(images._stored(name), [])
+
+
+# ----------------------------
+# FILA DE TAREFAS
+# ----------------------------
+_calls = []
+
+
+@tasks.task(name="tests.instavel", max_retries=3, retry_delay=10)
+def _instavel(falhar):
+    _calls.append(falhar)
+    if falhar:
+        raise RuntimeError("falhou")
+
+
+@override_settings(TASKS_BACKEND="bookings.tasks.DatabaseBackend")
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        _calls.clear()
+
+    def _enqueue(self, *jobs):
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.enqueue_many(jobs)
+
+    def test_failing_task_retried_with_backoff(self):
+        self._enqueue((_instavel, {"falhar": True}, None, None))
+        for attempt, delay in ((1, 10), (2, 20)):
+            before = timezone.now()
+            self.assertEqual(tasks.run_batch("test"), (0, 1))
+            tarefa = Tarefa.objects.get()
+            self.assertEqual((tarefa.estado, tarefa.tentativas), ("pending", attempt))
+            self.assertGreaterEqual(tarefa.executar_em, before + timedelta(seconds=delay))
+            self.assertLess(tarefa.executar_em, before + timedelta(seconds=delay + 5))
+            # ainda não chegou a hora: ninguém a reserva
+            self.assertEqual(tasks.run_batch("test"), (0, 0))
+            Tarefa.objects.update(executar_em=timezone.now())
+
+        self.assertEqual(tasks.run_batch("test"), (0, 1))
+        tarefa = Tarefa.objects.get()
+        self.assertEqual((tarefa.estado, tarefa.tentativas), ("failed", 3))
+        self.assertIn("RuntimeError", tarefa.erro)
+        self.assertEqual(tasks.run_batch("test"), (0, 0))
+        self.assertEqual(len(_calls), 3)
+
+    def test_same_key_runs_once(self):
+        job = (_instavel, {"falhar": False}, "chave", None)
+        self._enqueue(job, job)
+        self._enqueue(job)
+        self.assertEqual(tasks.run_batch("test"), (1, 0))
+        self.assertEqual(_calls, [False])
+
+        # depois de concluída, a mesma chave volta a entrar
+        self._enqueue(job)
+        self.assertEqual(tasks.run_batch("test"), (1, 0))
+
+    def test_refresh_days_keyed_per_day(self):
+        day = _next_month_weekday()
+        with self.captureOnCommitCallbacks(execute=True):
+            analytics.refresh_days([(1, day), (1, day), (2, day)])
+            analytics.refresh_days([(1, day)])
+        self.assertEqual(
+            sorted(Tarefa.objects.values_list("chave", flat=True)),
+            [f"resumo:1:{day.isoformat()}", f"resumo:2:{day.isoformat()}"],
+        )
+
+    def test_change_during_refresh_enqueues_again(self):
+        day = _next_month_weekday()
+        with self.captureOnCommitCallbacks(execute=True):
+            analytics.refresh_days([(1, day)])
+
+        def refresh_with_change(*args, **kwargs):
+            # outra marcação do mesmo dia enquanto o resumo corre
+            with self.captureOnCommitCallbacks(execute=True):
+                analytics.refresh_days([(1, day)])
+
+        with mock.patch.object(analytics, "refresh", side_effect=refresh_with_change):
+            self.assertEqual(tasks.run_batch("test"), (1, 0))
+        self.assertEqual(Tarefa.objects.filter(estado="pending").count(), 1)
+
+
+# ----------------------------
+# COOKIE DO WIZARD
+# ----------------------------
+@override_settings(STORAGES=TEST_STORAGES)
+class WizardCookieTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = User.objects.create_user("cliente")
+        cls.barbeiro = Barbeiro.objects.create(user=User.objects.create_user("barbeiro"))
+        cls.servico = Servico.objects.create(nome="Corte", duracao_min=30, preco=10)
+        cls.day = _next_month_weekday()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.cliente)
+
+    def _cookie(self):
+        return signing.dumps(
+            {"servico_id": self.servico.pk, "barbeiro_id": self.barbeiro.pk, "date": self.day.isoformat()},
+            salt=wizard.SALT, compress=True,
+        )
+
+    def _choose_datetime(self, cookie):
+        self.client.cookies[settings.BOOKING_WIZARD_COOKIE] = cookie
+        url = reverse("bookings:choose_datetime", args=[self.servico.pk, self.barbeiro.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_valid_cookie_remembers_day(self):
+        self.assertEqual(self._choose_datetime(self._cookie()).context["day"], self.day)
+
+    def test_tampered_or_expired_cookie_starts_over(self):
+        cookie = self._cookie()
+        value, signature = cookie.rsplit(":", 1)
+        with mock.patch("django.core.signing.time.time", return_value=time_module.time() - 2 * 3600):
+            expired = self._cookie()
+        for bad in (f"{value}:{signature[::-1]}", f"x{cookie}", expired):
+            with self.subTest(bad):
+                response = self._choose_datetime(bad)
+                # o dia lembrado é ignorado: volta a escolher a partir de hoje
+                self.assertEqual(response.context["day"], timezone.localdate())
+                # e o cookie é substituído por um estado novo e válido
+                fresh = signing.loads(
+                    response.cookies[settings.BOOKING_WIZARD_COOKIE].value, salt=wizard.SALT
+                )
+                self.assertEqual(fresh["date"], timezone.localdate().isoformat())
+
+
+# ----------------------------
+# IMPORTAÇÃO
+# ----------------------------
+@override_settings(VERSIONS_CACHE_TIMEOUT=60)
+class ImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = User.objects.create_user("cliente")
+        cls.barbeiro = Barbeiro.objects.create(user=User.objects.create_user("barbeiro"))
+        cls.servico = Servico.objects.create(nome="Corte", duracao_min=30, preco=10)
+        cls.day = _next_month_weekday()
+        Marcacao.objects.bulk_create([
+            Marcacao(cliente=cls.cliente, barbeiro=cls.barbeiro, servico=cls.servico, inicio=cls._at(10))
+        ])
+
+    @classmethod
+    def _at(cls, hour, minute=0):
+        return timezone.make_aware(datetime.combine(cls.day, time(hour, minute)))
+
+    def _record(self, hour, minute=0, **extra):
+        return {
+            "inicio": self._at(hour, minute).isoformat(), "cliente": "cliente",
+            "barbeiro": "barbeiro", "servico": "Corte", **extra,
+        }
+
+    def _import(self, records, dry_run=False):
+        importer = Importer(dry_run=dry_run)
+        with self.captureOnCommitCallbacks(execute=True):
+            importer.import_chunk(list(enumerate(records, start=1)))
+            importer.finish()
+        return importer.resultado
+
+    def test_dry_run_reports_conflicts(self):
+        resultado = self._import([
+            self._record(10),      # igual à que já existe
+            self._record(10, 15),  # sobrepõe-se à que já existe
+            self._record(11),
+            self._record(11, 15),  # sobrepõe-se à linha anterior
+            self._record(11, 15, estado="cancelled"),  # cancelada não ocupa
+        ], dry_run=True)
+        self.assertEqual(
+            (resultado.importadas, resultado.repetidas, resultado.conflitos), (2, 1, 2)
+        )
+        self.assertEqual([n for n, _motivo in resultado.erros], [2, 4])
+        self.assertEqual(Marcacao.objects.count(), 1)  # nada gravado
+
+    def test_reimport_skips_and_rejects_shifted_rows(self):
+        records = [self._record(11), self._record(14)]
+        first = self._import(records)
+        self.assertEqual((first.importadas, first.repetidas, first.conflitos), (2, 0, 0))
+
+        again = self._import(records)
+        self.assertEqual((again.importadas, again.repetidas, again.conflitos), (0, 2, 0))
+
+        # a mesma marcação deslocada um minuto não é repetida: é um conflito
+        shifted = self._import([self._record(11, 1)])
+        self.assertEqual((shifted.importadas, shifted.conflitos), (0, 1))
+        self.assertEqual(Marcacao.objects.count(), 3)
+
+
+# ----------------------------
+# ARQUIVO NO HISTÓRICO
+# ----------------------------
+@override_settings(VERSIONS_CACHE_TIMEOUT=60, STORAGES=TEST_STORAGES)
+class ArchiveHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = User.objects.create_user("cliente")
+        cls.barbeiro_user = User.objects.create_user("barbeiro")
+        cls.barbeiro = Barbeiro.objects.create(user=cls.barbeiro_user)
+        cls.servico = Servico.objects.create(nome="Corte", duracao_min=30, preco=10)
+        cls.old_day = timezone.localdate() - timedelta(days=archive.retention_days() + 10)
+        (cls.old,) = Marcacao.objects.bulk_create([Marcacao(
+            cliente=cls.cliente, barbeiro=cls.barbeiro, servico=cls.servico,
+            inicio=timezone.make_aware(datetime.combine(cls.old_day, time(10))), status="pending",
+        )])
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archive.archive_batch(archive.cutoff()), 1)
+        self.history = {"desde": (self.old_day - timedelta(days=1)).isoformat()}
+
+    def test_archived_booking_in_client_history(self):
+        self.client.force_login(self.cliente)
+        response = self.client.get(reverse("bookings:dashboard"), self.history)
+        self.assertEqual([m.pk for m in response.context["marcacoes"]], [self.old.pk])
+        self.assertTrue(response.context["marcacoes"][0].arquivada)
+        self.assertNotContains(response, reverse("bookings:cancel_booking", args=[self.old.pk]))
+
+        response = self.client.post(reverse("bookings:cancel_booking", args=[self.old.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_archived_booking_in_agenda_cannot_change(self):
+        self.client.force_login(self.barbeiro_user)
+        response = self.client.get(reverse("bookings:agenda_barbeiro_json"), self.history)
+        self.assertEqual(
+            [(m["id"], m["arquivada"]) for m in response.json()["marcacoes"]], [(self.old.pk, True)]
+        )
+        for name in ("confirm_booking", "cancel_booking_barber"):
+            with self.subTest(name):
+                response = self.client.post(reverse(f"bookings:{name}", args=[self.old.pk]))
+                self.assertEqual(response.status_code, 404)
+        self.assertEqual(MarcacaoArquivo.objects.get(pk=self.old.pk).status, "pending")
+
+    def test_horizon_cached_until_next_batch(self):
+        self.assertEqual(archive.horizon(), self.old.inicio)
+        with self.assertNumQueries(0):
+            archive.horizon()
+
+        newer = Marcacao.objects.create(
+            cliente=self.cliente, barbeiro=self.barbeiro, servico=self.servico,
+            inicio=self.old.inicio + timedelta(days=1),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            archive.archive_batch(archive.cutoff())
+        self.assertEqual(archive.horizon(), newer.inicio)
@@ -1,6 +1,6 @@
 # bookings/urls.py
 from django.urls import path
-from . import views
+from . import views, views_async
 
 app_name = "bookings"
 
@@ -16,6 +16,26 @@ urlpatterns = [
         views.choose_datetime,
         name="choose_datetime",
     ),
+    path("api/availability/", views.availability_search, name="availability_search"),
+    path("api/availability/month/", views.availability_month, name="availability_month"),
+    path(
+        "api/availability/cache-stats/",
+        views.availability_cache_stats,
+        name="availability_cache_stats",
+    ),
+
+    # Versões assíncronas (ASGI)
+    path(
+        "api/async/availability/day/",
+        views_async.availability_day,
+        name="availability_day_async",
+    ),
+    path(
+        "async/choose-datetime/<int:servico_id>/<int:barbeiro_id>/",
+        views_async.choose_datetime,
+        name="choose_datetime_async",
+    ),
+
     path("booking/confirm/", views.booking_confirm, name="booking_confirm"),
     path("booking/create/", views.create_booking, name="create_booking"),
 
@@ -24,6 +44,11 @@ urlpatterns = [
 
     # Agenda do barbeiro
     path("agenda/", views.agenda_barbeiro, name="agenda_barbeiro"),
+    path("agenda/<int:barbeiro_id>/<str:token>/agenda.ics", views.agenda_ics, name="agenda_ics"),
+    path("export/marcacoes.csv", views.export_marcacoes_csv, name="export_marcacoes_csv"),
+    path("analytics/", views.analytics_dashboard, name="analytics"),
+    path("api/analytics/", views.analytics_json, name="analytics_json"),
+    path("agenda/json/", views.agenda_barbeiro_json, name="agenda_barbeiro_json"),
 
     # Ações do barbeiro sobre marcações
     path(
@@ -37,6 +62,8 @@ urlpatterns = [
         name="cancel_booking_barber",      # <--- usado no template também
     ),
 
+    path("agenda/bulk/", views.acao_em_massa_barbeiro, name="agenda_bulk"),
+
     # Cancelamento genérico (cliente ou barbeiro)
     path(
         "booking/cancel/<int:marcacao_id>/",
@@ -0,0 +1,103 @@
+# bookings/versions.py
+"""
+Versões partilhadas por todos os processos, guardadas na BD (Versao).
+
+O cache do Django é um LocMemCache por processo: uma versão que só vivesse
+lá mudava apenas no worker que gravou a alteração, e os outros continuavam
+a servir dados antigos para sempre. Aqui cada versão é uma linha na BD
+(um timestamp em ns), trocada por bump() na mesma transação da alteração.
+
+Cada processo guarda as versões que leu no seu cache durante
+VERSIONS_CACHE_TIMEOUT segundos (2 por omissão): os outros workers veem a
+versão nova, no pior caso, ao fim desse tempo, e ler uma versão custa no
+máximo uma query por processo nesse intervalo. Uma versão que nunca foi
+trocada vale 0.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _key(name):
+    return f"versao:{name}"
+
+
+def _timeout():
+    return getattr(settings, "VERSIONS_CACHE_TIMEOUT", 2)
+
+
+def get_many(names):
+    """{nome: versão} para os nomes pedidos (uma query para os que faltam no cache)."""
+    # import local: os modelos importam signals, que importa este módulo
+    from .models import Versao
+
+    keys = {name: _key(name) for name in names}
+    found = cache.get_many(keys.values())
+    result = {name: found[key] for name, key in keys.items() if key in found}
+
+    missing = [name for name in keys if name not in result]
+    if missing:
+        loaded = dict(Versao.objects.filter(pk__in=missing).values_list("nome", "valor"))
+        loaded = {name: loaded.get(name, 0) for name in missing}
+        cache.set_many({keys[name]: value for name, value in loaded.items()}, _timeout())
+        result.update(loaded)
+    return result
+
+
+def get(name):
+    return get_many([name])[name]
+
+
+async def aget_many(names):
+    """Versão assíncrona de get_many."""
+    from .models import Versao
+
+    keys = {name: _key(name) for name in names}
+    found = await cache.aget_many(keys.values())
+    result = {name: found[key] for name, key in keys.items() if key in found}
+
+    missing = [name for name in keys if name not in result]
+    if missing:
+        rows = Versao.objects.filter(pk__in=missing).values_list("nome", "valor")
+        loaded = {nome: valor async for nome, valor in rows}
+        loaded = {name: loaded.get(name, 0) for name in missing}
+        await cache.aset_many({keys[name]: value for name, value in loaded.items()}, _timeout())
+        result.update(loaded)
+    return result
+
+
+def bump(*names):
+    """
+    Troca as versões indicadas (na transação atual, se houver) e retorna o
+    valor novo, comum a todas.
+    """
+    from .models import Versao
+
+    names = set(names)
+    if not names:
+        return None
+    now = time.time_ns()
+    # escreve primeiro, sem SELECT antes: em SQLite uma transação que leu e
+    # depois tenta escrever falha logo ("database is locked") se outro
+    # processo escreveu entretanto, em vez de esperar pelo busy_timeout
+    if Versao.objects.filter(pk__in=names).update(valor=now) < len(names):
+        # primeira vez para algum nome; as linhas que já existem são ignoradas
+        Versao.objects.bulk_create([Versao(nome=name, valor=now) for name in names], ignore_conflicts=True)
+    # neste processo a versão nova vale logo a seguir ao commit
+    keys = [_key(name) for name in names]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+    return now
+
+
+def forget(*names):
+    """Apaga versões que já não interessam (voltam a valer 0)."""
+    from .models import Versao
+
+    names = set(names)
+    if not names:
+        return
+    Versao.objects.filter(pk__in=names).delete()
+    keys = [_key(name) for name in names]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,12 +1,21 @@
-from datetime import datetime, date, time, timedelta
+from datetime import datetime, date, timedelta
 
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext as _
+from django.views.decorators.http import condition, require_GET, require_POST
 
+from . import agenda_cache, analytics, availability, availability_cache, catalog_cache, exports
 from .models import Barbeiro, Marcacao, Servico
+from .pagination import paginate
+from .queries import arquivo_barbeiro, arquivo_cliente, marcacoes_barbeiro, marcacoes_cliente
+from .roles import barbeiro_required, get_barbeiro
+from .services import SlotIndisponivel, alterar_estado, criar_marcacao
 
 from .forms import BookingForm
 
@@ -15,13 +24,20 @@ from .forms import BookingForm
 # ----------------------------
 # HOME (index) + alias landing
 # ----------------------------
+@condition(etag_func=catalog_cache.etag, last_modified_func=catalog_cache.last_modified)
 def index(request):
+    # querysets lazy: com o fragmento em cache ({% cache %} no template)
+    # não chegam a ser avaliados
     servicos = Servico.objects.all()[:6]
     servicos_precos = Servico.objects.order_by("preco")[:5]
     return render(
         request,
         "index.html",   # <- agora é só "index.html"
-        {"servicos": servicos, "servicos_precos": servicos_precos},
+        {
+            "servicos": servicos,
+            "servicos_precos": servicos_precos,
+            "catalog_version": catalog_cache.version(),
+        },
     )
 
 
@@ -33,9 +49,14 @@ landing = index
 # LISTA DE SERVIÇOS
 # ----------------------------
 @login_required
+@condition(etag_func=catalog_cache.etag)
 def services_list(request):
     servicos = Servico.objects.all().order_by("preco", "nome")
-    return render(request, "booking_wizard/services_list.html", {"servicos": servicos})
+    return render(
+        request,
+        "booking_wizard/services_list.html",
+        {"servicos": servicos, "catalog_version": catalog_cache.version()},
+    )
 
 
 # ----------------------------
@@ -44,44 +65,43 @@ def services_list(request):
 @login_required
 def choose_barber(request, servico_id: int):
     servico = get_object_or_404(Servico, pk=servico_id)
-    barbeiros = Barbeiro.objects.all().order_by(
+    barbeiros = Barbeiro.objects.select_related("user").order_by(
         "user__first_name", "user__last_name", "user__username"
     )
+    request.wizard.update(servico_id=servico.id)
     ctx = {"servico": servico, "barbeiros": barbeiros}
     return render(request, "booking_wizard/choose_barber.html", ctx)
 
 
 # ----------------------------
-# GERA SLOTS (ajudante)
+# DIA PEDIDO (ajudante)
 # ----------------------------
-def _generate_slots(day: date, duration_min: int, barbeiro: Barbeiro):
-    """
-    Gera horários disponíveis entre 09:00 e 18:00, removendo conflitos com marcações
-    (exceto canceladas). Usa make_aware para lidar com timezone corretamente.
-    """
-    tz = timezone.get_current_timezone()
-    WORK_START = time(9, 0)
-    WORK_END = time(18, 0)
-
-    start_dt = timezone.make_aware(datetime.combine(day, WORK_START), tz)
-    end_dt = timezone.make_aware(datetime.combine(day, WORK_END), tz)
-    step = timedelta(minutes=duration_min)
-
-    # Marcações do barbeiro neste dia (ativas)
-    ocupadas = Marcacao.objects.filter(
-        barbeiro=barbeiro, inicio__date=day
-    ).exclude(status="cancelled")
+def _picked_day(request) -> date:
+    """Lê ?date=AAAA-MM-DD; por omissão usa o dia de hoje (fuso local)."""
+    try:
+        picked = request.GET.get("date")
+        return datetime.strptime(picked, "%Y-%m-%d").date() if picked else timezone.localdate()
+    except ValueError:
+        return timezone.localdate()
 
-    slots = []
-    current = start_dt
-    while current + step <= end_dt:
-        # conflito simples: existe marcação a começar dentro da janela [current, current+step)
-        conflito = ocupadas.filter(inicio__gte=current, inicio__lt=current + step).exists()
-        if not conflito:
-            slots.append(current)
-        current += step
 
-    return slots
+def _wizard_day(request, servico, barbeiro) -> date:
+    """
+    Dia a mostrar no passo de data/hora: o de ?date= ou, ao voltar ao mesmo
+    serviço e barbeiro, o último escolhido (se ainda não passou). Guarda as
+    escolhas no estado do wizard (cookie; ver wizard.py).
+    """
+    wizard = request.wizard
+    day = _picked_day(request)
+    if (
+        "date" not in request.GET
+        and wizard.get("servico_id") == servico.id
+        and wizard.get("barbeiro_id") == barbeiro.id
+        and wizard.get("date", "") >= day.isoformat()
+    ):
+        day = date.fromisoformat(wizard.get("date"))
+    wizard.update(servico_id=servico.id, barbeiro_id=barbeiro.id, date=day.isoformat())
+    return day
 
 
 # ----------------------------
@@ -95,25 +115,135 @@ def choose_datetime(request, servico_id: int, barbeiro_id: int):
     if request.method == "POST":
         form = BookingForm(request.POST)
         if form.is_valid():
-            marcacao = form.save(commit=False)
-            marcacao.servico = servico
-            marcacao.barbeiro = barbeiro
-            marcacao.cliente = request.user
-            marcacao.status = "pending"
-            marcacao.save()
-
-            messages.success(request, _("Marcação criada com sucesso!"))
-            return redirect("bookings:dashboard")
+            try:
+                criar_marcacao(request.user, barbeiro, servico, form.cleaned_data["inicio"])
+            except SlotIndisponivel:
+                form.add_error("inicio", _("Este horário já não está disponível."))
+            else:
+                request.wizard.clear()
+                messages.success(request, _("Marcação criada com sucesso!"))
+                return redirect("bookings:dashboard")
     else:
         form = BookingForm()
 
+    day = _wizard_day(request, servico, barbeiro)
     ctx = {
         "servico": servico,
         "barbeiro": barbeiro,
         "form": form,
+        "day": day,
+        "slots": availability.slots_for_day(barbeiro, day, servico.duracao_min),
+        "month_days": availability.month_free_counts(servico, day, [barbeiro]).items(),
     }
     return render(request, "booking_wizard/choose_datetime.html", ctx)
 
+# ----------------------------
+# PESQUISA DE DISPONIBILIDADE (JSON)
+# ----------------------------
+SEARCH_MAX_DAYS = 31
+SEARCH_MAX_LIMIT = 50
+
+
+def _parse_id(value):
+    """Id positivo vindo da query string, ou None se faltar ou for inválido."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def _parse_date(value, default):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else default
+    except ValueError:
+        return None
+
+
+@require_GET
+def availability_search(request):
+    """
+    Primeiros horários livres para um serviço em qualquer barbeiro.
+
+    Parâmetros: servico (obrigatório), from, to (AAAA-MM-DD), barbeiro
+    (repetível) e limit.
+    """
+    servico_id = _parse_id(request.GET.get("servico"))
+    if servico_id is None:
+        return JsonResponse({"error": _("Serviço inválido.")}, status=400)
+    servico = get_object_or_404(Servico, pk=servico_id)
+
+    today = timezone.localdate()
+    date_from = _parse_date(request.GET.get("from"), today)
+    date_to = _parse_date(request.GET.get("to"), (date_from or today) + timedelta(days=6))
+    if date_from is None or date_to is None or date_to < date_from:
+        return JsonResponse({"error": _("Intervalo de datas inválido.")}, status=400)
+    date_to = min(date_to, date_from + timedelta(days=SEARCH_MAX_DAYS - 1))
+
+    try:
+        limit = min(int(request.GET.get("limit", 10)), SEARCH_MAX_LIMIT)
+        barbeiros = [int(b) for b in request.GET.getlist("barbeiro")] or None
+    except ValueError:
+        return JsonResponse({"error": _("Parâmetros inválidos.")}, status=400)
+
+    found = availability.earliest_slots(servico, date_from, date_to, barbeiros, limit)
+    return JsonResponse({
+        "servico": servico.id,
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "slots": [
+            {
+                "inicio": timezone.localtime(slot).isoformat(),
+                "barbeiro_id": barbeiro.id,
+                "barbeiro": str(barbeiro),
+            }
+            for slot, barbeiro in found
+        ],
+    })
+
+
+def _parse_month(value, default):
+    try:
+        return datetime.strptime(value, "%Y-%m").date() if value else default
+    except ValueError:
+        return None
+
+
+@require_GET
+def availability_month(request):
+    """
+    Nº de horários livres por dia num mês, para o calendário do wizard.
+
+    Parâmetros: servico (obrigatório), month (AAAA-MM; por omissão o atual)
+    e barbeiro (repetível; por omissão qualquer barbeiro ativo).
+    """
+    servico_id = _parse_id(request.GET.get("servico"))
+    if servico_id is None:
+        return JsonResponse({"error": _("Serviço inválido.")}, status=400)
+    servico = get_object_or_404(Servico, pk=servico_id)
+    month = _parse_month(request.GET.get("month"), timezone.localdate())
+    if month is None:
+        return JsonResponse({"error": _("Mês inválido.")}, status=400)
+
+    try:
+        barbeiros = [int(b) for b in request.GET.getlist("barbeiro")] or None
+    except ValueError:
+        return JsonResponse({"error": _("Parâmetros inválidos.")}, status=400)
+
+    counts = availability.month_free_counts(servico, month, barbeiros)
+    return JsonResponse({
+        "servico": servico.id,
+        "month": month.strftime("%Y-%m"),
+        "days": {day.isoformat(): count for day, count in counts.items()},
+    })
+
+
+@staff_member_required
+def availability_cache_stats(request):
+    """Contadores de acerto/falha do cache de disponibilidade (por processo)."""
+    return JsonResponse(availability_cache.stats())
+
+
 # ----------------------------
 # CONFIRMAR (resumo)
 # ----------------------------
@@ -163,13 +293,13 @@ def create_booking(request):
     if timezone.is_naive(inicio):
         inicio = timezone.make_aware(inicio, timezone.get_current_timezone())
 
-    Marcacao.objects.create(
-        cliente=request.user,
-        servico=servico,
-        barbeiro=barbeiro,
-        inicio=inicio,
-        status="pending",
-    )
+    try:
+        criar_marcacao(request.user, barbeiro, servico, inicio)
+    except SlotIndisponivel:
+        messages.error(request, _("Este horário já não está disponível."))
+        return redirect("bookings:choose_datetime", servico.id, barbeiro.id)
+
+    request.wizard.clear()
     messages.success(request, _("Marcação criada com sucesso!"))
     return redirect("bookings:dashboard")
 
@@ -180,45 +310,169 @@ def create_booking(request):
 # ----------------------------
 @login_required
 def dashboard(request):
-    marcacoes = (
-        Marcacao.objects.filter(cliente=request.user)
-        .select_related("barbeiro__user", "servico")
-        .order_by("-inicio", "-criado_em")
+    page = paginate(marcacoes_cliente(request.user), request, archive=arquivo_cliente(request.user))
+    return render(
+        request,
+        "bookings/dashboard.html",
+        {"marcacoes": page.items, "page": page},
     )
-    return render(request, "bookings/dashboard.html", {"marcacoes": marcacoes})
 
 
 @login_required
+@barbeiro_required
 def agenda_barbeiro(request):
-    try:
-        barbeiro = Barbeiro.objects.get(user=request.user)
-    except Barbeiro.DoesNotExist:
-        messages.error(request, _("A tua conta não está registada como barbeiro."))
-        return redirect("bookings:dashboard")
+    barbeiro = request.barbeiro
 
-    marcacoes = (
-        Marcacao.objects.filter(barbeiro=barbeiro)
-        .select_related("cliente", "servico")
-        .order_by("-inicio", "-criado_em")
+    page = paginate(marcacoes_barbeiro(barbeiro), request, archive=arquivo_barbeiro(barbeiro))
+    ics_url = request.build_absolute_uri(
+        reverse("bookings:agenda_ics", args=[barbeiro.pk, exports.ics_token(barbeiro.pk)])
     )
     return render(
         request,
         "bookings/agenda_barbeiro.html",
-        {"marcacoes": marcacoes, "barbeiro": barbeiro},
+        {"marcacoes": page.items, "page": page, "barbeiro": barbeiro, "ics_url": ics_url},
+    )
+
+
+@login_required
+@barbeiro_required(json=True)
+def agenda_barbeiro_json(request):
+    """Mesma agenda em JSON, para carregar mais linhas com ?cursor=."""
+    barbeiro = request.barbeiro
+
+    page = paginate(marcacoes_barbeiro(barbeiro), request, archive=arquivo_barbeiro(barbeiro))
+    return JsonResponse({
+        "desde": page.window.desde.isoformat(),
+        "ate": page.window.ate.isoformat(),
+        "next_cursor": page.next_cursor,
+        "marcacoes": [
+            {
+                "id": m.pk,
+                "inicio": timezone.localtime(m.inicio).isoformat(),
+                "cliente": m.cliente.get_full_name() or m.cliente.username,
+                "servico": m.servico.nome,
+                "duracao_min": m.servico.duracao_min,
+                "status": m.status,
+                "arquivada": getattr(m, "arquivada", False),
+            }
+            for m in page.items
+        ],
+    })
+
+
+# ----------------------------
+# EXPORTAÇÕES (streaming)
+# ----------------------------
+@staff_member_required
+@require_GET
+def export_marcacoes_csv(request):
+    """CSV das marcações entre ?desde= e ?ate= (por omissão, o mês atual)."""
+    first, last = availability.month_bounds(timezone.localdate())
+    desde = _parse_date(request.GET.get("desde"), first)
+    ate = _parse_date(request.GET.get("ate"), last)
+    if desde is None or ate is None or ate < desde:
+        return JsonResponse({"error": _("Intervalo de datas inválido.")}, status=400)
+
+    response = StreamingHttpResponse(
+        exports.buffered(exports.csv_rows(desde, ate)), content_type="text/csv; charset=utf-8"
+    )
+    response["Content-Disposition"] = f'attachment; filename="marcacoes_{desde}_{ate}.csv"'
+    return response
+
+
+@require_GET
+@condition(etag_func=agenda_cache.etag, last_modified_func=agenda_cache.last_modified)
+def agenda_ics(request, barbeiro_id: int, token: str):
+    """Feed ICS da agenda do barbeiro; o token assinado substitui o login."""
+    if not exports.check_ics_token(barbeiro_id, token):
+        raise Http404
+    barbeiro = get_object_or_404(Barbeiro.objects.select_related("user"), pk=barbeiro_id)
+    response = StreamingHttpResponse(
+        exports.buffered(exports.ics_lines(barbeiro)), content_type="text/calendar; charset=utf-8"
     )
+    response["Content-Disposition"] = 'inline; filename="agenda.ics"'
+    return response
+
+
+# ----------------------------
+# ANÁLISE (staff; lê as tabelas de resumo)
+# ----------------------------
+def _analytics_data(request):
+    default_from, default_to = analytics.default_period()
+    desde = _parse_date(request.GET.get("desde"), default_from)
+    ate = _parse_date(request.GET.get("ate"), default_to)
+    if desde is None or ate is None or ate < desde:
+        return None
+    nomes = {b.pk: str(b) for b in Barbeiro.objects.select_related("user")}
+    meses = analytics.resumo_mensal(desde, ate)
+    for row in meses:
+        row["barbeiro"] = nomes.get(row["barbeiro_id"], row["barbeiro_id"])
+    return {
+        "desde": desde,
+        "ate": ate,
+        "meses": meses,
+        "servicos": analytics.servicos_populares(desde, ate),
+    }
+
+
+@staff_member_required
+@require_GET
+def analytics_dashboard(request):
+    """Receita e utilização por barbeiro/mês e serviços mais procurados."""
+    data = _analytics_data(request)
+    if data is None:
+        messages.error(request, _("Intervalo de datas inválido."))
+        return redirect("bookings:analytics")
+    return render(request, "bookings/analytics.html", data)
+
+
+@staff_member_required
+@require_GET
+def analytics_json(request):
+    """Os mesmos números de analytics_dashboard, em JSON."""
+    data = _analytics_data(request)
+    if data is None:
+        return JsonResponse({"error": _("Intervalo de datas inválido.")}, status=400)
+    return JsonResponse({
+        "desde": data["desde"].isoformat(),
+        "ate": data["ate"].isoformat(),
+        "meses": [
+            {
+                "mes": row["mes"].strftime("%Y-%m"),
+                "barbeiro_id": row["barbeiro_id"],
+                "barbeiro": row["barbeiro"],
+                "marcacoes": row["marcacoes"],
+                "canceladas": row["canceladas"],
+                "receita": str(row["receita"]),
+                "minutos": row["minutos"],
+                "minutos_abertos": row["minutos_abertos"],
+                "utilizacao": row["utilizacao"],
+            }
+            for row in data["meses"]
+        ],
+        "servicos": [
+            {
+                "servico_id": row["servico_id"],
+                "servico": row["servico__nome"],
+                "marcacoes": row["marcacoes"],
+                "receita": str(row["receita"]),
+            }
+            for row in data["servicos"]
+        ],
+    })
 
 
 # (opcionais se já existirem com outros nomes)
 @login_required
+@barbeiro_required
 def confirmar_marcacao(request, pk):
-    try:
-        barbeiro = Barbeiro.objects.get(user=request.user)
-    except Barbeiro.DoesNotExist:
-        messages.error(request, _("A tua conta não está registada como barbeiro."))
-        return redirect("bookings:dashboard")
+    barbeiro = request.barbeiro
 
     m = get_object_or_404(Marcacao, pk=pk, barbeiro=barbeiro)
-    if m.status != "confirmed":
+    if m.status == "cancelled":
+        # o horário pode já ter sido marcado por outra pessoa
+        messages.error(request, _("Uma marcação cancelada não pode ser confirmada."))
+    elif m.status != "confirmed":
         m.confirm()
         messages.success(request, _("Marcação confirmada com sucesso."))
     else:
@@ -227,12 +481,9 @@ def confirmar_marcacao(request, pk):
 
 
 @login_required
+@barbeiro_required
 def cancelar_marcacao_barbeiro(request, pk):
-    try:
-        barbeiro = Barbeiro.objects.get(user=request.user)
-    except Barbeiro.DoesNotExist:
-        messages.error(request, _("A tua conta não está registada como barbeiro."))
-        return redirect("bookings:dashboard")
+    barbeiro = request.barbeiro
 
     m = get_object_or_404(Marcacao, pk=pk, barbeiro=barbeiro)
     if m.status != "cancelled":
@@ -243,6 +494,36 @@ def cancelar_marcacao_barbeiro(request, pk):
     return redirect("bookings:agenda_barbeiro")
 
 
+BULK_ACTIONS = {"confirm": "confirmed", "cancel": "cancelled"}
+
+
+@login_required
+@barbeiro_required
+@require_POST
+def acao_em_massa_barbeiro(request):
+    """Confirma ou cancela de uma vez as marcações selecionadas na agenda."""
+    barbeiro = request.barbeiro
+
+    status = BULK_ACTIONS.get(request.POST.get("acao"))
+    try:
+        ids = [int(pk) for pk in request.POST.getlist("ids")]
+    except ValueError:
+        ids = []
+    if status is None or not ids:
+        messages.info(request, _("Nenhuma marcação selecionada."))
+        return redirect("bookings:agenda_barbeiro")
+
+    changed, ignoradas = alterar_estado(Marcacao.objects.filter(pk__in=ids, barbeiro=barbeiro), status)
+    messages.success(request, _("%(n)d marcação(ões) atualizada(s).") % {"n": changed})
+    if ignoradas:
+        messages.warning(
+            request,
+            _("%(n)d marcação(ões) cancelada(s) não foram confirmadas: o horário pode já estar ocupado.")
+            % {"n": ignoradas},
+        )
+    return redirect("bookings:agenda_barbeiro")
+
+
 @login_required
 def cancelar_marcacao(request, pk):
     m = get_object_or_404(Marcacao, pk=pk, cliente=request.user)
@@ -263,8 +544,9 @@ def cancel_booking(request, marcacao_id: int):
     """
     m = get_object_or_404(Marcacao, pk=marcacao_id)
 
+    barbeiro = get_barbeiro(request)
     is_owner = (m.cliente_id == request.user.id)
-    is_barber = (getattr(m.barbeiro, "user_id", None) == request.user.id)
+    is_barber = barbeiro is not None and m.barbeiro_id == barbeiro.pk
 
     if not (is_owner or is_barber):
         messages.error(request, _("Não tens permissões para cancelar esta marcação."))
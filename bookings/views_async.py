@@ -0,0 +1,108 @@
+# bookings/views_async.py
+"""
+Versões assíncronas (ASGI) dos endpoints de disponibilidade.
+
+Usam o ORM assíncrono do Django, por isso um único worker ASGI aguenta
+muitos clientes lentos a consultar horários sem bloquear. Em WSGI também
+funcionam (o Django corre-as num event loop por pedido).
+
+O ORM corre as queries uma a uma na thread do sync_to_async, por isso não
+se ganha nada em lançar uma por barbeiro: os dias de todos os barbeiros
+vêm de uma vez (availability.slots_for_barbers) e só o cálculo dos
+horários é feito por barbeiro.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from django.views.decorators.http import require_GET
+
+from .availability import aslots_for_day, month_free_counts, slots_for_barbers
+from .forms import BookingForm
+from .models import Barbeiro, Servico
+from .views import _parse_date, _parse_id, _wizard_day
+
+
+async def _aget_or_404(queryset, **lookup):
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404
+
+
+# ----------------------------
+# DISPONIBILIDADE DE UM DIA (JSON)
+# ----------------------------
+@require_GET
+async def availability_day(request):
+    """
+    Horários livres de um dia para um serviço, por barbeiro.
+
+    Parâmetros: servico (obrigatório), date (AAAA-MM-DD) e barbeiro
+    (repetível; por omissão todos os ativos).
+    """
+    servico_id = _parse_id(request.GET.get("servico"))
+    if servico_id is None:
+        return JsonResponse({"error": _("Serviço inválido.")}, status=400)
+    servico = await _aget_or_404(Servico.objects, pk=servico_id)
+    day = _parse_date(request.GET.get("date"), timezone.localdate())
+    if day is None:
+        return JsonResponse({"error": _("Data inválida.")}, status=400)
+
+    barbeiros = Barbeiro.objects.filter(ativo=True).select_related("user")
+    try:
+        ids = [int(b) for b in request.GET.getlist("barbeiro")]
+    except ValueError:
+        return JsonResponse({"error": _("Parâmetros inválidos.")}, status=400)
+    if ids:
+        barbeiros = barbeiros.filter(pk__in=ids)
+    barbeiros = [b async for b in barbeiros.aiterator()]
+
+    slots = await sync_to_async(slots_for_barbers)([b.pk for b in barbeiros], day, servico.duracao_min)
+    return JsonResponse({
+        "servico": servico.id,
+        "date": day.isoformat(),
+        "barbeiros": [
+            {
+                "barbeiro_id": b.id,
+                "barbeiro": str(b),
+                "slots": [timezone.localtime(s).isoformat() for s in slots[b.pk]],
+            }
+            for b in barbeiros
+        ],
+    })
+
+
+# ----------------------------
+# ESCOLHER DATA/HORA (GET)
+# ----------------------------
+async def choose_datetime(request, servico_id: int, barbeiro_id: int):
+    """Mesma página que views.choose_datetime (só GET; o POST fica na síncrona)."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    servico, barbeiro = await asyncio.gather(
+        _aget_or_404(Servico.objects, pk=servico_id),
+        _aget_or_404(Barbeiro.objects.select_related("user"), pk=barbeiro_id),
+    )
+    day = _wizard_day(request, servico, barbeiro)
+    slots, month_days = await asyncio.gather(
+        aslots_for_day(barbeiro.pk, day, servico.duracao_min),
+        sync_to_async(month_free_counts)(servico, day, [barbeiro]),
+    )
+
+    ctx = {
+        "servico": servico,
+        "barbeiro": barbeiro,
+        "form": BookingForm(),
+        "day": day,
+        "slots": slots,
+        "month_days": month_days.items(),
+    }
+    # o render pode tocar na BD (user, sessão, mensagens): corre em modo síncrono
+    return await sync_to_async(render)(request, "booking_wizard/choose_datetime.html", ctx)
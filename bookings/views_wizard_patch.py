@@ -1,42 +1,13 @@
-from datetime import datetime, time, timedelta
+from datetime import datetime
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 
-from .models import Barbeiro, Marcacao, Servico
-
-WORK_START = time(9, 0)
-WORK_END = time(18, 0)
-SLOT_STEP_MIN = 15
-
-
-def _overlap(a_start, a_end, b_start, b_end):
-    return (a_start < b_end) and (a_end > b_start)
-
-
-def _generate_slots(day_dt, duration_min, existing_starts_ends):
-    tz = timezone.get_current_timezone()
-
-    naive_start = datetime.combine(day_dt, WORK_START)
-    naive_end = datetime.combine(day_dt, WORK_END)
-
-    start_dt = timezone.make_aware(naive_start, tz) if timezone.is_naive(naive_start) else naive_start
-    end_dt = timezone.make_aware(naive_end, tz) if timezone.is_naive(naive_end) else naive_end
-
-    slots = []
-    cursor = start_dt
-    dur = timedelta(minutes=duration_min)
-
-    while cursor + dur <= end_dt:
-        s, e = cursor, cursor + dur
-        conflict = any(_overlap(s, e, xs, xe) for xs, xe in existing_starts_ends)
-        if not conflict and s >= timezone.now():
-            slots.append(s)
-        cursor += timedelta(minutes=SLOT_STEP_MIN)
-
-    return slots
+from . import availability
+from .models import Barbeiro, Servico
+from .services import SlotIndisponivel, criar_marcacao
 
 
 def services_list(request):
@@ -48,9 +19,7 @@ def choose_barber(request, service_id):
     servico = get_object_or_404(Servico, pk=service_id)
     barbeiros = Barbeiro.objects.all().order_by("nome")
 
-    req = request.session.get("booking_wizard", {})
-    req["service_id"] = servico.id
-    request.session["booking_wizard"] = req
+    request.wizard.update(servico_id=servico.id)
 
     return render(
         request,
@@ -69,17 +38,9 @@ def choose_datetime(request, service_id, barber_id):
     except ValueError:
         day = timezone.localdate()
 
-    day_start = timezone.make_aware(datetime.combine(day, time.min))
-    day_end = timezone.make_aware(datetime.combine(day, time.max))
+    slots = availability.slots_for_day(barbeiro, day, servico.duracao_min)
 
-    marcacoes = Marcacao.objects.filter(barbeiro=barbeiro, inicio__range=(day_start, day_end))
-    existing = [(m.inicio, m.inicio + timedelta(minutes=m.servico.duracao_min)) for m in marcacoes]
-
-    slots = _generate_slots(day, servico.duracao_min, existing)
-
-    req = request.session.get("booking_wizard", {})
-    req.update({"service_id": servico.id, "barber_id": barbeiro.id, "date": day.isoformat()})
-    request.session["booking_wizard"] = req
+    request.wizard.update(servico_id=servico.id, barbeiro_id=barbeiro.id, date=day.isoformat())
 
     return render(
         request,
@@ -90,24 +51,22 @@ def choose_datetime(request, service_id, barber_id):
 
 @login_required
 def booking_confirm(request):
-    # Se veio do clique num slot, guardamos o ISO na sessão
+    # Se veio do clique num slot, guardamos o ISO no estado do wizard (cookie)
     if request.method == "POST":
         start_iso = request.POST.get("start_iso")
         if start_iso:
-            req = request.session.get("booking_wizard", {})
-            req["start_iso"] = start_iso
-            request.session["booking_wizard"] = req
+            request.wizard.update(slot=start_iso)
 
-    data = request.session.get("booking_wizard", {})
-    if not data or not all(k in data for k in ["service_id", "barber_id", "start_iso"]):
+    data = request.wizard.as_dict()
+    if not all(k in data for k in ["servico_id", "barbeiro_id", "slot"]):
         messages.error(request, "Selecione serviço, profissional e horário.")
         return redirect("services_list")
 
-    servico = get_object_or_404(Servico, pk=data["service_id"])
-    barbeiro = get_object_or_404(Barbeiro, pk=data["barber_id"])
+    servico = get_object_or_404(Servico, pk=data["servico_id"])
+    barbeiro = get_object_or_404(Barbeiro, pk=data["barbeiro_id"])
 
-    # start_iso pode vir aware (ex.: '2025-11-06T15:15:00+00:00') ou naive.
-    start_dt = datetime.fromisoformat(data["start_iso"])
+    # slot pode vir aware (ex.: '2025-11-06T15:15:00+00:00') ou naive.
+    start_dt = datetime.fromisoformat(data["slot"])
     if timezone.is_naive(start_dt):
         start = timezone.make_aware(start_dt)
     else:
@@ -123,23 +82,25 @@ def booking_confirm(request):
 
 @login_required
 def create_booking(request):
-    data = request.session.get("booking_wizard", {})
-    if request.method != "POST" or not data:
+    data = request.wizard.as_dict()
+    if request.method != "POST" or "slot" not in data:
         return redirect("services_list")
 
-    servico = get_object_or_404(Servico, pk=data.get("service_id"))
-    barbeiro = get_object_or_404(Barbeiro, pk=data.get("barber_id"))
+    servico = get_object_or_404(Servico, pk=data.get("servico_id"))
+    barbeiro = get_object_or_404(Barbeiro, pk=data.get("barbeiro_id"))
 
-    start_dt = datetime.fromisoformat(data.get("start_iso"))
+    start_dt = datetime.fromisoformat(data["slot"])
     if timezone.is_naive(start_dt):
         start = timezone.make_aware(start_dt)
     else:
         start = start_dt.astimezone(timezone.get_current_timezone())
 
-    marc = Marcacao(cliente=request.user, barbeiro=barbeiro, servico=servico, inicio=start)
-    marc.full_clean()
-    marc.save()
+    try:
+        criar_marcacao(request.user, barbeiro, servico, start)
+    except SlotIndisponivel:
+        messages.error(request, "Este horário já não está disponível.")
+        return redirect("choose_datetime", servico.id, barbeiro.id)
 
-    request.session.pop("booking_wizard", None)
+    request.wizard.clear()
     messages.success(request, "Marcação criada! Em breve será confirmada.")
     return redirect("dashboard")
@@ -0,0 +1,110 @@
+# bookings/wizard.py
+"""
+Estado do wizard de marcação (serviço, barbeiro, dia, horário) num cookie
+assinado, em vez da sessão.
+
+Guardado na sessão (como fazia views_wizard_patch.py, que não está ligado
+a URLs), cada passo seria um UPDATE a django_session, a competir com as
+escritas das marcações. Aqui o estado viaja num cookie
+pequeno (JSON comprimido e assinado com SECRET_KEY): não há escritas na BD,
+o cookie só é reenviado quando o estado muda de facto, e um wizard
+abandonado expira sozinho (o cookie e a assinatura têm prazo), sem limpezas.
+
+    request.wizard.get("servico_id")
+    request.wizard.update(servico_id=1, barbeiro_id=2)   # só marca se mudar
+    request.wizard.clear()
+
+Definições:
+    BOOKING_WIZARD_COOKIE   nome do cookie
+    BOOKING_WIZARD_MAX_AGE  validade em segundos
+"""
+from django.conf import settings
+from django.core import signing
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+SALT = "bookings.wizard"
+FIELDS = ("servico_id", "barbeiro_id", "date", "slot")
+
+
+def _cookie_name():
+    return getattr(settings, "BOOKING_WIZARD_COOKIE", "wizard")
+
+
+def _max_age():
+    return getattr(settings, "BOOKING_WIZARD_MAX_AGE", 3600)
+
+
+class WizardState:
+    def __init__(self, data=None):
+        self._data = {k: v for k, v in (data or {}).items() if k in FIELDS}
+        self.modified = False
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def update(self, **changes):
+        for key, value in changes.items():
+            if key not in FIELDS:
+                raise KeyError(key)
+            if value is None:
+                if key in self._data:
+                    del self._data[key]
+                    self.modified = True
+            elif self._data.get(key) != value:
+                self._data[key] = value
+                self.modified = True
+
+    def clear(self):
+        if self._data:
+            self._data = {}
+            self.modified = True
+
+    def as_dict(self):
+        return dict(self._data)
+
+    def __bool__(self):
+        return bool(self._data)
+
+
+def load(request):
+    """Estado do wizard deste pedido (lido do cookie uma só vez)."""
+    state = getattr(request, "_wizard_state", None)
+    if state is None:
+        value = request.COOKIES.get(_cookie_name())
+        data = None
+        if value:
+            try:
+                data = signing.loads(value, salt=SALT, max_age=_max_age())
+            except signing.BadSignature:
+                # adulterado ou expirado: recomeça
+                data = None
+        state = request._wizard_state = WizardState(data if isinstance(data, dict) else None)
+    return state
+
+
+# ----------------------------
+# MIDDLEWARE
+# ----------------------------
+class WizardStateMiddleware(MiddlewareMixin):
+    """Põe `request.wizard` no pedido e só regrava o cookie se o estado mudou."""
+
+    def process_request(self, request):
+        request.wizard = SimpleLazyObject(lambda: load(request))
+
+    def process_response(self, request, response):
+        state = getattr(request, "_wizard_state", None)
+        if state is None or not state.modified:
+            return response
+        if state:
+            response.set_cookie(
+                _cookie_name(),
+                signing.dumps(state.as_dict(), salt=SALT, compress=True),
+                max_age=_max_age(),
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        else:
+            response.delete_cookie(_cookie_name(), samesite="Lax")
+        return response